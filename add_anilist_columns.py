@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the AniList link columns (anilist_id, anilist_synced_at)
+and their index to the Content table
+"""
+
+from app import app, db
+from models import Content
+from sqlalchemy import text
+import logging
+
+NEW_COLUMNS = {
+    'anilist_id': 'INTEGER',
+    'anilist_synced_at': 'TIMESTAMP',
+}
+
+NEW_INDEXES = ('ix_content_anilist_id',)
+
+def add_anilist_columns():
+    """Add the AniList columns and index to Content if they don't exist"""
+
+    with app.app_context():
+        try:
+            inspector = db.inspect(db.engine)
+            columns = {col['name'] for col in inspector.get_columns('content')}
+
+            for name, column_type in NEW_COLUMNS.items():
+                if name in columns:
+                    print(f"✅ {name} column already exists in Content table")
+                    continue
+                print(f"📝 Adding {name} column to Content table...")
+                db.session.execute(text(f"ALTER TABLE content ADD COLUMN {name} {column_type}"))
+            db.session.commit()
+
+            existing = {index['name'] for index in db.inspect(db.engine).get_indexes('content')}
+            for index in Content.__table__.indexes:
+                if index.name in NEW_INDEXES and index.name not in existing:
+                    print(f"📝 Creating {index.name}...")
+                    index.create(db.engine)
+
+            print("✅ Content table has the AniList columns")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error adding AniList columns: {e}")
+            db.session.rollback()
+            return False
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print("🔧 Starting database migration...")
+
+    success = add_anilist_columns()
+
+    if success:
+        print("🎉 Migration completed successfully!")
+        print("   Link existing titles with: python catalog_sync.py --match")
+    else:
+        print("💥 Migration failed!")
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Migration script to create the secondary indexes declared in models.py
+on an existing database (db.create_all() only adds them to new tables)
+"""
+
+from app import app, db
+from models import User, Content, Episode, WatchHistory, Notification, NotificationRead, VipDownload
+from sqlalchemy import text, update
+from datetime import datetime
+import logging
+
+INDEXED_MODELS = [User, Content, Episode, WatchHistory, Notification, NotificationRead, VipDownload]
+
+# Older indexes that are strict prefixes of a newer declared index
+SUPERSEDED_INDEXES = {
+    'ix_content_type_created_at': 'ix_content_type_created_at_id',
+    'ix_content_created_at': 'ix_content_created_at_id',
+}
+
+# Keyset pagination walks (created_at, id); rows without created_at would break
+# the cursors, so they get this value (oldest) and the column becomes NOT NULL
+KEYSET_MODELS = [User, Content]
+BACKFILL_CREATED_AT = datetime(1970, 1, 1)
+
+# Unique indexes that fail to build while duplicate rows are still present
+UNIQUE_DUPLICATE_CHECKS = {
+    'uq_episode_content_number': """
+        SELECT COUNT(*) FROM (
+            SELECT content_id, episode_number FROM episode
+            GROUP BY content_id, episode_number HAVING COUNT(*) > 1
+        ) dupes
+    """,
+    'uq_watch_history_user_episode': """
+        SELECT COUNT(*) FROM (
+            SELECT user_id, episode_id FROM watch_history
+            GROUP BY user_id, episode_id HAVING COUNT(*) > 1
+        ) dupes
+    """,
+}
+
+def backfill_created_at():
+    """Give rows without created_at the backfill value and make the column NOT NULL"""
+    for model in KEYSET_MODELS:
+        filled = db.session.execute(
+            update(model).where(model.created_at.is_(None)).values(created_at=BACKFILL_CREATED_AT)
+        ).rowcount
+        if filled:
+            print(f"📝 Backfilled created_at on {filled} {model.__table__.name} rows")
+        if db.engine.dialect.name == 'postgresql':
+            # SQLite cannot alter a column; new rows always get a default there
+            db.session.execute(text(f'ALTER TABLE "{model.__table__.name}" ALTER COLUMN created_at SET NOT NULL'))
+    db.session.commit()
+
+def add_performance_indexes():
+    """Create every declared index that does not exist yet"""
+
+    with app.app_context():
+        created = 0
+        skipped = []
+
+        try:
+            backfill_created_at()
+        except Exception as e:
+            print(f"❌ Error backfilling created_at: {e}")
+            db.session.rollback()
+            skipped.append('created_at backfill')
+
+        for model in INDEXED_MODELS:
+            table = model.__table__
+            existing = {index['name'] for index in db.inspect(db.engine).get_indexes(table.name)}
+
+            for index in sorted(table.indexes, key=lambda i: i.name):
+                if index.name in existing:
+                    print(f"✅ {index.name} already exists")
+                    continue
+
+                duplicate_check = UNIQUE_DUPLICATE_CHECKS.get(index.name)
+                if duplicate_check:
+                    duplicates = db.session.execute(text(duplicate_check)).scalar()
+                    if duplicates:
+                        print(f"⚠️ Skipping {index.name}: {duplicates} duplicate key groups must be merged first (see dedupe_watch_history.py)")
+                        skipped.append(index.name)
+                        continue
+
+                try:
+                    print(f"📝 Creating {index.name} on {table.name}...")
+                    index.create(bind=db.engine, checkfirst=True)
+                    created += 1
+                except Exception as e:
+                    print(f"❌ Error creating {index.name}: {e}")
+                    skipped.append(index.name)
+
+        # Drop superseded indexes once their replacement exists
+        content_indexes = {index['name'] for index in db.inspect(db.engine).get_indexes('content')}
+        for old_name, new_name in SUPERSEDED_INDEXES.items():
+            if old_name in content_indexes and new_name in content_indexes:
+                print(f"📝 Dropping {old_name} (superseded by {new_name})...")
+                with db.engine.begin() as connection:
+                    connection.execute(text(f'DROP INDEX IF EXISTS {old_name}'))
+
+        # Refresh planner statistics so the new indexes are picked up right away
+        if db.engine.dialect.name == 'postgresql':
+            with db.engine.connect() as connection:
+                for model in INDEXED_MODELS:
+                    connection.execute(text(f'ANALYZE "{model.__table__.name}"'))
+                connection.commit()
+
+        print(f"📊 Created {created} indexes, skipped {len(skipped)}")
+        return not skipped
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print("🔧 Starting index migration...")
+
+    success = add_performance_indexes()
+
+    if success:
+        print("🎉 Migration completed successfully!")
+    else:
+        print("💥 Migration finished with skipped indexes!")
+        exit(1)
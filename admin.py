@@ -1,11 +1,17 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
 from functools import wraps
-from models import db, Content, Episode, User, WatchHistory, Notification, SystemSettings
+from models import db, Content, Episode, User, UserStats, WatchHistory, Notification, NotificationReadState, SystemSettings, BackgroundJob
 from notifications import create_notification, notify_admin_message, notify_new_episode, notify_new_content
 from werkzeug.security import generate_password_hash
 from sqlalchemy import text, inspect
 from anilist_integration import anilist_service
+import homepage_rails
+from pagination import paginate_listing
+from job_queue import enqueue, host_of, start_workers
+from episode_import import import_episodes, parse_manifest, ManifestError
+import admin_jobs  # registers the scraping job handlers
+import catalog_sync  # registers the catalog_sync job handler
 
 import logging
 import json
@@ -44,6 +50,10 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def watch_history_viewers(condition):
+    """Users with watch history matching a condition (their stats change when it is deleted)"""
+    return [user_id for (user_id,) in db.session.query(WatchHistory.user_id).filter(condition).distinct()]
+
 @admin_bp.route('/')
 @admin_bp.route('/dashboard')
 @admin_required
@@ -79,7 +89,6 @@ def admin_dashboard():
 @login_required
 @admin_required
 def admin_content():
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
     
     query = Content.query
@@ -92,11 +101,15 @@ def admin_content():
             )
         )
     
-    content = query.order_by(Content.created_at.desc()).paginate(
-        page=page, per_page=10, error_out=False)
+    content = paginate_listing(query, Content, per_page=10)
     
     return render_template('admin/content.html', content=content, search=search)
 
+def _anilist_id(form):
+    """AniList media ID from the content form's hidden field (set by the AniList search)"""
+    value = (form.get('anilist_id') or '').strip()
+    return int(value) if value.isdigit() else None
+
 @admin_bp.route('/content/add', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -111,7 +124,6 @@ def add_content():
                 title=request.form['title'],
                 description=request.form['description'],
                 character_overview=request.form.get('character_overview', ''),
-                genre=request.form['genre'],
                 year=int(request.form['year']),
                 rating=float(request.form['rating']),
                 content_type=request.form['content_type'],
@@ -120,10 +132,13 @@ def add_content():
                 studio=request.form.get('studio', ''),
                 total_episodes=total_episodes,
                 status=request.form.get('status', 'unknown'),
-                is_featured=bool(request.form.get('is_featured'))
+                is_featured=bool(request.form.get('is_featured')),
+                anilist_id=_anilist_id(request.form)
             )
+            content.set_genres(request.form['genre'])
             db.session.add(content)
             db.session.commit()
+            homepage_rails.invalidate()
             
             # Create notification for new content
             notify_new_content(content.title, content.content_type, content.id)
@@ -212,7 +227,7 @@ def edit_content(content_id):
             content.title = request.form['title']
             content.description = request.form['description']
             content.character_overview = request.form.get('character_overview', '')
-            content.genre = request.form['genre']
+            content.set_genres(request.form['genre'])
             content.year = int(request.form['year'])
             content.rating = float(request.form['rating'])
             content.content_type = request.form['content_type']
@@ -222,8 +237,10 @@ def edit_content(content_id):
             content.total_episodes = total_episodes
             content.status = request.form.get('status', 'unknown')
             content.is_featured = bool(request.form.get('is_featured'))
+            content.anilist_id = _anilist_id(request.form)
             
             db.session.commit()
+            homepage_rails.invalidate()
             flash(f'Content "{content.title}" updated successfully!', 'success')
             return redirect(url_for('admin.admin_content'))
         except Exception as e:
@@ -244,7 +261,9 @@ def delete_content(content_id):
         
         # Delete associated watch history first
         watch_history_count = WatchHistory.query.filter_by(content_id=content_id).count()
+        viewers = watch_history_viewers(WatchHistory.content_id == content_id)
         WatchHistory.query.filter_by(content_id=content_id).delete()
+        UserStats.recompute(viewers)
         logging.info(f"Deleted {watch_history_count} watch history records")
         
         # Delete associated episodes
@@ -255,6 +274,7 @@ def delete_content(content_id):
         # Delete the content itself
         db.session.delete(content)
         db.session.commit()
+        homepage_rails.invalidate()
         
         logging.info(f"Successfully deleted content: {content_title}")
         flash(f'Content "{content_title}" and all {episodes_count} episodes deleted successfully!', 'success')
@@ -306,10 +326,10 @@ def add_episode(content_id):
                 video_url=request.form.get('video_url', ''),
                 thumbnail_url=request.form.get('thumbnail_url', ''),
                 description=request.form.get('description', ''),
-                server_m3u8_url=request.form.get('server_m3u8_url', ''),
                 server_embed_url=request.form.get('server_embed_url', ''),
                 iqiyi_play_url=request.form.get('iqiyi_play_url', '')
             )
+            episode.set_m3u8(request.form.get('server_m3u8_url', ''))
             db.session.add(episode)
             db.session.commit()
             
@@ -324,6 +344,42 @@ def add_episode(content_id):
     
     return render_template('admin/episode_form.html', content=content)
 
+@admin_bp.route('/content/<int:content_id>/episodes/import', methods=['POST'])
+@login_required
+@admin_required
+def import_episodes_manifest(content_id):
+    """Bulk import episodes from an uploaded JSON/CSV manifest"""
+    content = Content.query.get_or_404(content_id)
+    manifest = request.files.get('manifest')
+    
+    if not manifest or not manifest.filename:
+        flash('Pilih file manifest JSON atau CSV terlebih dahulu', 'error')
+        return redirect(url_for('admin.manage_episodes', content_id=content_id))
+    
+    try:
+        episodes_data = parse_manifest(manifest.filename, manifest.read())
+        summary = import_episodes(content.id, episodes_data, overwrite=request.form.get('overwrite') == 'on')
+        db.session.commit()
+        
+        if summary['added'] or summary['updated']:
+            homepage_rails.invalidate()
+        
+        logging.info(f"Manifest import for content {content_id}: {len(summary['added'])} added, "
+                     f"{len(summary['updated'])} updated, {len(summary['skipped'])} skipped, {len(summary['failed'])} failed")
+        flash(f"Import selesai: {len(summary['added'])} episode ditambahkan, {len(summary['updated'])} diperbarui, "
+              f"{len(summary['skipped'])} sudah ada, {len(summary['failed'])} gagal", 'success')
+        for failure in summary['failed'][:5]:
+            flash(f"Episode {failure['episode_number']}: {failure['error']}", 'error')
+    except (ManifestError, UnicodeDecodeError) as e:
+        db.session.rollback()
+        flash(f'Manifest tidak valid: {str(e)}', 'error')
+    except Exception as e:
+        db.session.rollback()
+        logging.error(f"Error importing episode manifest: {e}")
+        flash(f'Error importing episodes: {str(e)}', 'error')
+    
+    return redirect(url_for('admin.manage_episodes', content_id=content_id))
+
 @admin_bp.route('/episodes/<int:episode_id>/edit', methods=['GET', 'POST'])
 @login_required
 @admin_required
@@ -345,7 +401,7 @@ def edit_episode(episode_id):
             episode.video_url = request.form.get('video_url', '')
             episode.thumbnail_url = request.form.get('thumbnail_url', '')
             episode.description = request.form.get('description', '')
-            episode.server_m3u8_url = request.form.get('server_m3u8_url', '')
+            episode.set_m3u8(request.form.get('server_m3u8_url', ''))
             episode.server_embed_url = request.form.get('server_embed_url', '')
             episode.iqiyi_play_url = request.form.get('iqiyi_play_url', '')
             
@@ -368,7 +424,9 @@ def delete_episode(episode_id):
     
     try:
         # Delete associated watch history
+        viewers = watch_history_viewers(WatchHistory.episode_id == episode_id)
         WatchHistory.query.filter_by(episode_id=episode_id).delete()
+        UserStats.recompute(viewers)
         
         db.session.delete(episode)
         db.session.commit()
@@ -394,7 +452,9 @@ def bulk_delete_episodes():
             }), 400
         
         # Delete associated watch history for all episodes
+        viewers = watch_history_viewers(WatchHistory.episode_id.in_(episode_ids))
         WatchHistory.query.filter(WatchHistory.episode_id.in_(episode_ids)).delete(synchronize_session=False)
+        UserStats.recompute(viewers)
         
         # Delete episodes
         deleted_count = Episode.query.filter(Episode.id.in_(episode_ids)).delete(synchronize_session=False)
@@ -419,15 +479,13 @@ def bulk_delete_episodes():
 @login_required
 @admin_required
 def admin_users():
-    page = request.args.get('page', 1, type=int)
     search = request.args.get('search', '')
     
     query = User.query
     if search:
         query = query.filter(User.email.contains(search))
     
-    users = query.order_by(User.created_at.desc()).paginate(
-        page=page, per_page=20, error_out=False)
+    users = paginate_listing(query, User, per_page=20)
     
     return render_template('admin/users.html', users=users, search=search)
 
@@ -476,7 +534,7 @@ def edit_content_quick(content_id):
             # Update content details
             content.title = request.form.get('title', content.title)
             content.description = request.form.get('description', content.description)
-            content.genre = request.form.get('genre', content.genre)
+            content.set_genres(request.form.get('genre', content.genre))
             content.year = int(request.form.get('year', content.year))
             content.rating = float(request.form.get('rating', content.rating))
             content.thumbnail_url = request.form.get('thumbnail_url', content.thumbnail_url)
@@ -484,6 +542,7 @@ def edit_content_quick(content_id):
             content.is_featured = bool(request.form.get('is_featured'))
             
             db.session.commit()
+            homepage_rails.invalidate()
             flash(f'Content "{content.title}" updated successfully!', 'success')
             return redirect(url_for('admin.admin_dashboard'))
         except Exception as e:
@@ -569,227 +628,112 @@ def edit_user(user_id):
     
     return render_template('admin/user_form.html', user=user)
 
-# IQiyi Auto Scraping API Endpoints
+def _queued(job):
+    """202 response for an enqueued job; the client polls status_url"""
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': url_for('admin.api_job_status', job_id=job.id),
+        'message': 'Job queued'
+    }), 202
+
+def _iqiyi_url(data):
+    """Validated IQiyi URL from a request body, or an error response"""
+    iqiyi_url = (data or {}).get('iqiyi_url', '').strip()
+    if not iqiyi_url:
+        return None, (jsonify({
+            'success': False,
+            'error': 'URL IQiyi diperlukan'
+        }), 400)
+    
+    # Validasi URL IQiyi
+    if 'iq.com' not in iqiyi_url:
+        return None, (jsonify({
+            'success': False,
+            'error': 'URL harus dari domain iq.com'
+        }), 400)
+    return iqiyi_url, None
+
+# IQiyi Auto Scraping API Endpoints (run as background jobs, see admin_jobs.py)
 @admin_bp.route('/api/scrape-basic', methods=['POST'])
 @login_required
 @admin_required
 def api_scrape_basic():
-    """API endpoint for basic episode scraping without M3U8 extraction"""
-    try:
-        data = request.get_json()
-        if not data:
-            return jsonify({'success': False, 'error': 'No data provided'})
-        
-        iqiyi_url = data.get('iqiyi_url', '').strip()
-        if not iqiyi_url:
-            return jsonify({'success': False, 'error': 'IQiyi URL is required'})
-        
-        # Validasi URL IQiyi
-        if 'iq.com' not in iqiyi_url:
-            return jsonify({
-                'success': False,
-                'error': 'URL harus dari domain iq.com'
-            }), 400
-        
-        batch_size = data.get('batch_size', 10)
-        
-        # Import and use professional scraper
-        from iqiyi import scrape_iqiyi_basic_info
-        result = scrape_iqiyi_basic_info(iqiyi_url, max_episodes=batch_size)
-        
-        if result.get('success'):
-            return jsonify({
-                'success': True,
-                'playlist_data': {
-                    'episodes': result['episodes']
-                },
-                'message': f"Basic scraping successful: {result['message']}. Note: No M3U8 URLs extracted.",
-                'method': 'basic_scraping'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': result.get('error', 'Basic scraping failed'),
-                'suggestion': result.get('suggestion', 'Try again later')
-            })
-            
-    except Exception as e:
-        return jsonify({
-            'success': False,
-            'error': f'Basic scraping error: {str(e)}',
-            'suggestion': 'Even basic scraping failed - network issues'
-        })
+    """Queue basic episode scraping without M3U8 extraction"""
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'success': False, 'error': 'No data provided'}), 400
+    
+    iqiyi_url, error = _iqiyi_url(data)
+    if error:
+        return error
+    
+    job = enqueue('scrape_basic', {
+        'iqiyi_url': iqiyi_url,
+        'batch_size': data.get('batch_size', 10)
+    }, host=host_of(iqiyi_url), created_by=current_user.id)
+    return _queued(job)
 
 @admin_bp.route('/api/scrape-episode', methods=['POST'])
 @login_required
 @admin_required
 def api_scrape_episode():
-    """API endpoint untuk auto scraping single episode dari IQiyi"""
-    try:
-        data = request.get_json()
-        iqiyi_url = data.get('iqiyi_url', '').strip()
-        
-        if not iqiyi_url:
-            return jsonify({
-                'success': False,
-                'error': 'URL IQiyi diperlukan'
-            }), 400
-        
-        # Validasi URL IQiyi
-        if 'iq.com' not in iqiyi_url:
-            return jsonify({
-                'success': False,
-                'error': 'URL harus dari domain iq.com'
-            }), 400
-        
-        # Import professional scraping functions
-        from iqiyi import scrape_single_episode
-        
-        # Scrape single episode using enhanced scraper
-        result = scrape_single_episode(iqiyi_url)
-        
-        if result['success']:
-            return jsonify({
-                'success': True,
-                'episode_data': result['data'],
-                'message': result['message']
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': result.get('error', 'Gagal scraping episode')
-            }), 500
-            
-    except Exception as e:
-        logging.error(f"Error scraping episode: {e}")
-        return jsonify({
-            'success': False,
-            'error': f'Server error: {str(e)}'
-        }), 500
+    """API endpoint untuk auto scraping single episode dari IQiyi (background job)"""
+    iqiyi_url, error = _iqiyi_url(request.get_json(silent=True))
+    if error:
+        return error
+    
+    job = enqueue('scrape_episode', {'iqiyi_url': iqiyi_url}, host=host_of(iqiyi_url), created_by=current_user.id)
+    return _queued(job)
 
 @admin_bp.route('/api/scrape-all-playlist', methods=['POST'])
 @login_required
 @admin_required  
 def api_scrape_all_playlist():
-    """API endpoint untuk auto scraping semua episode dari playlist IQiyi"""
-    try:
-        data = request.get_json()
-        iqiyi_url = data.get('iqiyi_url', '').strip()
-        
-        if not iqiyi_url:
-            return jsonify({
-                'success': False,
-                'error': 'URL IQiyi diperlukan'
-            }), 400
-        
-        # Validasi URL IQiyi
-        if 'iq.com' not in iqiyi_url:
-            return jsonify({
-                'success': False,
-                'error': 'URL harus dari domain iq.com'
-            }), 400
-        
-        # Import professional scraping functions
-        from iqiyi import scrape_all_episodes_playlist
-        
-        # Scrape all episodes from playlist using enhanced scraper
-        max_episodes = data.get('max_episodes', 50)  # Default to 50 if not specified
-        
-        # Enhanced error handling with fallback to basic scraping
-        try:
-            result = scrape_all_episodes_playlist(iqiyi_url, max_episodes=max_episodes)
-        except Exception as e:
-            # Handle all types of network errors gracefully
-            error_msg = str(e).lower()
-            
-            if any(term in error_msg for term in ['ssl', 'certificate', 'handshake']):
-                return jsonify({
-                    'success': False,
-                    'error': 'SSL/Certificate error. IQiyi servers are rejecting secure connections.',
-                    'suggestion': 'This is a server-side issue with IQiyi. Try again later or contact system admin.',
-                    'technical_error': str(e)
-                })
-            elif any(term in error_msg for term in ['timeout', 'timed out', 'time out']):
-                return jsonify({
-                    'success': False,
-                    'error': 'Request timeout. IQiyi servers are too slow to respond.',
-                    'suggestion': 'Try with fewer episodes (5 instead of 15) or try again later.',
-                    'technical_error': str(e)
-                })
-            elif any(term in error_msg for term in ['dns', 'getaddrinfo', 'name resolution', 'resolve']):
-                return jsonify({
-                    'success': False,
-                    'error': 'DNS/Network resolution error. Cannot reach IQiyi servers.',
-                    'suggestion': 'This indicates internet connectivity issues or IQiyi blocking this server.',
-                    'technical_error': str(e)
-                })
-            elif any(term in error_msg for term in ['connection', 'refused', 'unreachable']):
-                return jsonify({
-                    'success': False,
-                    'error': 'Connection refused. IQiyi servers are not accepting connections.',
-                    'suggestion': 'IQiyi may have blocked this server or is temporarily down.',
-                    'technical_error': str(e)
-                })
-            else:
-                # Handle JSON parsing errors specifically
-                if 'unexpected token' in error_msg or 'not valid json' in error_msg:
-                    return jsonify({
-                        'success': False,
-                        'error': 'Network error: Unexpected token \'<\', " <"... is not valid JSON',
-                        'suggestion': 'IQiyi is returning HTML instead of JSON. This indicates server-side blocking or rate limiting.',
-                        'technical_error': str(e)
-                    })
-                
-                # Try fallback to basic scraping
-                print(f"⚠️ Full scraping failed: {str(e)}")
-                print("🔄 Attempting fallback to basic scraping...")
-                
-                try:
-                    # Fallback to professional scraping (no M3U8 extraction)
-                    from iqiyi import scrape_iqiyi_basic_info
-                    fallback_result = scrape_iqiyi_basic_info(iqiyi_url, max_episodes=max_episodes)
-                    
-                    if fallback_result.get('success'):
-                        # Convert fallback scraping format to expected format
-                        return jsonify({
-                            'success': True,
-                            'playlist_data': fallback_result,
-                            'message': f"Fallback scraper used - {fallback_result['message']}. Basic episode info extracted successfully.",
-                            'method': 'fallback_scraping'
-                        })
-                    else:
-                        return jsonify({
-                            'success': False,
-                            'error': f'Both full and fallback scraping failed: {fallback_result.get("error")}',
-                            'suggestion': 'IQiyi servers are completely inaccessible right now. Try again later.',
-                            'technical_error': str(e)
-                        })
-                except Exception as fallback_error:
-                    return jsonify({
-                        'success': False,
-                        'error': f'All scraping methods failed. Original: {str(e)}. Fallback: {str(fallback_error)}',
-                        'suggestion': 'Complete network failure - try again later.',
-                        'technical_error': str(e)
-                    })
-        
-        if result['success']:
-            return jsonify({
-                'success': True,
-                'playlist_data': result,
-                'message': f"Berhasil scrape {result['total_episodes']} episode ({result['valid_episodes']} valid)"
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': result.get('error', 'Gagal scraping playlist')
-            }), 500
-            
-    except Exception as e:
-        logging.error(f"Error scraping playlist: {e}")
-        return jsonify({
-            'success': False,
-            'error': f'Server error: {str(e)}'
-        }), 500
+    """API endpoint untuk auto scraping semua episode dari playlist IQiyi (background job)"""
+    data = request.get_json(silent=True)
+    iqiyi_url, error = _iqiyi_url(data)
+    if error:
+        return error
+    
+    job = enqueue('scrape_playlist', {
+        'iqiyi_url': iqiyi_url,
+        'max_episodes': data.get('max_episodes', 50)  # Default to 50 if not specified
+    }, host=host_of(iqiyi_url), created_by=current_user.id)
+    return _queued(job)
+
+@admin_bp.route('/content/anilist-sync', methods=['POST'])
+@login_required
+@admin_required
+def sync_catalog():
+    """Queue a catalog sync of rating/status/episodes from AniList (see catalog_sync.py)"""
+    job = enqueue('catalog_sync', {'match': True}, host=host_of(catalog_sync.AniListClient.URL),
+                  created_by=current_user.id)
+    flash(f'Sinkronisasi AniList dijadwalkan (job #{job.id}). Hasilnya: {url_for("admin.api_job_status", job_id=job.id)}', 'info')
+    return redirect(url_for('admin.admin_content'))
+
+@admin_bp.route('/api/jobs/<int:job_id>')
+@login_required
+@admin_required
+def api_job_status(job_id):
+    """Status, progress and (once finished) result of a background job"""
+    job = db.session.get(BackgroundJob, job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    
+    if job.status in ('queued', 'running'):
+        # Jobs survive a worker restart; make sure this process is working the queue
+        start_workers()
+    return jsonify({'success': True, 'job': job.to_dict()})
+
+@admin_bp.route('/api/http-stats')
+@login_required
+@admin_required
+def api_http_stats():
+    """Outbound HTTP per host for this worker: requests, latency, errors and connections opened"""
+    import http_client
+    return jsonify({'success': True, 'hosts': http_client.stats()})
 
 @admin_bp.route('/api/auto-add-episodes', methods=['POST'])
 @login_required
@@ -799,7 +743,7 @@ def api_auto_add_episodes():
     try:
         data = request.get_json()
         content_id = data.get('content_id')
-        episodes_data = data.get('episodes_data', [])
+        episodes_data = data.get('episodes_data') or []
         
         logging.info(f"Auto add episodes - Content ID: {content_id}, Episodes count: {len(episodes_data)}")
         
@@ -817,72 +761,12 @@ def api_auto_add_episodes():
                 'error': 'Content tidak ditemukan'
             }), 404
         
-        added_episodes = []
-        failed_episodes = []
-        
-        for index, episode_data in enumerate(episodes_data, 1):
-            try:
-                # Validate and ensure episode_number is provided
-                episode_number = episode_data.get('episode_number')
-                
-                # If episode_number is missing or invalid, auto-generate it
-                if not episode_number or episode_number is None:
-                    # Try to extract from title or URL
-                    title = episode_data.get('title', '')
-                    url = episode_data.get('url', '')
-                    
-                    # Try to extract from title like "Episode 1", "EP01", etc.
-                    episode_match = re.search(r'(?:episode|ep|第)[\s]*(\d+)', title, re.IGNORECASE)
-                    if episode_match:
-                        episode_number = int(episode_match.group(1))
-                    else:
-                        # Use the index as fallback
-                        episode_number = index
-                        logging.warning(f"Episode number missing for '{title}', using index {index}")
-                
-                # Ensure episode_number is an integer
-                episode_number = int(episode_number) if episode_number else index
-                
-                # Check if episode already exists
-                existing_episode = Episode.query.filter_by(
-                    content_id=content_id,
-                    episode_number=episode_number
-                ).first()
-                
-                if existing_episode:
-                    failed_episodes.append({
-                        'episode_number': episode_number,
-                        'title': episode_data.get('title'),
-                        'error': 'Episode sudah ada'
-                    })
-                    continue
-                
-                # Create new episode
-                logging.info(f"Creating episode {episode_number}: {episode_data.get('title')}")
-                
-                new_episode = Episode(
-                    content_id=content_id,
-                    episode_number=episode_number,
-                    title=episode_data.get('title')[:200] if episode_data.get('title') else f"Episode {episode_number}",
-                    description=episode_data.get('description'),  # TEXT field, no limit needed
-                    server_m3u8_url=episode_data.get('m3u8_content'),  # TEXT field, no limit needed
-                    server_embed_url=episode_data.get('url'),  # IQiyi URL sebagai embed fallback
-                    iqiyi_play_url='',  # Server 3 disabled - no iQiyi URLs
-                    thumbnail_url=episode_data.get('thumbnail_url')
-                )
-                
-                db.session.add(new_episode)
-                added_episodes.append({
-                    'episode_number': episode_data.get('episode_number'),
-                    'title': episode_data.get('title')
-                })
-                
-            except Exception as e:
-                failed_episodes.append({
-                    'episode_number': episode_data.get('episode_number', 'Unknown'),
-                    'title': episode_data.get('title', 'Unknown'),
-                    'error': str(e)
-                })
+        # One lookup for existing episode numbers, then chunked multi-row inserts
+        summary = import_episodes(content.id, episodes_data, overwrite=bool(data.get('overwrite')))
+        added_episodes = summary['added'] + summary['updated']
+        failed_episodes = summary['failed'] + [
+            dict(episode, error='Episode sudah ada') for episode in summary['skipped']
+        ]
         
         # Commit changes
         try:
@@ -892,6 +776,9 @@ def api_auto_add_episodes():
             logging.error(f"Database commit error: {e}")
             raise e
         
+        if added_episodes:
+            homepage_rails.invalidate()
+        
         # Create notification for new episodes (disabled for now)
         # if added_episodes:
         #     notify_new_episode(content.title, len(added_episodes))
@@ -929,6 +816,9 @@ def delete_user(user_id):
     try:
         # Delete associated data
         WatchHistory.query.filter_by(user_id=user_id).delete()
+        UserStats.query.filter_by(user_id=user_id).delete()
+        NotificationReadState.query.filter_by(user_id=user_id).delete()
+        BackgroundJob.query.filter_by(created_by=user_id).update({'created_by': None})
         
         db.session.delete(user)
         db.session.commit()
@@ -943,28 +833,46 @@ def delete_user(user_id):
 @login_required
 @admin_required
 def admin_analytics():
-    # Get viewing statistics
-    popular_content = db.session.query(
-        Content.title,
-        db.func.count(WatchHistory.id).label('views')
-    ).join(WatchHistory).group_by(Content.id, Content.title).order_by(
-        db.func.count(WatchHistory.id).desc()
-    ).limit(10).all()
+    """Analytics over a date range, read from the daily rollups (analytics_rollup.py)"""
+    from datetime import date, datetime, timedelta
+    import analytics_rollup
     
-    # Completion rates
-    completion_stats = db.session.query(
-        WatchHistory.status,
-        db.func.count(WatchHistory.id).label('count')
-    ).group_by(WatchHistory.status).all()
+    analytics_rollup.start_rollup_schedule()
     
-    # User statistics
-    total_users = User.query.count()
-    vip_users = User.query.filter(User.subscription_type != 'free').count()
+    # Rollup days are UTC dates
+    today = datetime.utcnow().date()
+    try:
+        end = date.fromisoformat(request.args.get('end', '')) if request.args.get('end') else today
+        start = date.fromisoformat(request.args.get('start', '')) if request.args.get('start') else end - timedelta(days=29)
+    except ValueError:
+        flash('Format tanggal tidak valid, gunakan YYYY-MM-DD', 'error')
+        end, start = today, today - timedelta(days=29)
+    if start > end:
+        start, end = end, start
+    if (end - start).days >= analytics_rollup.MAX_RANGE_DAYS:
+        start = end - timedelta(days=analytics_rollup.MAX_RANGE_DAYS - 1)
+        flash(f'Rentang tanggal dibatasi {analytics_rollup.MAX_RANGE_DAYS} hari', 'info')
+    
+    viewing = analytics_rollup.viewing_series(start, end)
+    downloads = analytics_rollup.download_series(start, end)
+    popular_content = analytics_rollup.top_content(start, end)
+    
+    total_views = sum(viewing['views'])
+    total_completions = sum(viewing['completions'])
+    completion_stats = [
+        {'status': 'completed', 'count': total_completions},
+        {'status': 'on-going', 'count': total_views - total_completions},
+    ]
     
-    # Content statistics
-    total_content = Content.query.count()
-    anime_count = Content.query.filter_by(content_type='anime').count()
-    movie_count = Content.query.filter_by(content_type='movie').count()
+    # User and content totals in one round trip
+    counts = db.session.execute(db.select(
+        db.select(db.func.count(User.id)).scalar_subquery(),
+        db.select(db.func.count(User.id)).where(User.subscription_type != 'free').scalar_subquery(),
+        db.select(db.func.count(Content.id)).scalar_subquery(),
+        db.select(db.func.count(Content.id)).where(Content.content_type == 'anime').scalar_subquery(),
+        db.select(db.func.count(Content.id)).where(Content.content_type == 'movie').scalar_subquery()
+    )).one()
+    total_users, vip_users, total_content, anime_count, movie_count = counts
     
     return render_template('admin/analytics.html',
                          popular_content=popular_content,
@@ -973,7 +881,13 @@ def admin_analytics():
                          vip_users=vip_users,
                          total_content=total_content,
                          anime_count=anime_count,
-                         movie_count=movie_count)
+                         movie_count=movie_count,
+                         start=start,
+                         end=end,
+                         total_views=total_views,
+                         total_watch_hours=round(sum(viewing['watch_hours']), 1),
+                         viewing_series=viewing,
+                         download_series=downloads)
 
 @admin_bp.route('/vip-management')
 @admin_required
@@ -1188,8 +1102,9 @@ def system_settings():
             'status': 'Connected'
         }
         
-        # Get current system settings
+        # Get current system settings (bypass the worker cache so admins always see the stored values)
         from models import SystemSettings
+        SystemSettings.invalidate_cache()
         maintenance_enabled = SystemSettings.get_setting('maintenance_enabled', 'false') == 'true'
         maintenance_message = SystemSettings.get_setting('maintenance_message', '')
         site_logo_url = SystemSettings.get_setting('site_logo_url', '')
@@ -1225,16 +1140,13 @@ def update_system_settings():
         action = request.form.get('action')
         
         if action == 'cleanup_notifications':
-            # Delete notifications older than 30 days
-            from datetime import datetime, timedelta
-            cutoff_date = datetime.utcnow() - timedelta(days=30)
-            old_notifications = Notification.query.filter(Notification.created_at < cutoff_date).all()
-            
-            for notification in old_notifications:
-                db.session.delete(notification)
-            
-            db.session.commit()
-            flash(f'Cleaned up {len(old_notifications)} old notifications.', 'success')
+            # Run the retention job now (chunked set-based deletes)
+            from notification_retention import purge_notifications
+            counts = purge_notifications()
+            if counts is None:
+                flash('Notification cleanup is already running.', 'info')
+            else:
+                flash(f'Cleaned up {counts["notifications"]} old notifications.', 'success')
             
         elif action == 'reset_demo_data':
             # Reset demo data (for testing purposes)
@@ -1260,6 +1172,7 @@ def update_system_settings():
         elif action == 'toggle_maintenance':
             # Quick toggle maintenance mode
             from models import SystemSettings
+            SystemSettings.invalidate_cache()
             current_maintenance = SystemSettings.get_setting('maintenance_enabled', 'false') == 'true'
             new_status = not current_maintenance
             
@@ -1359,118 +1272,33 @@ def extract_iqiyi_m3u8():
 @login_required  
 @admin_required
 def extract_yourupload_video():
-    """Extract direct video URL from YouUpload embed URL"""
-    try:
-        data = request.get_json()
-        embed_url = data.get('embed_url', '').strip()
-        
-        if not embed_url:
-            return jsonify({
-                'success': False,
-                'error': 'YouUpload embed URL is required'
-            }), 400
-        
-        # Validate YouUpload embed URL format
-        if 'yourupload.com/embed/' not in embed_url:
-            return jsonify({
-                'success': False,
-                'error': 'Invalid YouUpload embed URL format'
-            }), 400
-        
-        logging.info(f"Extracting video from YouUpload embed: {embed_url}")
-        
-        # Extract video ID from embed URL
-        import re
-        video_id_match = re.search(r'/embed/([^?/]+)', embed_url)
-        if not video_id_match:
-            return jsonify({
-                'success': False,
-                'error': 'Cannot extract video ID from embed URL'
-            }), 400
-            
-        video_id = video_id_match.group(1)
-        logging.info(f"Extracted video ID: {video_id}")
-        
-        # Try to get the direct video page
-        import requests
-        from bs4 import BeautifulSoup
-        
-        watch_url = f"https://www.yourupload.com/watch/{video_id}"
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-            'Referer': 'https://www.yourupload.com/',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
-        }
-        
-        response = requests.get(watch_url, headers=headers, timeout=10)
-        
-        if response.status_code != 200:
-            return jsonify({
-                'success': False,
-                'error': f'Cannot access YouUpload watch page: {response.status_code}'
-            }), 400
-            
-        # Parse the page to find video URL
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Look for video source in various common patterns
-        video_url = None
-        
-        # Method 1: Look for video tag source
-        video_tag = soup.find('video')
-        if video_tag:
-            source_tag = video_tag.find('source')
-            if source_tag and source_tag.get('src'):
-                video_url = source_tag['src']
-                logging.info("✅ Found video URL in <video><source> tag")
-        
-        # Method 2: Look for JavaScript video configuration
-        if not video_url:
-            script_tags = soup.find_all('script')
-            for script in script_tags:
-                if script.string:
-                    # Look for common video URL patterns in JavaScript
-                    video_patterns = [
-                        r'src["\']?\s*:\s*["\']([^"\']+\.mp4[^"\']*)["\']',
-                        r'video["\']?\s*:\s*["\']([^"\']+\.mp4[^"\']*)["\']',
-                        r'url["\']?\s*:\s*["\']([^"\']+\.mp4[^"\']*)["\']',
-                        r'["\']([^"\']*yourupload[^"\']*\.mp4[^"\']*)["\']'
-                    ]
-                    
-                    for pattern in video_patterns:
-                        matches = re.findall(pattern, script.string, re.IGNORECASE)
-                        if matches:
-                            video_url = matches[0]
-                            logging.info(f"✅ Found video URL in JavaScript: {pattern}")
-                            break
-                    if video_url:
-                        break
-        
-        if video_url:
-            # Make sure URL is absolute
-            if video_url.startswith('//'):
-                video_url = 'https:' + video_url
-            elif video_url.startswith('/'):
-                video_url = 'https://www.yourupload.com' + video_url
-            
-            return jsonify({
-                'success': True,
-                'video_url': video_url,
-                'method': 'page_scraping',
-                'message': 'Direct video URL extracted from YouUpload'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'error': 'Could not find direct video URL on YouUpload page',
-                'fallback_url': watch_url
-            }), 400
-            
-    except Exception as e:
-        logging.error(f"YouUpload video extraction error: {str(e)}")
+    """Queue extraction of the direct video URL from a YouUpload embed URL"""
+    data = request.get_json(silent=True) or {}
+    embed_url = data.get('embed_url', '').strip()
+    
+    if not embed_url:
         return jsonify({
             'success': False,
-            'error': f'Error extracting video: {str(e)}'
-        }), 500
+            'error': 'YouUpload embed URL is required'
+        }), 400
+    
+    # Validate YouUpload embed URL format
+    if 'yourupload.com/embed/' not in embed_url:
+        return jsonify({
+            'success': False,
+            'error': 'Invalid YouUpload embed URL format'
+        }), 400
+    
+    # Extract video ID from embed URL
+    video_id_match = re.search(r'/embed/([^?/]+)', embed_url)
+    if not video_id_match:
+        return jsonify({
+            'success': False,
+            'error': 'Cannot extract video ID from embed URL'
+        }), 400
+    
+    logging.info(f"Queueing YouUpload extraction for video {video_id_match.group(1)}")
+    job = enqueue('extract_yourupload', {'video_id': video_id_match.group(1)},
+                  host='www.yourupload.com', created_by=current_user.id)
+    return _queued(job)
 
@@ -0,0 +1,234 @@
+"""
+Background job handlers for the admin scraping endpoints
+Each handler gets the JSON payload queued by the endpoint and returns the
+response body the endpoint used to send synchronously, so the admin UI can
+render a finished job's result exactly as before. Network failures that may
+clear up on their own raise TransientJobError and are retried by job_queue.
+"""
+
+import logging
+import re
+
+from job_queue import TransientJobError, is_transient, job_handler
+
+YOURUPLOAD_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Referer': 'https://www.yourupload.com/',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8'
+}
+
+def _raise_if_transient(result):
+    """Retry scraper results whose error text points at the network"""
+    if not result.get('success') and is_transient(result.get('error')):
+        raise TransientJobError(result.get('error'), result)
+
+@job_handler('scrape_basic')
+def scrape_basic(payload, report):
+    """Basic episode scraping without M3U8 extraction"""
+    from iqiyi import scrape_iqiyi_basic_info
+
+    report(10, 'Fetching IQiyi playlist')
+    result = scrape_iqiyi_basic_info(payload['iqiyi_url'], max_episodes=payload.get('batch_size', 10))
+    _raise_if_transient(result)
+
+    if result.get('success'):
+        return {
+            'success': True,
+            'playlist_data': {
+                'episodes': result['episodes']
+            },
+            'message': f"Basic scraping successful: {result['message']}. Note: No M3U8 URLs extracted.",
+            'method': 'basic_scraping'
+        }
+    return {
+        'success': False,
+        'error': result.get('error', 'Basic scraping failed'),
+        'suggestion': result.get('suggestion', 'Try again later')
+    }
+
+@job_handler('scrape_episode')
+def scrape_episode(payload, report):
+    """Scrape a single IQiyi episode"""
+    from iqiyi import scrape_single_episode
+
+    report(10, 'Fetching IQiyi episode')
+    result = scrape_single_episode(payload['iqiyi_url'])
+    _raise_if_transient(result)
+
+    if result['success']:
+        return {
+            'success': True,
+            'episode_data': result['data'],
+            'message': result['message']
+        }
+    return {
+        'success': False,
+        'error': result.get('error', 'Gagal scraping episode')
+    }
+
+def _network_error_result(error):
+    """Explain a scraping exception to the admin"""
+    error_msg = str(error).lower()
+
+    if any(term in error_msg for term in ['ssl', 'certificate', 'handshake']):
+        message = 'SSL/Certificate error. IQiyi servers are rejecting secure connections.'
+        suggestion = 'This is a server-side issue with IQiyi. Try again later or contact system admin.'
+    elif any(term in error_msg for term in ['timeout', 'timed out', 'time out']):
+        message = 'Request timeout. IQiyi servers are too slow to respond.'
+        suggestion = 'Try with fewer episodes (5 instead of 15) or try again later.'
+    elif any(term in error_msg for term in ['dns', 'getaddrinfo', 'name resolution', 'resolve']):
+        message = 'DNS/Network resolution error. Cannot reach IQiyi servers.'
+        suggestion = 'This indicates internet connectivity issues or IQiyi blocking this server.'
+    elif any(term in error_msg for term in ['connection', 'refused', 'unreachable']):
+        message = 'Connection refused. IQiyi servers are not accepting connections.'
+        suggestion = 'IQiyi may have blocked this server or is temporarily down.'
+    elif 'unexpected token' in error_msg or 'not valid json' in error_msg:
+        message = 'Network error: Unexpected token \'<\', " <"... is not valid JSON'
+        suggestion = 'IQiyi is returning HTML instead of JSON. This indicates server-side blocking or rate limiting.'
+    else:
+        return None
+
+    return {
+        'success': False,
+        'error': message,
+        'suggestion': suggestion,
+        'technical_error': str(error)
+    }
+
+@job_handler('scrape_playlist')
+def scrape_playlist(payload, report):
+    """Scrape every episode of an IQiyi playlist, falling back to basic scraping"""
+    from iqiyi import scrape_all_episodes_playlist, scrape_iqiyi_basic_info
+
+    iqiyi_url = payload['iqiyi_url']
+    max_episodes = payload.get('max_episodes', 50)
+
+    report(10, 'Fetching IQiyi playlist')
+    try:
+        result = scrape_all_episodes_playlist(iqiyi_url, max_episodes=max_episodes)
+    except Exception as e:
+        failure = _network_error_result(e)
+        if failure is not None:
+            if is_transient(e):
+                raise TransientJobError(str(e), failure) from e
+            return failure
+
+        logging.warning(f"Full scraping failed, attempting fallback to basic scraping: {e}")
+        report(50, 'Full scraping failed, trying basic scraping')
+        try:
+            # Fallback to professional scraping (no M3U8 extraction)
+            fallback_result = scrape_iqiyi_basic_info(iqiyi_url, max_episodes=max_episodes)
+        except Exception as fallback_error:
+            return {
+                'success': False,
+                'error': f'All scraping methods failed. Original: {str(e)}. Fallback: {str(fallback_error)}',
+                'suggestion': 'Complete network failure - try again later.',
+                'technical_error': str(e)
+            }
+
+        if fallback_result.get('success'):
+            return {
+                'success': True,
+                'playlist_data': fallback_result,
+                'message': f"Fallback scraper used - {fallback_result['message']}. Basic episode info extracted successfully.",
+                'method': 'fallback_scraping'
+            }
+        return {
+            'success': False,
+            'error': f'Both full and fallback scraping failed: {fallback_result.get("error")}',
+            'suggestion': 'IQiyi servers are completely inaccessible right now. Try again later.',
+            'technical_error': str(e)
+        }
+
+    _raise_if_transient(result)
+    if result['success']:
+        return {
+            'success': True,
+            'playlist_data': result,
+            'message': f"Berhasil scrape {result['total_episodes']} episode ({result['valid_episodes']} valid)"
+        }
+    return {
+        'success': False,
+        'error': result.get('error', 'Gagal scraping playlist')
+    }
+
+def find_yourupload_video(html):
+    """Direct video URL in a YouUpload watch page, or None"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Method 1: Look for video tag source
+    video_tag = soup.find('video')
+    if video_tag:
+        source_tag = video_tag.find('source')
+        if source_tag and source_tag.get('src'):
+            logging.info("✅ Found video URL in <video><source> tag")
+            return source_tag['src']
+
+    # Method 2: Look for JavaScript video configuration
+    video_patterns = [
+        r'src["\']?\s*:\s*["\']([^"\']+\.mp4[^"\']*)["\']',
+        r'video["\']?\s*:\s*["\']([^"\']+\.mp4[^"\']*)["\']',
+        r'url["\']?\s*:\s*["\']([^"\']+\.mp4[^"\']*)["\']',
+        r'["\']([^"\']*yourupload[^"\']*\.mp4[^"\']*)["\']'
+    ]
+    for script in soup.find_all('script'):
+        if script.string:
+            for pattern in video_patterns:
+                matches = re.findall(pattern, script.string, re.IGNORECASE)
+                if matches:
+                    logging.info(f"✅ Found video URL in JavaScript: {pattern}")
+                    return matches[0]
+    return None
+
+@job_handler('extract_yourupload')
+def extract_yourupload(payload, report):
+    """Extract the direct video URL behind a YouUpload embed"""
+    import requests
+    import http_client
+
+    video_id = payload['video_id']
+    watch_url = f"https://www.yourupload.com/watch/{video_id}"
+
+    report(10, 'Fetching YouUpload watch page')
+    try:
+        response = http_client.get(watch_url, headers=YOURUPLOAD_HEADERS, timeout=10)
+    except (requests.Timeout, requests.ConnectionError) as e:
+        raise TransientJobError(str(e), {
+            'success': False,
+            'error': f'Error extracting video: {str(e)}'
+        }) from e
+
+    if response.status_code >= 500:
+        raise TransientJobError(f'YouUpload returned {response.status_code}', {
+            'success': False,
+            'error': f'Cannot access YouUpload watch page: {response.status_code}'
+        })
+    if response.status_code != 200:
+        return {
+            'success': False,
+            'error': f'Cannot access YouUpload watch page: {response.status_code}'
+        }
+
+    report(60, 'Looking for the video URL')
+    video_url = find_yourupload_video(response.content)
+    if not video_url:
+        return {
+            'success': False,
+            'error': 'Could not find direct video URL on YouUpload page',
+            'fallback_url': watch_url
+        }
+
+    # Make sure URL is absolute
+    if video_url.startswith('//'):
+        video_url = 'https:' + video_url
+    elif video_url.startswith('/'):
+        video_url = 'https://www.yourupload.com' + video_url
+
+    return {
+        'success': True,
+        'video_url': video_url,
+        'method': 'page_scraping',
+        'message': 'Direct video URL extracted from YouUpload'
+    }
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Daily analytics rollups for AniFlix
+Folds watch_history and vip_download into small per-day tables
+(ContentDailyStats, DownloadDailyStats) that the admin analytics page reads, so
+any date range costs one indexed range scan over at most a row per title per
+day instead of a GROUP BY over the whole history.
+
+Each source has a RollupWatermark: days before it are frozen, days from it
+onwards are still open and are recomputed from source rows in that range on
+every run (an index range scan over recent activity only). A watch_history
+row counts on the day of its last_watched, as of the time its day closed.
+
+Runs every 15 minutes in one worker (under an advisory lock) once the
+analytics page has been opened, or from the command line / cron:
+    python analytics_rollup.py            # consume new activity
+    python analytics_rollup.py --rebuild  # recompute every day from scratch
+"""
+
+import argparse
+import logging
+import os
+import sys
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import case, delete, func, insert, select
+from app import app, db
+from models import Content, ContentDailyStats, DownloadDailyStats, RollupWatermark, VipDownload, WatchHistory
+from background_tasks import PeriodicTask, singleton_lock
+
+# Seconds between scheduled runs; 0 disables them (use the CLI from cron instead)
+ROLLUP_INTERVAL = float(os.environ.get('ANALYTICS_ROLLUP_INTERVAL', 900))
+
+# A day is frozen this long after it ends (UTC), so buffered progress still lands in it
+CLOSE_GRACE = timedelta(minutes=30)
+
+# Longest range the dashboard charts (one point per day)
+MAX_RANGE_DAYS = 366
+
+def _as_date(value):
+    """func.date() returns a date on PostgreSQL and an ISO string on SQLite"""
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+def _day_start(moment):
+    return datetime.combine(moment.date(), time.min)
+
+def _rollup_views(since):
+    """Recompute ContentDailyStats for days from `since`; returns the rows written"""
+    day = func.date(WatchHistory.last_watched)
+    rows = db.session.execute(
+        select(
+            day,
+            WatchHistory.content_id,
+            func.count(),
+            func.count(func.distinct(WatchHistory.user_id)),
+            func.sum(case((WatchHistory.completed.is_(True), 1), else_=0)),
+            func.coalesce(func.sum(WatchHistory.watch_time), 0)
+        ).where(WatchHistory.last_watched >= since).group_by(day, WatchHistory.content_id)
+    ).all()
+
+    db.session.execute(delete(ContentDailyStats).where(ContentDailyStats.day >= since.date()))
+    if rows:
+        db.session.execute(insert(ContentDailyStats), [
+            {
+                'day': _as_date(row_day),
+                'content_id': content_id,
+                'views': views,
+                'unique_viewers': viewers,
+                'completions': completions or 0,
+                'watch_seconds': watch_seconds or 0,
+            }
+            for row_day, content_id, views, viewers, completions, watch_seconds in rows
+        ])
+    return len(rows)
+
+def _rollup_downloads(since):
+    """Recompute DownloadDailyStats for days from `since`; returns the rows written"""
+    day = func.date(VipDownload.download_timestamp)
+    rows = db.session.execute(
+        select(
+            day,
+            VipDownload.download_type,
+            func.count(),
+            func.count(func.distinct(VipDownload.user_id))
+        ).where(VipDownload.download_timestamp >= since).group_by(day, VipDownload.download_type)
+    ).all()
+
+    db.session.execute(delete(DownloadDailyStats).where(DownloadDailyStats.day >= since.date()))
+    if rows:
+        db.session.execute(insert(DownloadDailyStats), [
+            {'day': _as_date(row_day), 'download_type': download_type, 'downloads': downloads, 'unique_users': users}
+            for row_day, download_type, downloads, users in rows
+        ])
+    return len(rows)
+
+# Watermark name -> (source timestamp column, rollup function)
+ROLLUPS = {
+    'content_daily_stats': (WatchHistory.last_watched, _rollup_views),
+    'download_daily_stats': (VipDownload.download_timestamp, _rollup_downloads),
+}
+
+def refresh_rollups(rebuild=False):
+    """Bring the daily rollups up to date; returns rows written per rollup
+
+    Returns None when another worker is already running the job.
+    """
+    with singleton_lock('analytics-rollup') as acquired:
+        if not acquired:
+            return None
+
+        now = datetime.utcnow()
+        closed_until = _day_start(now - CLOSE_GRACE)
+        written = {}
+        for name, (source_column, rollup) in ROLLUPS.items():
+            watermark = None if rebuild else db.session.get(RollupWatermark, name)
+            if watermark is not None:
+                since = watermark.processed_until
+            else:
+                # First run (or rebuild): start at the oldest source row
+                oldest = db.session.scalar(select(func.min(source_column)))
+                since = _day_start(oldest) if oldest else closed_until
+
+            written[name] = rollup(since)
+            db.session.merge(RollupWatermark(name=name, processed_until=max(since, closed_until), updated_at=now))
+            # One transaction per rollup: its rows and watermark move together
+            db.session.commit()
+
+        logging.info(f"Analytics rollup: {written}")
+        return written
+
+rollup_task = PeriodicTask('analytics-rollup', ROLLUP_INTERVAL, refresh_rollups)
+
+def start_rollup_schedule():
+    """Schedule the rollup in this worker (started lazily; one worker wins each run)"""
+    if RollupWatermark.query.first() is None:
+        # Nothing rolled up yet: backfill now so the first page view has data
+        refresh_rollups()
+    if ROLLUP_INTERVAL > 0:
+        rollup_task.start()
+
+def _days(start, end):
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+def viewing_series(start, end):
+    """Platform views, completions and watch hours per day in [start, end], zero-filled"""
+    totals = {
+        _as_date(day): (views, completions, watch_seconds)
+        for day, views, completions, watch_seconds in db.session.execute(
+            select(
+                ContentDailyStats.day,
+                func.sum(ContentDailyStats.views),
+                func.sum(ContentDailyStats.completions),
+                func.sum(ContentDailyStats.watch_seconds)
+            ).where(ContentDailyStats.day.between(start, end)).group_by(ContentDailyStats.day)
+        )
+    }
+    days = _days(start, end)
+    return {
+        'labels': [day.isoformat() for day in days],
+        'views': [int(totals.get(day, (0, 0, 0))[0] or 0) for day in days],
+        'completions': [int(totals.get(day, (0, 0, 0))[1] or 0) for day in days],
+        'watch_hours': [round((totals.get(day, (0, 0, 0))[2] or 0) / 3600, 1) for day in days],
+    }
+
+def download_series(start, end):
+    """VIP downloads per type per day in [start, end], zero-filled"""
+    counts = {}
+    for day, download_type, downloads in db.session.execute(
+        select(DownloadDailyStats.day, DownloadDailyStats.download_type, DownloadDailyStats.downloads)
+        .where(DownloadDailyStats.day.between(start, end))
+    ):
+        counts.setdefault(download_type, {})[_as_date(day)] = downloads
+    days = _days(start, end)
+    return {
+        'labels': [day.isoformat() for day in days],
+        'types': {download_type: [by_day.get(day, 0) for day in days] for download_type, by_day in sorted(counts.items())},
+    }
+
+def top_content(start, end, limit=10):
+    """Most viewed titles in [start, end] as (title, views, completions) rows"""
+    views = func.sum(ContentDailyStats.views).label('views')
+    return db.session.execute(
+        select(Content.title, views, func.sum(ContentDailyStats.completions).label('completions'))
+        .join(Content, Content.id == ContentDailyStats.content_id)
+        .where(ContentDailyStats.day.between(start, end))
+        .group_by(Content.id, Content.title)
+        .order_by(views.desc())
+        .limit(limit)
+    ).all()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Update the daily analytics rollups')
+    parser.add_argument('--rebuild', action='store_true', help='recompute every day from scratch')
+    args = parser.parse_args()
+
+    print("🔧 Starting analytics rollup...")
+
+    with app.app_context():
+        try:
+            # Make sure the rollup tables exist on databases created before they were added
+            db.create_all()
+            written = refresh_rollups(rebuild=args.rebuild)
+        except Exception as e:
+            print(f"❌ Error updating analytics rollups: {e}")
+            db.session.rollback()
+            sys.exit(1)
+
+    if written is None:
+        print("⚠️ Another worker is already running the rollup")
+    else:
+        for name, count in written.items():
+            print(f"✅ {name}: {count} day rows recomputed")
+        print("🎉 Rollup completed")
@@ -2,18 +2,31 @@
 """
 Script to analyze popular anime studios from AniList API
 to help determine which studios are most important to include in our database
+
+Also the refresh tool for the studio index (studio_index.py): every fetched
+title is written to studio_index.json with its main studios, and running
+workers reload it automatically.
+
+Usage:
+    python analyze_studios.py [--pages 20]
 """
 
-import requests
+import argparse
 import json
 import logging
 from collections import Counter
 from typing import Dict, List, Any
 
+from rate_limit import rate_limiter
+from studio_index import save_index, STUDIO_ANALYSIS_PATH, STUDIO_INDEX_PATH
+
 logging.basicConfig(level=logging.INFO)
 
-def get_popular_anime_with_studios():
-    """Get popular anime from AniList with their studio information"""
+def get_popular_anime_with_studios(pages=5):
+    """Get popular anime from AniList with their studio information
+
+    Returns (studio counts, studio details, title -> studio names for the index).
+    """
     
     # GraphQL query to get popular anime with studio information
     query = """
@@ -25,6 +38,7 @@ def get_popular_anime_with_studios():
                     romaji
                     english
                 }
+                synonyms
                 studios(isMain: true) {
                     nodes {
                         name
@@ -47,16 +61,18 @@ def get_popular_anime_with_studios():
     all_studios = []
     studio_anime_count = Counter()
     studio_details = {}
+    title_studios = {}
     
-    # Get multiple pages of popular anime
-    for page in range(1, 6):  # Get top 250 popular anime (50 per page)
+    # Get multiple pages of popular anime (50 per page)
+    for page in range(1, pages + 1):
         variables = {
             'page': page,
             'perPage': 50
         }
         
         try:
-            response = requests.post(url, json={'query': query, 'variables': variables})
+            # Shares the AniList request budget with the running app
+            response = rate_limiter.request('anilist', 'POST', url, json={'query': query, 'variables': variables}, timeout=15)
             data = response.json()
             
             if 'data' in data and 'Page' in data['data']:
@@ -66,6 +82,12 @@ def get_popular_anime_with_studios():
                     title = anime['title']['english'] or anime['title']['romaji']
                     studios = anime.get('studios', {}).get('nodes', [])
                     
+                    if studios:
+                        studio_names = ', '.join(studio['name'] for studio in studios)
+                        for name in [anime['title']['english'], anime['title']['romaji'], *(anime.get('synonyms') or [])]:
+                            if name:
+                                title_studios.setdefault(name, studio_names)
+                    
                     for studio in studios:
                         studio_name = studio['name']
                         studio_anime_count[studio_name] += 1
@@ -106,13 +128,13 @@ def get_popular_anime_with_studios():
                 studio_details[studio_name]['total_score'] / studio_details[studio_name]['scored_anime'], 1
             )
     
-    return studio_anime_count, studio_details
+    return studio_anime_count, studio_details, title_studios
 
-def analyze_studios():
-    """Analyze and rank anime studios by importance"""
+def analyze_studios(pages=5):
+    """Analyze and rank anime studios by importance and refresh the studio index"""
     
     print("🎯 Menganalisis studio anime populer dari AniList API...")
-    studio_counts, studio_details = get_popular_anime_with_studios()
+    studio_counts, studio_details, title_studios = get_popular_anime_with_studios(pages)
     
     # Filter studios with at least 2 popular anime
     important_studios = {k: v for k, v in studio_details.items() if v['anime_count'] >= 2}
@@ -183,7 +205,7 @@ def analyze_studios():
         }
     
     # Save results to JSON
-    with open('studio_analysis_results.json', 'w', encoding='utf-8') as f:
+    with open(STUDIO_ANALYSIS_PATH, 'w', encoding='utf-8') as f:
         json.dump({
             'analysis_date': '2025-07-30',
             'total_studios_analyzed': len(studio_details),
@@ -199,7 +221,14 @@ def analyze_studios():
     
     print(f"\n💾 Hasil analisis disimpan ke 'studio_analysis_results.json'")
     
+    if title_studios:
+        count = save_index(title_studios)
+        print(f"💾 Indeks studio ({count} judul) disimpan ke '{STUDIO_INDEX_PATH}'")
+    
     return studio_mapping
 
 if __name__ == "__main__":
-    analyze_studios()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Analyze AniList studios and refresh the studio index')
+    parser.add_argument('--pages', type=int, default=5, help='pages of 50 popular titles to fetch')
+    args = parser.parse_args()
+    analyze_studios(args.pages)
\ No newline at end of file
@@ -5,9 +5,204 @@ Provides functions to search and retrieve anime/manga data from AniList and MyAn
 
 import AnilistPython
 import logging
+import os
+import re
 import requests
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Dict, List, Optional, Any
-import time
+from api_cache import cached
+import http_client
+from rate_limit import INTERACTIVE_RETRIES, INTERACTIVE_WAIT, MAX_RETRIES, MAX_WAIT, RateLimited, rate_limiter
+from studio_index import studio_index
+
+# Cache lifetimes (seconds): fresh, then served stale while refetched in the background
+DAY = 24 * 3600
+SEARCH_TTL, SEARCH_STALE_TTL = DAY, 7 * DAY
+MEDIA_TTL, MEDIA_STALE_TTL = 7 * DAY, 30 * DAY
+STUDIO_TTL, STUDIO_STALE_TTL = 30 * DAY, 90 * DAY
+
+# Seconds a lookup waits for enrichment (trailer, studio) before returning partial results
+ENRICH_DEADLINE = float(os.environ.get('ANIME_ENRICH_DEADLINE', 6))
+
+# Threads shared by all enrichment lookups in this process
+ENRICH_WORKERS = int(os.environ.get('ANIME_ENRICH_WORKERS', 8))
+
+_enrich_pool = ThreadPoolExecutor(max_workers=ENRICH_WORKERS, thread_name_prefix='anime-enrich')
+
+def _is_embed(url):
+    """Only real trailer embeds are cached long; the search-page fallback is retried"""
+    return '/embed/' in (url or '')
+
+def _is_partial(results):
+    """Results with enrichment still pending are returned but never cached"""
+    if isinstance(results, dict):
+        return bool(results.get('pending'))
+    return any(result.get('pending') for result in results or [])
+
+class Enrichment:
+    """A slow lookup that fills one field of a formatted result
+
+    Formatters put these in place of the field value; AnimeDataService._enrich
+    runs all of them in parallel and writes back the result, or `default`
+    when the lookup fails or misses the deadline.
+    """
+
+    def __init__(self, func, *args, default=''):
+        self.func = func
+        self.args = args
+        self.default = default
+
+class AniListError(Exception):
+    """AniList GraphQL request failed (network, HTTP status or GraphQL errors)"""
+
+class AniListClient:
+    """Native AniList GraphQL client
+
+    One request returns everything the Content form needs for a title (media,
+    main studios, trailer, top characters with voice actors), so search and
+    lookup no longer fan out into separate studio, trailer and character calls.
+    Lookups by id are batched with Page(id_in) up to PAGE_SIZE ids per request.
+    """
+
+    URL = 'https://graphql.anilist.co'
+
+    # AniList caps perPage at 50
+    PAGE_SIZE = 50
+
+    # Titles resolved per aliased multi-search request (keeps query complexity low)
+    SEARCH_BATCH = 10
+
+    MEDIA_FIELDS = """
+    fragment media on Media {
+        id
+        idMal
+        title { english romaji native }
+        format
+        status
+        description(asHtml: false)
+        episodes
+        genres
+        averageScore
+        seasonYear
+        startDate { year }
+        coverImage { extraLarge large }
+        siteUrl
+        countryOfOrigin
+        trailer { id site }
+        studios(isMain: true) { nodes { name } }
+        characters(sort: [ROLE, RELEVANCE], perPage: 4) {
+            edges {
+                role
+                voiceActors(language: JAPANESE) { name { full } }
+                node { name { full } image { large } description(asHtml: false) }
+            }
+        }
+    }
+    """
+
+    # Just what the catalog sync compares (see catalog_sync.py)
+    SYNC_FIELDS = """
+    fragment media on Media {
+        id
+        title { english romaji native }
+        synonyms
+        status
+        episodes
+        averageScore
+    }
+    """
+
+    SEARCH_QUERY = MEDIA_FIELDS + """
+    query ($search: String, $perPage: Int) {
+        Page(perPage: $perPage) {
+            media(search: $search, type: ANIME, sort: SEARCH_MATCH) { ...media }
+        }
+    }
+    """
+
+    IDS_QUERY = """
+    query ($ids: [Int], $perPage: Int) {
+        Page(perPage: $perPage) {
+            media(id_in: $ids, type: ANIME) { ...media }
+        }
+    }
+    """
+
+    def __init__(self, timeout: int = 15, max_wait: float = MAX_WAIT, max_retries: int = MAX_RETRIES):
+        self.timeout = timeout
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        self.headers = {
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'User-Agent': 'AniFlix/1.0 (contact@aniflix.com)'
+        }
+
+    def _post(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one GraphQL request and return its `data` object"""
+        try:
+            response = rate_limiter.request('anilist', 'POST', self.URL, json={'query': query, 'variables': variables},
+                                            headers=self.headers, timeout=self.timeout,
+                                            max_wait=self.max_wait, max_retries=self.max_retries)
+        except requests.exceptions.RequestException as e:
+            raise AniListError(f"network error: {e}") from e
+        except RateLimited as e:
+            raise AniListError(str(e)) from e
+
+        if response.status_code != 200:
+            raise AniListError(f"HTTP {response.status_code}: {response.text[:200]}")
+
+        body = response.json()
+        if body.get('errors'):
+            messages = '; '.join(error.get('message', '') for error in body['errors'])
+            raise AniListError(f"GraphQL error: {messages}")
+        return body.get('data') or {}
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Best matches for a title, most relevant first"""
+        data = self._post(self.SEARCH_QUERY, {'search': query, 'perPage': min(limit, self.PAGE_SIZE)})
+        return ((data.get('Page') or {}).get('media') or [])[:limit]
+
+    def search_many(self, titles: List[str], fields: str = MEDIA_FIELDS) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Best match for each title, SEARCH_BATCH titles per request (aliased queries)"""
+        found = {}
+        titles = list(dict.fromkeys(titles))
+        for start in range(0, len(titles), self.SEARCH_BATCH):
+            batch = titles[start:start + self.SEARCH_BATCH]
+            params = ', '.join(f'$s{i}: String' for i in range(len(batch)))
+            aliases = '\n'.join(
+                f'm{i}: Page(perPage: 1) {{ media(search: $s{i}, type: ANIME, sort: SEARCH_MATCH) {{ ...media }} }}'
+                for i in range(len(batch))
+            )
+            query = fields + f'query ({params}) {{\n{aliases}\n}}'
+            data = self._post(query, {f's{i}': title for i, title in enumerate(batch)})
+            for i, title in enumerate(batch):
+                media = (data.get(f'm{i}') or {}).get('media') or []
+                found[title] = media[0] if media else None
+        return found
+
+    def get_many(self, ids: List[int], fields: str = MEDIA_FIELDS) -> Dict[int, Dict[str, Any]]:
+        """Media by AniList id, PAGE_SIZE ids per request; unknown ids are left out
+
+        `fields` is the `media` fragment to select (MEDIA_FIELDS or SYNC_FIELDS).
+        """
+        found = {}
+        ids = list(dict.fromkeys(int(anilist_id) for anilist_id in ids))
+        for start in range(0, len(ids), self.PAGE_SIZE):
+            batch = ids[start:start + self.PAGE_SIZE]
+            data = self._post(fields + self.IDS_QUERY, {'ids': batch, 'perPage': self.PAGE_SIZE})
+            for media in (data.get('Page') or {}).get('media') or []:
+                found[media['id']] = media
+        return found
+
+    def get(self, anilist_id: int) -> Optional[Dict[str, Any]]:
+        return self.get_many([anilist_id]).get(int(anilist_id))
+
+# AniList media status -> Content.status
+ANILIST_STATUS = {
+    'FINISHED': 'completed',
+    'RELEASING': 'ongoing',
+}
 
 class AnimeDataService:
     def __init__(self):
@@ -19,11 +214,64 @@ class AnimeDataService:
         except Exception as e:
             logging.error(f"Failed to initialize AniList integration: {str(e)}")
             self.anilist = None
-        
+
+        # Native GraphQL client for anime search/lookup (AnilistPython is the fallback);
+        # used from admin requests, so it gives up quickly when AniList is throttling
+        self.graphql = AniListClient(timeout=10, max_wait=INTERACTIVE_WAIT, max_retries=INTERACTIVE_RETRIES)
+
         # MyAnimeList will use direct HTTP requests to v4 API
         self.mal_base_url = "https://api.jikan.moe/v4"
         logging.info("MyAnimeList (Jikan v4) integration initialized successfully")
     
+    def _enrich(self, results: List[Dict[str, Any]], deadline: float = None) -> List[Dict[str, Any]]:
+        """
+        Resolve the Enrichment fields of formatted results in parallel
+        
+        All lookups of all results share one deadline. Fields still missing
+        when it passes get their default and are listed under 'pending'; their
+        lookups keep running and land in the API cache for the next request.
+        
+        Args:
+            results: Formatted results (modified in place)
+            deadline: Seconds to wait, ENRICH_DEADLINE by default
+        
+        Returns:
+            The same results
+        """
+        deadline = ENRICH_DEADLINE if deadline is None else deadline
+        slots = [
+            (result, field, value)
+            for result in results if result
+            for field, value in result.items() if isinstance(value, Enrichment)
+        ]
+        if not slots:
+            return results
+        
+        # Identical lookups (same title in several results) run once
+        futures = {}
+        for _, _, lookup in slots:
+            key = (lookup.func, lookup.args)
+            if key not in futures:
+                futures[key] = _enrich_pool.submit(lookup.func, *lookup.args)
+        done, _ = wait(futures.values(), timeout=deadline)
+        
+        for result, field, lookup in slots:
+            future = futures[(lookup.func, lookup.args)]
+            value = lookup.default
+            if future in done:
+                try:
+                    value = future.result() or lookup.default
+                except Exception as e:
+                    logging.debug(f"Enrichment of '{field}' for '{result.get('title')}' failed: {str(e)}")
+            else:
+                result.setdefault('pending', []).append(field)
+            result[field] = value
+        
+        pending = sum(1 for future in futures.values() if future not in done)
+        if pending:
+            logging.info(f"Returned partial anime data: {pending} enrichment lookup(s) still running after {deadline}s")
+        return results
+    
     def search_anime(self, query: str, source: str = "anilist", limit: int = 10) -> List[Dict[str, Any]]:
         """
         Search for anime on specified source and return formatted results
@@ -41,8 +289,43 @@ class AnimeDataService:
         else:
             return self._search_anilist(query, limit)
     
+    @cached('anilist_search', SEARCH_TTL, SEARCH_STALE_TTL, partial=_is_partial)
     def _search_anilist(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
-        """Search anime using AniList API"""
+        """Search anime using AniList API (one GraphQL request per query)"""
+        if not query or not query.strip():
+            return []
+
+        try:
+            media_list = self.graphql.search(query.strip(), limit)
+            return self._enrich([result for result in map(self._format_graphql_media, media_list) if result])
+        except AniListError as e:
+            logging.warning(f"AniList GraphQL search failed for '{query}', using AnilistPython: {e}")
+            return self._search_anilist_legacy(query, limit)
+
+    def search_anime_many(self, titles: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """Best AniList match for each title, resolved in batched GraphQL requests"""
+        try:
+            found = self.graphql.search_many([title.strip() for title in titles if title and title.strip()])
+        except AniListError as e:
+            logging.error(f"AniList GraphQL batch search failed: {e}")
+            return {}
+        formatted = {title: (self._format_graphql_media(media) if media else None) for title, media in found.items()}
+        self._enrich(list(formatted.values()))
+        return formatted
+
+    def get_anime_by_ids(self, anilist_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+        """Formatted anime by AniList id, up to 50 ids per GraphQL request"""
+        try:
+            found = self.graphql.get_many(anilist_ids)
+        except AniListError as e:
+            logging.error(f"AniList GraphQL lookup of {len(anilist_ids)} ids failed: {e}")
+            return {}
+        formatted = {anilist_id: self._format_graphql_media(media) for anilist_id, media in found.items()}
+        self._enrich(list(formatted.values()))
+        return formatted
+
+    def _search_anilist_legacy(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Search anime through AnilistPython (one title per call, enriched separately)"""
         if not self.anilist:
             return []
         
@@ -62,6 +345,7 @@ class AnimeDataService:
             for search_query in search_variations[:2]:  # Limit to first 2 variations
                 try:
                     # Search anime by name
+                    rate_limiter.acquire('anilist', INTERACTIVE_WAIT)
                     anime_data = self.anilist.get_anime(search_query, manual_select=False)
                     
                     if anime_data and isinstance(anime_data, dict):
@@ -76,12 +360,13 @@ class AnimeDataService:
                     logging.debug(f"AniList search variation '{search_query}' failed: {str(search_error)}")
                     continue
             
-            return results
+            return self._enrich(results)
             
         except Exception as e:
             logging.error(f"Error searching anime on AniList '{query}': {str(e)}")
             return []
     
+    @cached('jikan_search', SEARCH_TTL, SEARCH_STALE_TTL, partial=_is_partial)
     def _search_myanimelist(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
         """Search anime using MyAnimeList (Jikan v4) API"""
         try:
@@ -107,15 +392,12 @@ class AnimeDataService:
             
             logging.info(f"Searching MyAnimeList for: '{clean_query}' with params: {params}")
             
-            response = requests.get(url, params=params, headers=headers, timeout=15)
+            # Throttled to Jikan's limits; 429s are retried after Retry-After / backoff
+            response = rate_limiter.request('jikan', 'GET', url, params=params, headers=headers, timeout=10,
+                                            max_wait=INTERACTIVE_WAIT, max_retries=INTERACTIVE_RETRIES)
             
             logging.info(f"MyAnimeList API response: {response.status_code}")
             
-            if response.status_code == 429:  # Rate limited
-                logging.warning("MyAnimeList API rate limited, waiting 2 seconds...")
-                time.sleep(2)
-                response = requests.get(url, params=params, headers=headers, timeout=15)
-            
             if response.status_code != 200:
                 logging.error(f"MyAnimeList API error: {response.status_code}, Response: {response.text[:200]}")
                 return []
@@ -136,15 +418,16 @@ class AnimeDataService:
                     results.append(formatted_result)
             
             logging.info(f"Successfully formatted {len(results)} MyAnimeList results")
-            return results
+            return self._enrich(results)
             
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, RateLimited) as e:
             logging.error(f"Network error searching MyAnimeList for '{query}': {str(e)}")
             return []
         except Exception as e:
             logging.error(f"Error searching anime on MyAnimeList '{query}': {str(e)}")
             return []
     
+    @cached('anilist_media', MEDIA_TTL, MEDIA_STALE_TTL, partial=_is_partial)
     def search_anime_by_id(self, anilist_id: int) -> Optional[Dict[str, Any]]:
         """
         Get anime by AniList ID
@@ -155,21 +438,29 @@ class AnimeDataService:
         Returns:
             Dictionary containing anime information or None
         """
+        try:
+            media = self.graphql.get(anilist_id)
+            return self._enrich([self._format_graphql_media(media)])[0] if media else None
+        except AniListError as e:
+            logging.warning(f"AniList GraphQL lookup failed for ID {anilist_id}, using AnilistPython: {e}")
+
         if not self.anilist:
             return None
         
         try:
+            rate_limiter.acquire('anilist', INTERACTIVE_WAIT)
             anime_data = self.anilist.get_anime_with_id(anilist_id)
             
             if not anime_data:
                 return None
             
-            return self._format_anilist_data(anime_data)
+            return self._enrich([self._format_anilist_data(anime_data)])[0]
             
         except Exception as e:
             logging.error(f"Error getting anime with ID {anilist_id}: {str(e)}")
             return None
     
+    @cached('anilist_manga', MEDIA_TTL, MEDIA_STALE_TTL)
     def search_manga(self, query: str) -> Optional[Dict[str, Any]]:
         """
         Search for manga on AniList (can be used for manhwa/donghua source material)
@@ -184,6 +475,7 @@ class AnimeDataService:
             return None
         
         try:
+            rate_limiter.acquire('anilist', INTERACTIVE_WAIT)
             manga_data = self.anilist.get_manga(query, manual_select=False)
             
             if not manga_data:
@@ -195,6 +487,92 @@ class AnimeDataService:
             logging.error(f"Error searching manga '{query}': {str(e)}")
             return None
     
+    def _format_graphql_media(self, media: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Format an AniList GraphQL Media object for our Content model
+        
+        Everything comes from the one GraphQL response; the local studio mapping
+        is only used when AniList has no studio, and the trailer search (an
+        Enrichment, see _enrich) only when it has no trailer.
+        
+        Args:
+            media: Media object selected with AniListClient.MEDIA_FIELDS
+        
+        Returns:
+            Formatted dictionary for our Content model
+        """
+        try:
+            titles = media.get('title') or {}
+            title = titles.get('english') or titles.get('romaji') or titles.get('native') or 'Unknown Title'
+            
+            if media.get('format') == 'MOVIE':
+                content_type = 'movie'
+            elif media.get('countryOfOrigin') == 'CN':
+                content_type = 'donghua'
+            else:
+                content_type = 'anime'
+            
+            genres = media.get('genres') or []
+            
+            # Descriptions keep <br>/<i> tags even with asHtml: false
+            description = re.sub(r'<[^>]+>', ' ', media.get('description') or '')
+            description = ' '.join(description.split())
+            if len(description) > 1000:
+                description = description[:997] + '...'
+            
+            episodes = media.get('episodes')
+            average_score = media.get('averageScore')
+            cover = media.get('coverImage') or {}
+            
+            trailer = media.get('trailer') or {}
+            if trailer.get('site') == 'youtube' and trailer.get('id'):
+                trailer_url = f"https://www.youtube.com/embed/{trailer['id']}"
+            elif trailer.get('site') == 'dailymotion' and trailer.get('id'):
+                trailer_url = f"https://www.dailymotion.com/embed/video/{trailer['id']}"
+            else:
+                trailer_url = Enrichment(self._find_trailer_url, title)
+            
+            studios = [node['name'] for node in ((media.get('studios') or {}).get('nodes') or []) if node.get('name')]
+            studio = ', '.join(studios) or self._find_studio_info(title)
+            
+            # Reshape character edges into the structure the overview builder reads
+            characters = []
+            for edge in ((media.get('characters') or {}).get('edges') or []):
+                node = edge.get('node') or {}
+                characters.append({
+                    'name': node.get('name') or {},
+                    'role': (edge.get('role') or 'Main').title(),
+                    'image': node.get('image') or {},
+                    'voice_actors': edge.get('voiceActors') or [],
+                    'description': re.sub(r'<[^>]+>|~!|!~', ' ', node.get('description') or '').strip(),
+                })
+            character_overview = self._get_character_overview_anilist(
+                {'characters': characters, 'desc': description}, title, content_type
+            )
+            
+            return {
+                'title': title,
+                'description': description,
+                'character_overview': character_overview,
+                'genre': ', '.join(genres),
+                'genres': genres,
+                'year': media.get('seasonYear') or (media.get('startDate') or {}).get('year'),
+                'rating': round(average_score / 10, 1) if average_score else None,
+                'content_type': content_type,
+                'thumbnail_url': cover.get('extraLarge') or cover.get('large') or '',
+                'trailer_url': trailer_url,
+                'studio': studio,
+                'total_episodes': episodes if episodes and episodes > 0 else None,
+                'status': ANILIST_STATUS.get(media.get('status'), 'unknown'),
+                'anilist_id': media.get('id'),
+                'anilist_url': media.get('siteUrl') or '',
+                'mal_id': media.get('idMal')
+            }
+        
+        except Exception as e:
+            logging.error(f"Error formatting AniList media {media.get('id')}: {str(e)}")
+            return {}
+
     def _format_anilist_data(self, anime_data: Any) -> Dict[str, Any]:
         """
         Format AniList anime data for our application
@@ -229,8 +607,8 @@ class AnimeDataService:
             # Get title (prefer English, fallback to Romaji)
             title = anime_data.get('name_english') or anime_data.get('name_romaji') or 'Unknown Title'
             
-            # Format genres
-            genres = anime_data.get('genres', [])
+            # Format genres (list feeds Content.set_genres, string is kept for display)
+            genres = anime_data.get('genres', []) or []
             genre_str = ', '.join(genres) if genres else ''
             
             # Get description and clean it
@@ -267,9 +645,7 @@ class AnimeDataService:
             
             # If still no studio, try to get it from GraphQL API first, then fallback to mapping
             if not studio:
-                studio = self._get_studio_from_graphql(title)
-                if not studio:
-                    studio = self._find_studio_info(title)
+                studio = Enrichment(self._get_studio_from_graphql, title, default=self._find_studio_info(title))
             
             # Get year from starting_time (format: "4/7/2013")
             year = None
@@ -290,8 +666,8 @@ class AnimeDataService:
             cover_image = anime_data.get('cover_image')
             thumbnail_url = cover_image if cover_image else ''
             
-            # Try to find trailer URL
-            trailer_url = self._find_trailer_url(title)
+            # Try to find trailer URL (resolved in parallel by _enrich)
+            trailer_url = Enrichment(self._find_trailer_url, title)
             
             # Try to get character information from AniList
             character_overview = self._get_character_overview_anilist(anime_data, title, content_type)
@@ -301,6 +677,7 @@ class AnimeDataService:
                 'description': description,
                 'character_overview': character_overview,
                 'genre': genre_str,
+                'genres': genres,
                 'year': year,
                 'rating': rating,
                 'content_type': content_type,
@@ -317,6 +694,7 @@ class AnimeDataService:
             logging.error(f"Error formatting anime data: {str(e)}")
             return {}
     
+    @cached('youtube_trailer', STUDIO_TTL, STUDIO_STALE_TTL, valid=_is_embed)
     def _find_trailer_url(self, title: str) -> str:
         """
         Try to find YouTube trailer URL for the anime using web scraping
@@ -353,7 +731,7 @@ class AnimeDataService:
                         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
                     }
                     
-                    response = requests.get(search_url, headers=headers, timeout=5)
+                    response = http_client.get(search_url, headers=headers, timeout=5)
                     
                     if response.status_code == 200:
                         # Look for video IDs in the response
@@ -377,6 +755,7 @@ class AnimeDataService:
             logging.debug(f"Error finding trailer for '{title}': {str(e)}")
             return ''
     
+    @cached('anilist_studio', STUDIO_TTL, STUDIO_STALE_TTL)
     def _get_studio_from_graphql(self, title: str) -> str:
         """
         Get studio information directly from AniList GraphQL API
@@ -388,8 +767,6 @@ class AnimeDataService:
             Studio name or empty string if not found
         """
         try:
-            import requests
-            
             # GraphQL query to get anime with studio information
             query = """
             query ($search: String) {
@@ -406,7 +783,8 @@ class AnimeDataService:
             url = 'https://graphql.anilist.co'
             variables = {'search': title}
             
-            response = requests.post(url, json={'query': query, 'variables': variables}, timeout=10)
+            response = rate_limiter.request('anilist', 'POST', url, json={'query': query, 'variables': variables}, timeout=10,
+                                            max_wait=INTERACTIVE_WAIT, max_retries=INTERACTIVE_RETRIES)
             
             if response.status_code == 200:
                 data = response.json()
@@ -431,7 +809,8 @@ class AnimeDataService:
     def _find_studio_info(self, title: str) -> str:
         """
         Find studio information based on AniList API analysis data
-        Uses real data from top anime studios by popularity and quality
+        Looks the title up in the studio index (see studio_index.py), which is
+        refreshed by analyze_studios.py
         
         Args:
             title: Anime title
@@ -440,140 +819,12 @@ class AnimeDataService:
             Studio name or empty string if not found
         """
         try:
-            # Studio database based on AniList API analysis - TIER S Studios (Most Important)
-            studio_mappings = {
-                # A-1 Pictures (21 popular anime) - Tier S
-                'sword art online': 'A-1 Pictures',
-                'your lie in april': 'A-1 Pictures',
-                'erased': 'A-1 Pictures',
-                'kaguya-sama': 'A-1 Pictures',
-                'seven deadly sins': 'A-1 Pictures',
-                'fairy tail': 'A-1 Pictures',
-                
-                # bones (20 popular anime) - Tier S
-                'my hero academia': 'bones',
-                'boku no hero academia': 'bones',
-                'fullmetal alchemist': 'bones',
-                'mob psycho 100': 'bones',
-                'noragami': 'bones',
-                'soul eater': 'bones',
-                
-                # MAPPA (16 popular anime) - Tier S
-                'jujutsu kaisen': 'MAPPA',
-                'attack on titan final season': 'MAPPA',
-                'chainsaw man': 'MAPPA',
-                'kakegurui': 'MAPPA',
-                'yuri on ice': 'MAPPA',
-                'vinland saga': 'MAPPA',
-                
-                # MADHOUSE (16 popular anime) - Tier S
-                'death note': 'MADHOUSE',
-                'hunter x hunter': 'MADHOUSE',
-                'one punch man': 'MADHOUSE',
-                'no game no life': 'MADHOUSE',
-                'parasyte': 'MADHOUSE',
-                'overlord': 'MADHOUSE',
-                
-                # J.C.STAFF (14 popular anime) - Tier S
-                'toradora': 'J.C.STAFF',
-                'one punch man season 2': 'J.C.STAFF',
-                'food wars': 'J.C.STAFF',
-                'danmachi': 'J.C.STAFF',
-                'saiki k': 'J.C.STAFF',
-                
-                # Production I.G (12 popular anime) - Tier S
-                'haikyuu': 'Production I.G',
-                'psycho-pass': 'Production I.G',
-                'kuroko no basket': 'Production I.G',
-                'ghost in the shell': 'Production I.G',
-                
-                # WIT STUDIO (11 popular anime) - Tier S
-                'attack on titan': 'WIT STUDIO',
-                'shingeki no kyojin': 'WIT STUDIO',
-                'spy x family': 'WIT STUDIO',
-                'kabaneri': 'WIT STUDIO',
-                
-                # CloverWorks (11 popular anime) - Tier S
-                'the promised neverland': 'CloverWorks',
-                'rascal does not dream': 'CloverWorks',
-                'horimiya': 'CloverWorks',
-                
-                # Kyoto Animation (10 popular anime) - Tier S
-                'violet evergarden': 'Kyoto Animation',
-                'a silent voice': 'Kyoto Animation',
-                'hyouka': 'Kyoto Animation',
-                'k-on': 'Kyoto Animation',
-                'clannad': 'Kyoto Animation',
-                
-                # ufotable (9 popular anime) - Tier S
-                'demon slayer': 'ufotable',
-                'kimetsu no yaiba': 'ufotable',
-                'fate zero': 'ufotable',
-                'fate stay night': 'ufotable',
-                
-                # Studio Pierrot (9 popular anime) - Tier S
-                'naruto': 'Studio Pierrot',
-                'naruto shippuden': 'Studio Pierrot',
-                'tokyo ghoul': 'Studio Pierrot',
-                'bleach': 'Studio Pierrot',
-                'black clover': 'Studio Pierrot',
-                
-                # WHITE FOX (8 popular anime) - Tier S
-                'rezero': 'WHITE FOX',
-                're:zero': 'WHITE FOX',
-                'steins gate': 'WHITE FOX',
-                'goblin slayer': 'WHITE FOX',
-                
-                # TIER A Studios (5-7 popular anime)
-                'jojos bizarre adventure': 'David Production',
-                'fire force': 'David Production',
-                'assassination classroom': 'Lerche',
-                'classroom of the elite': 'Lerche',
-                'dr stone': 'TMS Entertainment',
-                
-                # TIER B Studios (3-4 popular anime)
-                'code geass': 'Sunrise',
-                'cowboy bebop': 'Sunrise',
-                'spirited away': 'Studio Ghibli',
-                'howls moving castle': 'Studio Ghibli',
-                'princess mononoke': 'Studio Ghibli',
-                'totoro': 'Studio Ghibli',
-                'your name': 'CoMix Wave',
-                'weathering with you': 'CoMix Wave',
-                'oregairu': "Brain's Base",
-                'evangelion': 'Gainax',
-                'neon genesis evangelion': 'Gainax',
-                'mushoku tensei': 'Studio Bind',
-                'oshi no ko': 'Doga Kobo',
-                'darling in the franxx': 'TRIGGER',
-                'kill la kill': 'TRIGGER',
-                
-                # Additional major anime
-                'one piece': 'Toei Animation',
-                'dragon ball': 'Toei Animation',
-                'dragon ball z': 'Toei Animation',
-                'dragon ball super': 'Toei Animation',
-                'sailor moon': 'Toei Animation',
-                'pokemon': 'OLM',
-                'komi': 'OLM',
-            }
-            
-            # Search for studio match with improved accuracy
-            title_lower = title.lower().strip()
-            
-            # Direct match first
-            if title_lower in studio_mappings:
-                logging.info(f"Direct studio match for '{title}': {studio_mappings[title_lower]}")
-                return studio_mappings[title_lower]
-            
-            # Partial match
-            for key, studio in studio_mappings.items():
-                if key in title_lower or any(word in title_lower for word in key.split() if len(word) > 3):
-                    logging.info(f"Partial studio match for '{title}': {studio}")
-                    return studio
-            
-            logging.info(f"No studio mapping found for '{title}'")
-            return ''  # No studio information found
+            studio = studio_index.lookup(title)
+            if studio:
+                logging.info(f"Studio index match for '{title}': {studio}")
+            else:
+                logging.info(f"No studio mapping found for '{title}'")
+            return studio
             
         except Exception as e:
             logging.error(f"Error finding studio for '{title}': {str(e)}")
@@ -654,8 +905,12 @@ class AnimeDataService:
             jpg_images = images.get('jpg', {}) if images else {}
             thumbnail_url = jpg_images.get('large_image_url') or jpg_images.get('image_url') or ''
             
-            # Try to find trailer URL
-            trailer_url = self._find_trailer_url(title)
+            # Jikan usually knows the trailer; otherwise search for it (resolved in parallel by _enrich)
+            youtube_id = (anime_data.get('trailer') or {}).get('youtube_id')
+            if youtube_id:
+                trailer_url = f"https://www.youtube.com/embed/{youtube_id}"
+            else:
+                trailer_url = Enrichment(self._find_trailer_url, title)
             
             # Try to get character information from MyAnimeList
             character_overview = self._get_character_overview_mal(anime_data, title, content_type)
@@ -665,6 +920,7 @@ class AnimeDataService:
                 'description': description,
                 'character_overview': character_overview,
                 'genre': genre_str,
+                'genres': genre_list,
                 'year': year,
                 'rating': rating,
                 'content_type': content_type,
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Persistent response cache for external metadata lookups (AniList, Jikan, YouTube)
+Stores JSON results in a local SQLite file shared by all workers, keyed by a
+normalized namespace + arguments key. Each entry is fresh for `ttl` seconds and
+may be served stale for another `stale_ttl` seconds while one background
+thread refetches it. Empty results (nothing found, or a swallowed network
+error) are kept for NEGATIVE_TTL only and never replace a stale good value.
+Partial results (enrichment still running past its deadline) are returned
+but not stored, so the next lookup picks up the completed fields.
+The file is bounded by API_CACHE_MAX_BYTES; least recently used entries are
+evicted first.
+
+Usage:
+    python api_cache.py --stats
+    python api_cache.py --clear [--namespace anilist_search]
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+API_CACHE_PATH = os.environ.get(
+    'API_CACHE_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'api_cache.sqlite3')
+)
+
+# Total size of cached values before least recently used entries are evicted
+API_CACHE_MAX_BYTES = int(os.environ.get('API_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+
+# Seconds an empty result is trusted before the lookup is retried
+NEGATIVE_TTL = 600
+
+# Hits only refresh last_access when it is older than this (keeps reads mostly read-only)
+ACCESS_RESOLUTION = 60
+
+# Check the size bound every this many writes
+EVICT_EVERY = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS api_cache (
+    key TEXT PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    fresh_until REAL NOT NULL,
+    stale_until REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_api_cache_last_access ON api_cache (last_access);
+CREATE INDEX IF NOT EXISTS ix_api_cache_namespace ON api_cache (namespace);
+"""
+
+def _never(value):
+    return False
+
+def normalize_part(value):
+    """Case- and whitespace-insensitive form of a key argument"""
+    if isinstance(value, str):
+        return ' '.join(value.lower().split())
+    return value
+
+def make_key(namespace, *parts):
+    """Cache key for a namespace and its (normalized) arguments"""
+    raw = json.dumps([normalize_part(part) for part in parts], sort_keys=True, default=str)
+    if len(raw) > 200:
+        raw = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f'{namespace}:{raw}'
+
+class ApiCache:
+    """SQLite-backed TTL cache with stale-while-revalidate and LRU eviction"""
+
+    def __init__(self, path=API_CACHE_PATH, max_bytes=API_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._ready = False
+        self._disabled = False
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._writes = 0
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=5)
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    connection.execute('PRAGMA journal_mode=WAL')
+                    connection.executescript(SCHEMA)
+                    self._ready = True
+        return connection
+
+    def _open(self):
+        """Connection to the cache file, or None when the cache is unusable"""
+        if self._disabled:
+            return None
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            return self._connect()
+        except (OSError, sqlite3.Error) as e:
+            logging.error(f"API cache disabled, cannot open {self.path}: {e}")
+            self._disabled = True
+            return None
+
+    def lookup(self, key):
+        """Return (value, state) with state 'fresh', 'stale' or None (miss)"""
+        connection = self._open()
+        if connection is None:
+            return None, None
+        try:
+            with connection:
+                row = connection.execute(
+                    'SELECT value, fresh_until, stale_until, last_access FROM api_cache WHERE key = ?', (key,)
+                ).fetchone()
+                if row is None:
+                    return None, None
+                value, fresh_until, stale_until, last_access = row
+                now = time.time()
+                if now >= stale_until:
+                    return None, None
+                if now - last_access > ACCESS_RESOLUTION:
+                    connection.execute('UPDATE api_cache SET last_access = ? WHERE key = ?', (now, key))
+                return json.loads(value), ('fresh' if now < fresh_until else 'stale')
+        except (sqlite3.Error, ValueError) as e:
+            logging.warning(f"API cache read failed for {key}: {e}")
+            return None, None
+        finally:
+            connection.close()
+
+    def store(self, key, value, ttl, stale_ttl=0):
+        connection = self._open()
+        if connection is None:
+            return
+        namespace = key.split(':', 1)[0]
+        body = json.dumps(value)
+        now = time.time()
+        try:
+            with connection:
+                connection.execute(
+                    'INSERT OR REPLACE INTO api_cache (key, namespace, value, size, fresh_until, stale_until, last_access) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (key, namespace, body, len(body), now + ttl, now + ttl + stale_ttl, now)
+                )
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 1:
+                self.evict(connection)
+        except sqlite3.Error as e:
+            logging.warning(f"API cache write failed for {key}: {e}")
+        finally:
+            connection.close()
+
+    def evict(self, connection=None):
+        """Drop expired entries, then least recently used ones until under 90% of max_bytes"""
+        own = connection is None
+        connection = connection or self._open()
+        if connection is None:
+            return 0
+        try:
+            with connection:
+                evicted = connection.execute('DELETE FROM api_cache WHERE stale_until <= ?', (time.time(),)).rowcount
+                total = connection.execute('SELECT COALESCE(SUM(size), 0) FROM api_cache').fetchone()[0]
+                if total > self.max_bytes:
+                    excess = total - int(self.max_bytes * 0.9)
+                    # Least recently used rows, until their sizes add up to the excess
+                    evicted += connection.execute("""
+                        DELETE FROM api_cache WHERE key IN (
+                            SELECT key FROM (
+                                SELECT key, size, SUM(size) OVER (ORDER BY last_access, key) AS running
+                                FROM api_cache
+                            ) WHERE running - size < ?
+                        )
+                    """, (excess,)).rowcount
+            if evicted:
+                logging.info(f"API cache evicted {evicted} entries")
+            return evicted
+        finally:
+            if own:
+                connection.close()
+
+    def clear(self, namespace=None):
+        connection = self._open()
+        if connection is None:
+            return 0
+        try:
+            with connection:
+                if namespace:
+                    return connection.execute('DELETE FROM api_cache WHERE namespace = ?', (namespace,)).rowcount
+                return connection.execute('DELETE FROM api_cache').rowcount
+        finally:
+            connection.close()
+
+    def stats(self):
+        connection = self._open()
+        if connection is None:
+            return []
+        try:
+            return connection.execute(
+                'SELECT namespace, COUNT(*), COALESCE(SUM(size), 0), SUM(fresh_until > ?) '
+                'FROM api_cache GROUP BY namespace ORDER BY namespace', (time.time(),)
+            ).fetchall()
+        finally:
+            connection.close()
+
+    def _refresh(self, key, fetch, ttl, stale_ttl, valid, partial):
+        try:
+            value = fetch()
+            # A failed or partial refetch keeps serving the stale value until it expires
+            if valid(value) and not partial(value):
+                self.store(key, value, ttl, stale_ttl)
+        except Exception as e:
+            logging.warning(f"API cache refresh failed for {key}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get_or_fetch(self, key, fetch, ttl, stale_ttl=0, valid=bool, partial=_never):
+        """Cached value for `key`, calling `fetch()` on a miss
+
+        A stale hit is returned immediately and refetched on a background
+        thread (once per key per process). Values for which `partial(value)`
+        is true are returned without being stored.
+        """
+        value, state = self.lookup(key)
+        if state == 'fresh':
+            return value
+        if state == 'stale' and valid(value):
+            with self._lock:
+                start = key not in self._refreshing
+                self._refreshing.add(key)
+            if start:
+                threading.Thread(
+                    target=self._refresh, args=(key, fetch, ttl, stale_ttl, valid, partial),
+                    name='api-cache-refresh', daemon=True
+                ).start()
+            return value
+
+        value = fetch()
+        if partial(value):
+            return value
+        if valid(value):
+            self.store(key, value, ttl, stale_ttl)
+        else:
+            self.store(key, value, NEGATIVE_TTL)
+        return value
+
+api_cache = ApiCache()
+
+def cached(namespace, ttl, stale_ttl=0, valid=bool, partial=_never):
+    """Decorate a lookup method so its result is cached by its arguments
+
+    `self` is not part of the key; the result must be JSON-serializable.
+    `valid(result)` tells real results apart from empty ones (negative cache);
+    `partial(result)` marks incomplete results that must not be cached at all.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            key = make_key(namespace, *args, *sorted(kwargs.items()))
+            return api_cache.get_or_fetch(key, lambda: func(self, *args, **kwargs), ttl, stale_ttl, valid, partial)
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Inspect or clear the external API response cache')
+    parser.add_argument('--stats', action='store_true', help='show entries and size per namespace')
+    parser.add_argument('--clear', action='store_true', help='delete cached entries')
+    parser.add_argument('--namespace', help='limit --clear to one namespace')
+    args = parser.parse_args()
+
+    print(f"🔧 API cache at {api_cache.path}")
+    if args.clear:
+        print(f"✅ Deleted {api_cache.clear(args.namespace)} entries")
+    for namespace, entries, size, fresh in api_cache.stats():
+        print(f"   {namespace}: {entries} entries ({fresh} fresh), {size / 1024:.1f} KiB")
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Migration script to backfill the Genre table and content_genre links
+from the legacy comma-separated Content.genre strings
+"""
+
+from app import app, db
+from models import Content, Genre, content_genre
+import logging
+
+BATCH_SIZE = 500
+
+def backfill_genres():
+    """Create Genre rows and link every Content row to its genres"""
+
+    with app.app_context():
+        try:
+            # Make sure the new tables exist on databases created before they were added
+            db.create_all()
+
+            rows = db.session.query(Content.id, Content.genre).filter(
+                Content.genre.isnot(None), Content.genre != ''
+            ).order_by(Content.id).all()
+            print(f"📝 Found {len(rows)} content rows with genre strings")
+
+            parsed = {content_id: Genre.parse(genre) for content_id, genre in rows}
+            all_names = [name for names in parsed.values() for name in names]
+            genres_by_slug = {genre.slug: genre for genre in Genre.get_or_create_many(all_names)}
+            db.session.commit()
+            print(f"✅ {len(genres_by_slug)} genres available")
+
+            existing_links = set(db.session.query(content_genre.c.content_id, content_genre.c.genre_id).all())
+
+            links = []
+            for content_id, names in parsed.items():
+                for name in names:
+                    key = (content_id, genres_by_slug[Genre.slugify(name)].id)
+                    if key not in existing_links:
+                        existing_links.add(key)
+                        links.append({'content_id': key[0], 'genre_id': key[1]})
+
+            for start in range(0, len(links), BATCH_SIZE):
+                db.session.execute(content_genre.insert(), links[start:start + BATCH_SIZE])
+                db.session.commit()
+                print(f"   Linked {min(start + BATCH_SIZE, len(links))}/{len(links)}")
+
+            print(f"✅ Created {len(links)} content-genre links")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error backfilling genres: {e}")
+            db.session.rollback()
+            return False
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print("🔧 Starting genre backfill...")
+
+    success = backfill_genres()
+
+    if success:
+        print("🎉 Migration completed successfully!")
+    else:
+        print("💥 Migration failed!")
+        exit(1)
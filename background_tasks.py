@@ -0,0 +1,106 @@
+"""
+Per-worker periodic background tasks for AniFlix
+Runs maintenance callbacks (buffer flushes, cleanups) on a daemon thread inside
+an application context, and runs them one last time when the worker exits.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+
+class PeriodicTask:
+    """Run a callable every `interval` seconds on a daemon thread
+
+    The thread is started lazily with start(), so importing a module that
+    defines a task (e.g. from a migration script) does not spawn anything.
+    Each run happens inside app.app_context() and its session is removed
+    afterwards so connections go back to the pool.
+    """
+
+    def __init__(self, name, interval, func, run_on_exit=False):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.run_on_exit = run_on_exit
+        self._thread = None
+        self._pid = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        _tasks.append(self)
+
+    def start(self):
+        """Start the worker thread if it is not running in this process yet"""
+        # Threads do not survive fork(), so check the pid as well
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stop_event = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name=f"periodic-{self.name}", daemon=True)
+            self._thread.start()
+            logging.info(f"Started periodic task {self.name} (every {self.interval}s)")
+
+    def run_once(self):
+        """Run the task now in the calling thread"""
+        from app import app, db
+        with app.app_context():
+            try:
+                return self.func()
+            except Exception as e:
+                logging.error(f"Periodic task {self.name} failed: {e}")
+                db.session.rollback()
+            finally:
+                db.session.remove()
+
+    def stop(self):
+        """Stop the thread and, if configured, run the task a final time"""
+        running = self._thread is not None and self._pid == os.getpid()
+        self._stop_event.set()
+        if running and self._thread.is_alive():
+            self._thread.join(timeout=self.interval + 5)
+        if running and self.run_on_exit:
+            self.run_once()
+
+    def _loop(self):
+        while not self._stop_event.wait(self.interval):
+            self.run_once()
+
+@contextmanager
+def singleton_lock(name):
+    """Yield True if this process won the cluster-wide lock for a job
+
+    Every worker runs its own PeriodicTask threads; jobs that must run once per
+    deployment take a PostgreSQL advisory lock on a dedicated connection.
+    Other databases are single-process local copies, so the lock always succeeds.
+    """
+    from app import db
+    from sqlalchemy import text
+
+    if db.engine.dialect.name != 'postgresql':
+        yield True
+        return
+
+    # Transaction-scoped lock: it is held by an open transaction on its own
+    # connection, which also works behind the transaction-mode pooler
+    key = zlib.crc32(name.encode('utf-8'))
+    with db.engine.connect() as connection:
+        acquired = connection.execute(text('SELECT pg_try_advisory_xact_lock(:key)'), {'key': key}).scalar()
+        try:
+            yield bool(acquired)
+        finally:
+            connection.rollback()
+
+_tasks = []
+
+@atexit.register
+def _stop_all_tasks():
+    for task in list(_tasks):
+        try:
+            task.stop()
+        except Exception as e:
+            logging.error(f"Error stopping periodic task {task.name}: {e}")
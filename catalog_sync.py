@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+AniList catalog sync for AniFlix
+Keeps rating, status and total_episodes of titles linked to AniList
+(Content.anilist_id) current. Linked titles are fetched 50 per GraphQL
+Page(id_in) request and compared with the database; only changed fields are
+written, with one bulk UPDATE per batch. Every checked title gets
+anilist_synced_at, and a run skips titles checked within SYNC_MAX_AGE, so an
+interrupted run carries on where it stopped when it is started again.
+
+Titles imported before the link existed can be matched by exact title
+first (--match). Runs nightly from cron, or as a background job queued from
+the admin content page:
+    python catalog_sync.py                         # sync linked titles
+    python catalog_sync.py --match                 # link unlinked titles, then sync
+    python catalog_sync.py --report changes.json   # also write the change report
+"""
+
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import or_, select, update
+from app import app, db
+from models import Content
+from anilist_integration import ANILIST_STATUS, AniListClient, AniListError
+from job_queue import TransientJobError, job_handler
+import homepage_rails
+
+# Fields owned by AniList once a title is linked
+SYNC_FIELDS = ('rating', 'status', 'total_episodes')
+
+# Titles checked within this window are skipped (also what makes runs resumable)
+SYNC_MAX_AGE = timedelta(hours=float(os.environ.get('CATALOG_SYNC_MAX_AGE_HOURS', 20)))
+
+# Changes kept in a background job's result (the CLI report has all of them)
+JOB_REPORT_LIMIT = 200
+
+def remote_values(media):
+    """Content field values from an AniList media, leaving out what AniList doesn't know"""
+    values = {}
+    if media.get('averageScore'):
+        values['rating'] = round(media['averageScore'] / 10, 1)
+    if ANILIST_STATUS.get(media.get('status')):
+        values['status'] = ANILIST_STATUS[media['status']]
+    if media.get('episodes'):
+        values['total_episodes'] = media['episodes']
+    return values
+
+def _normalize_title(title):
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', (title or '').lower()).split())
+
+def _media_titles(media):
+    titles = media.get('title') or {}
+    names = [titles.get('english'), titles.get('romaji'), titles.get('native'), *(media.get('synonyms') or [])]
+    return {_normalize_title(name) for name in names if name}
+
+def match_unlinked(client=None, limit=None):
+    """Link titles without anilist_id to the AniList search result whose title matches exactly
+
+    Returns (linked, unmatched) counts.
+    """
+    client = client or AniListClient()
+    query = select(Content.id, Content.title).where(Content.anilist_id.is_(None)).order_by(Content.id)
+    if limit:
+        query = query.limit(limit)
+    rows = db.session.execute(query).all()
+
+    linked = 0
+    for start in range(0, len(rows), AniListClient.PAGE_SIZE):
+        batch = rows[start:start + AniListClient.PAGE_SIZE]
+        found = client.search_many([title for _, title in batch], fields=AniListClient.SYNC_FIELDS)
+        links = [
+            {'id': content_id, 'anilist_id': found[title]['id']}
+            for content_id, title in batch
+            if found.get(title) and _normalize_title(title) in _media_titles(found[title])
+        ]
+        if links:
+            db.session.execute(update(Content), links)
+        db.session.commit()
+        linked += len(links)
+        logging.info(f"Catalog match: {start + len(batch)}/{len(rows)} checked, {linked} linked")
+
+    return linked, len(rows) - linked
+
+def sync_catalog(client=None, max_age=SYNC_MAX_AGE, limit=None, progress=None):
+    """Refresh SYNC_FIELDS of linked titles not checked within max_age
+
+    Returns a report dict: checked, updated, missing (AniList ids that no
+    longer resolve), per-field counts and the list of changes.
+    """
+    client = client or AniListClient()
+    cutoff = datetime.utcnow() - max_age
+    due = (
+        Content.anilist_id.isnot(None),
+        or_(Content.anilist_synced_at.is_(None), Content.anilist_synced_at < cutoff),
+    )
+    total = db.session.scalar(select(db.func.count()).select_from(Content).where(*due))
+    if limit:
+        total = min(total, limit)
+
+    report = {'checked': 0, 'updated': 0, 'missing': [], 'fields': dict.fromkeys(SYNC_FIELDS, 0), 'changes': []}
+    while report['checked'] < total:
+        size = min(AniListClient.PAGE_SIZE, total - report['checked'])
+        rows = db.session.execute(
+            select(Content.id, Content.title, Content.anilist_id, *(getattr(Content, field) for field in SYNC_FIELDS))
+            .where(*due).order_by(Content.id).limit(size)
+        ).all()
+        if not rows:
+            break
+
+        # An AniList failure raises here; titles already synced stay synced
+        media_by_id = client.get_many([row.anilist_id for row in rows], fields=AniListClient.SYNC_FIELDS)
+        now = datetime.utcnow()
+
+        params = []
+        for row in rows:
+            values = {'id': row.id, 'anilist_synced_at': now}
+            media = media_by_id.get(row.anilist_id)
+            if media is None:
+                report['missing'].append({'content_id': row.id, 'title': row.title, 'anilist_id': row.anilist_id})
+            else:
+                for field, new in remote_values(media).items():
+                    old = getattr(row, field)
+                    if old != new:
+                        values[field] = new
+                        report['fields'][field] += 1
+                        report['changes'].append({
+                            'content_id': row.id, 'title': row.title, 'field': field, 'old': old, 'new': new
+                        })
+                if len(values) > 2:
+                    report['updated'] += 1
+            params.append(values)
+
+        # Rows with the same changed columns are adjacent, so each set is one executemany
+        params.sort(key=lambda values: sorted(values))
+        db.session.execute(update(Content), params)
+        db.session.commit()
+        report['checked'] += len(rows)
+        if progress:
+            progress(report['checked'] * 100 // max(total, 1), f"{report['checked']}/{total} titles checked")
+
+    if report['updated']:
+        homepage_rails.invalidate()
+
+    logging.info(f"Catalog sync: {report['checked']} checked, {report['updated']} updated, "
+                 f"{len(report['missing'])} missing on AniList")
+    return report
+
+@job_handler('catalog_sync')
+def catalog_sync_job(payload, report):
+    """Background job version of the CLI (queued from the admin content page)"""
+    try:
+        linked = None
+        if payload.get('match'):
+            report(0, 'Matching unlinked titles')
+            linked, _ = match_unlinked()
+        result = sync_catalog(progress=report)
+    except AniListError as e:
+        # A retried job resumes: titles synced before the failure are skipped
+        raise TransientJobError(str(e))
+
+    changes = result.pop('changes')
+    return {
+        'success': True,
+        'linked': linked,
+        **result,
+        'changes': changes[:JOB_REPORT_LIMIT],
+        'changes_total': len(changes),
+    }
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Refresh rating/status/episode counts from AniList')
+    parser.add_argument('--match', action='store_true', help='link titles without anilist_id by exact title first')
+    parser.add_argument('--limit', type=int, help='check at most this many titles')
+    parser.add_argument('--all', action='store_true', help='ignore the last sync time and check every linked title')
+    parser.add_argument('--report', help='write the change report to this JSON file')
+    args = parser.parse_args()
+
+    print("🔧 Starting AniList catalog sync...")
+
+    with app.app_context():
+        try:
+            if args.match:
+                linked, unmatched = match_unlinked(limit=args.limit)
+                print(f"✅ Linked {linked} titles ({unmatched} without an exact AniList match)")
+            result = sync_catalog(max_age=timedelta(0) if args.all else SYNC_MAX_AGE, limit=args.limit)
+        except Exception as e:
+            print(f"❌ Error syncing catalog: {e}")
+            db.session.rollback()
+            sys.exit(1)
+
+    for change in result['changes']:
+        print(f"   {change['title']}: {change['field']} {change['old']} → {change['new']}")
+    for missing in result['missing']:
+        print(f"⚠️ {missing['title']}: AniList id {missing['anilist_id']} not found")
+    print(f"✅ Checked {result['checked']} titles, updated {result['updated']} "
+          f"({', '.join(f'{field}: {count}' for field, count in result['fields'].items())})")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2, ensure_ascii=False, default=str)
+        print(f"💾 Change report written to {args.report}")
+    print("🎉 Catalog sync completed")
@@ -1,79 +1,73 @@
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash
+from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, Response, abort
 from flask_login import login_required, current_user
-from models import Content, Episode, WatchHistory
+from models import Content, Episode, WatchHistory, Genre, PlaylistBlob, UserStats, content_genre
 from app import db
+from search_service import search_content
+from progress_buffer import progress_buffer
+from pagination import paginate_listing
+from recommendations import similar_content
+from homepage_rails import get_rails
 import logging
 
 content_bp = Blueprint('content', __name__)
 
+def filter_by_genre(query, genre_name):
+    """Restrict a Content query to one genre through the indexed content_genre join"""
+    return query.join(Content.genres).filter(Genre.slug == Genre.slugify(genre_name))
+
 @content_bp.route('/movies')
 def movies_list():
-    page = request.args.get('page', 1, type=int)
     genre = request.args.get('genre')
     search = request.args.get('search')
     
     query = Content.query.filter_by(content_type='movie')
     
     if genre:
-        query = query.filter(Content.genre.contains(genre))
+        query = filter_by_genre(query, genre)
     
     if search:
         query = query.filter(Content.title.contains(search))
     
-    movies_list = query.order_by(Content.created_at.desc()).paginate(
-        page=page, per_page=12, error_out=False
-    )
+    movies_list = paginate_listing(query, Content, per_page=12)
     
     return render_template('movies_list.html', movies_list=movies_list, genre=genre, search=search)
 
 @content_bp.route('/genres')
 def genres():
-    # Get all unique genres
-    genres = db.session.query(Content.genre).distinct().all()
-    genre_list = []
-    for g in genres:
-        if g[0]:
-            # Split genres by comma and add to list
-            for genre in g[0].split(','):
-                clean_genre = genre.strip()
-                if clean_genre and clean_genre not in genre_list:
-                    genre_list.append(clean_genre)
-    
-    genre_list.sort()
+    # Get every genre that is attached to at least one title
+    in_use = db.session.query(content_genre.c.genre_id).filter(
+        content_genre.c.genre_id == Genre.id
+    ).exists()
+    genre_list = [name for (name,) in db.session.query(Genre.name).filter(in_use).order_by(Genre.name)]
+    
     return render_template('genres.html', genres=genre_list)
 
 @content_bp.route('/genre/<genre_name>')
 def genre_content(genre_name):
-    page = request.args.get('page', 1, type=int)
     
-    content_list = Content.query.filter(Content.genre.contains(genre_name)).order_by(
-        Content.created_at.desc()).paginate(page=page, per_page=12, error_out=False)
+    content_list = paginate_listing(filter_by_genre(Content.query, genre_name), Content, per_page=12)
     
     return render_template('genre_content.html', content_list=content_list, genre_name=genre_name)
 
 @content_bp.route('/anime')
 def anime_list():
-    page = request.args.get('page', 1, type=int)
     genre = request.args.get('genre')
     search = request.args.get('search')
     
     query = Content.query.filter_by(content_type='anime')
     
     if genre:
-        query = query.filter(Content.genre.contains(genre))
+        query = filter_by_genre(query, genre)
     
     if search:
         query = query.filter(Content.title.contains(search))
     
-    anime_list = query.order_by(Content.created_at.desc()).paginate(
-        page=page, per_page=12, error_out=False
-    )
+    anime_list = paginate_listing(query, Content, per_page=12)
     
     return render_template('anime_list.html', anime_list=anime_list, genre=genre, search=search)
 
 @content_bp.route('/donghua')
 def donghua_list():
-    page = request.args.get('page', 1, type=int)
     genre = request.args.get('genre')
     search = request.args.get('search')
     
@@ -81,14 +75,12 @@ def donghua_list():
     query = Content.query.filter_by(content_type='donghua')
     
     if genre:
-        query = query.filter(Content.genre.contains(genre))
+        query = filter_by_genre(query, genre)
     
     if search:
         query = query.filter(Content.title.contains(search))
     
-    donghua_list = query.order_by(Content.created_at.desc()).paginate(
-        page=page, per_page=12, error_out=False
-    )
+    donghua_list = paginate_listing(query, Content, per_page=12)
     
     return render_template('donghua_list.html', donghua_list=donghua_list, genre=genre, search=search)
 
@@ -125,38 +117,33 @@ def watch_episode(episode_id):
     can_watch_full = current_user.can_watch_full_episode(episode.episode_number)
     max_watch_time = current_user.get_max_watch_time(episode.episode_number)
     
-    # Get watch history
-    watch_history = WatchHistory.query.filter_by(
-        user_id=current_user.id,
-        episode_id=episode_id
-    ).first()
-    
-    if not watch_history:
-        watch_history = WatchHistory(
-            user_id=current_user.id,
-            content_id=content.id,
-            episode_id=episode_id
+    # Get or create watch history in a single INSERT ... ON CONFLICT statement
+    previous = UserStats.progress_snapshot([(current_user.id, episode_id)])
+    watch_history = WatchHistory.upsert(current_user.id, episode_id, content.id)
+    if not previous:
+        UserStats.record_progress([{'user_id': current_user.id, 'episode_id': episode_id}], previous)
+    db.session.commit()
+    
+    # Resume from the latest heartbeat even if it has not been flushed yet
+    progress_buffer.overlay(watch_history)
+    
+    # Get similar anime from the precomputed neighbour table
+    similar_anime = similar_content(content.id, limit=6, content_type='anime')
+    if not similar_anime:
+        # Not refreshed yet (e.g. a brand new title): same primary genre
+        similar_query = Content.query.filter(
+            Content.id != content.id,
+            Content.content_type == 'anime'
         )
-        db.session.add(watch_history)
-        db.session.commit()
-    
-    # Get similar anime (same genre)
-    similar_anime = Content.query.filter(
-        Content.genre.contains(content.genre.split(', ')[0]),
-        Content.id != content.id,
-        Content.content_type == 'anime'
-    ).order_by(Content.rating.desc()).limit(6).all()
-    
-    # Get trending anime (highest rated recent content)
-    trending_anime = Content.query.filter(
-        Content.content_type == 'anime',
-        Content.id != content.id
-    ).order_by(Content.rating.desc()).limit(3).all()
-    
-    # Get recommended movies
-    recommended_movies = Content.query.filter(
-        Content.content_type == 'movie'
-    ).order_by(Content.rating.desc()).limit(5).all()
+        primary_genre = Genre.parse(content.genre)[:1]
+        if primary_genre:
+            similar_query = filter_by_genre(similar_query, primary_genre[0])
+        similar_anime = similar_query.order_by(Content.rating.desc()).limit(6).all()
+    
+    # Trending anime and recommended movies come from the homepage rails snapshot
+    rails = get_rails()
+    trending_anime = [card for card in rails['top_rated_anime'] if card['id'] != content.id][:3]
+    recommended_movies = rails['top_rated_movies'][:5]
     
     # Calculate progress percentage correctly
     total_episodes = content.total_episodes if content.total_episodes and content.total_episodes > 0 else len(content.episodes)
@@ -178,6 +165,26 @@ def watch_episode(episode_id):
 
 
 
+@content_bp.route('/episode/<int:episode_id>/playlist.m3u8')
+@login_required
+def episode_playlist(episode_id):
+    """Serve an episode's stored M3U8 playlist body"""
+    blob = PlaylistBlob.query.join(
+        Episode, Episode.playlist_id == PlaylistBlob.id
+    ).filter(Episode.id == episode_id).first()
+    if not blob:
+        abort(404)
+    
+    # Content-addressed: the hash is a strong ETag, and a match skips loading the body
+    if blob.sha256 in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(blob.text, mimetype='application/vnd.apple.mpegurl')
+    response.set_etag(blob.sha256)
+    response.cache_control.private = True
+    response.cache_control.max_age = 3600
+    return response
+
 @content_bp.route('/api/update-watch-progress', methods=['POST'])
 @login_required
 def update_watch_progress():
@@ -190,12 +197,14 @@ def update_watch_progress():
     if not episode_id:
         return jsonify({'success': False, 'message': 'Episode ID required'})
     
-    episode = Episode.query.get(episode_id)
-    if not episode:
+    # Cached (content_id, episode_number) lookup, no query per heartbeat
+    episode_info = progress_buffer.episode_info(episode_id)
+    if not episode_info:
         return jsonify({'success': False, 'message': 'Episode not found'})
+    content_id, episode_number = episode_info
     
     # Check time limits for free users
-    max_watch_time = current_user.get_max_watch_time(episode.episode_number)
+    max_watch_time = current_user.get_max_watch_time(episode_number)
     if max_watch_time and watch_time > max_watch_time * 60:  # Convert minutes to seconds
         return jsonify({'success': False, 'message': 'Watch time limit exceeded'})
     
@@ -211,32 +220,18 @@ def update_watch_progress():
     else:
         completed = False
     
-    # Update or create watch history
-    watch_history = WatchHistory.query.filter_by(
-        user_id=current_user.id,
-        episode_id=episode_id
-    ).first()
-    
-    if not watch_history:
-        watch_history = WatchHistory(
+    # Buffer the heartbeat; the write-behind flusher upserts it in the next batch
+    try:
+        progress_buffer.record(
             user_id=current_user.id,
-            content_id=episode.content_id,
-            episode_id=episode_id
+            episode_id=episode_id,
+            content_id=content_id,
+            watch_time=watch_time,
+            completed=completed
         )
-        db.session.add(watch_history)
-    
-    # Store watch_time as integer (seconds)
-    watch_history.watch_time = int(watch_time)
-    watch_history.completed = completed
-    watch_history.status = 'completed' if completed else 'on-going'
-    watch_history.last_watched = db.func.now()
-    
-    try:
-        db.session.commit()
         return jsonify({'success': True})
     except Exception as e:
         logging.error(f"Error updating watch progress: {e}")
-        db.session.rollback()
         return jsonify({'success': False, 'message': 'Failed to update progress'})
 
 @content_bp.route('/search')
@@ -245,15 +240,8 @@ def search():
     if not query or len(query.strip()) < 2:
         return jsonify([])
     
-    # Search in title, description, and genre with case-insensitive matching
-    search_term = f"%{query.lower()}%"
-    results = Content.query.filter(
-        db.or_(
-            db.func.lower(Content.title).like(search_term),
-            db.func.lower(Content.description).like(search_term),
-            db.func.lower(Content.genre).like(search_term)
-        )
-    ).order_by(Content.rating.desc()).limit(8).all()
+    # Full-text search over title, genre and description, ranked by relevance
+    results = search_content(query, limit=8)
     
     return jsonify([{
         'id': content.id,
@@ -274,27 +262,15 @@ def api_search():
     if len(query) < 2:
         return jsonify({'results': [], 'total': 0})
     
-    # Single optimized database query with ranking
-    search_term = f"%{query.lower()}%"
+    # Single indexed full-text query, ordered by weighted relevance
+    all_results = search_content(query, limit=8)
     
-    # Use a single query with CASE-based ranking for better performance
-    results = db.session.query(Content).filter(
-        db.or_(
-            db.func.lower(Content.title).like(search_term),
-            db.func.lower(Content.description).like(search_term),
-            db.func.lower(Content.genre).like(search_term)
-        )
-    ).order_by(
-        # Priority ranking: exact title match first, then by rating
-        db.case(
-            (db.func.lower(Content.title).like(search_term), 1),
-            else_=2
-        ),
-        Content.rating.desc(),
-        Content.created_at.desc()
-    ).limit(8).all()
-    
-    all_results = results
+    # Episode counts for all results in one grouped query
+    episode_counts = dict(db.session.query(
+        Episode.content_id, db.func.count(Episode.id)
+    ).filter(
+        Episode.content_id.in_([content.id for content in all_results])
+    ).group_by(Episode.content_id).all()) if all_results else {}
     
     return jsonify({
         'results': [{
@@ -307,7 +283,7 @@ def api_search():
             'rating': content.rating,
             'thumbnail': content.thumbnail_url,
             'url': url_for('content.anime_redirect', content_id=content.id) if content.content_type == 'anime' else '#',
-            'episode_count': len(content.episodes) if content.episodes else 0
+            'episode_count': episode_counts.get(content.id, 0)
         } for content in all_results],
         'total': len(all_results),
         'query': query
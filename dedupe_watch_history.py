@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Migration script to merge duplicate WatchHistory rows and add the unique
+(user_id, episode_id) index required by the atomic upsert path
+"""
+
+from app import app, db
+from models import WatchHistory
+from sqlalchemy import text
+import logging
+
+BATCH_SIZE = 500
+
+def dedupe_watch_history():
+    """Merge duplicate user/episode rows into one and create the unique index"""
+
+    with app.app_context():
+        try:
+            # Every duplicate group collapses into its most recently watched row,
+            # keeping the furthest watch position and any completion
+            groups = db.session.query(
+                WatchHistory.user_id,
+                WatchHistory.episode_id,
+                db.func.max(WatchHistory.watch_time).label('watch_time'),
+                db.func.max(db.case((WatchHistory.completed.is_(True), 1), else_=0)).label('completed'),
+                db.func.max(WatchHistory.last_watched).label('last_watched')
+            ).group_by(
+                WatchHistory.user_id, WatchHistory.episode_id
+            ).having(db.func.count(WatchHistory.id) > 1).all()
+            print(f"📝 Found {len(groups)} duplicate user/episode groups")
+
+            removed = 0
+            for start in range(0, len(groups), BATCH_SIZE):
+                for group in groups[start:start + BATCH_SIZE]:
+                    keeper_id = db.session.query(WatchHistory.id).filter_by(
+                        user_id=group.user_id, episode_id=group.episode_id
+                    ).order_by(
+                        WatchHistory.last_watched.desc().nulls_last(), WatchHistory.id.desc()
+                    ).limit(1).scalar()
+
+                    completed = bool(group.completed)
+                    WatchHistory.query.filter_by(id=keeper_id).update({
+                        WatchHistory.watch_time: group.watch_time,
+                        WatchHistory.completed: completed,
+                        WatchHistory.status: 'completed' if completed else 'on-going',
+                        WatchHistory.last_watched: group.last_watched
+                    }, synchronize_session=False)
+
+                    removed += WatchHistory.query.filter(
+                        WatchHistory.user_id == group.user_id,
+                        WatchHistory.episode_id == group.episode_id,
+                        WatchHistory.id != keeper_id
+                    ).delete(synchronize_session=False)
+
+                db.session.commit()
+                print(f"   Merged {min(start + BATCH_SIZE, len(groups))}/{len(groups)} groups")
+
+            print(f"✅ Removed {removed} duplicate rows")
+
+            # Now the unique index can be built
+            for index in WatchHistory.__table__.indexes:
+                if index.name == 'uq_watch_history_user_episode':
+                    print(f"📝 Creating {index.name}...")
+                    index.create(bind=db.engine, checkfirst=True)
+
+            if db.engine.dialect.name == 'postgresql':
+                with db.engine.connect() as connection:
+                    connection.execute(text('ANALYZE watch_history'))
+                    connection.commit()
+
+            print("✅ Unique (user_id, episode_id) index is in place")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error deduplicating watch history: {e}")
+            db.session.rollback()
+            return False
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print("🔧 Starting watch history deduplication...")
+
+    success = dedupe_watch_history()
+
+    if success:
+        print("🎉 Migration completed successfully!")
+        print("ℹ️ Run rebuild_user_stats.py to refresh the dashboard stats")
+    else:
+        print("💥 Migration failed!")
+        exit(1)
@@ -0,0 +1,225 @@
+"""
+Bulk episode import for AniFlix admin
+Turns scraped episode lists and uploaded JSON/CSV manifests into Episode rows
+with a handful of statements: one query for the episode numbers a series
+already has, then multi-row INSERT ... ON CONFLICT in chunks. A 500-episode
+series is written in one round trip per CHUNK_SIZE rows instead of a SELECT
+and an INSERT per episode.
+
+Manifest format (JSON list, {"episodes": [...]} or CSV with a header row):
+    episode_number, title, description, duration, thumbnail_url,
+    url / server_embed_url, server_m3u8_url / m3u8_content
+"""
+
+import csv
+import io
+import json
+import logging
+import re
+from datetime import datetime
+
+from sqlalchemy import bindparam, insert, select, update
+from app import db
+from models import Episode, PlaylistBlob, dialect_insert
+
+# Rows per INSERT statement
+CHUNK_SIZE = 500
+
+# Largest manifest accepted from an upload
+MAX_MANIFEST_ROWS = 5000
+
+# Columns an import overwrites on existing episodes (blank incoming values keep the stored one)
+IMPORT_FIELDS = ('title', 'description', 'duration', 'thumbnail_url', 'server_embed_url')
+
+# Server 1 columns, replaced together so a new URL does not sit behind an old playlist
+M3U8_FIELDS = ('server_m3u8_url', 'playlist_id')
+
+class ManifestError(ValueError):
+    """Uploaded manifest could not be read"""
+
+_conflict_ready = None
+
+def upsert_supported():
+    """True when ON CONFLICT can target the unique (content_id, episode_number) index
+
+    Databases that predate the index (see add_performance_indexes.py) use
+    plain batched INSERT/UPDATE statements instead.
+    """
+    global _conflict_ready
+    if _conflict_ready is None:
+        try:
+            indexes = db.inspect(db.engine).get_indexes(Episode.__tablename__)
+            _conflict_ready = dialect_insert(Episode.__table__) is not None and any(
+                index['name'] == 'uq_episode_content_number' and index.get('unique')
+                for index in indexes
+            )
+        except Exception as e:
+            logging.error(f"Could not inspect episode indexes: {e}")
+            return False
+    return _conflict_ready
+
+def _episode_number(episode_data, index):
+    """Episode number of an incoming row, falling back to its title or position"""
+    episode_number = episode_data.get('episode_number')
+    if episode_number in (None, ''):
+        title = episode_data.get('title') or ''
+        # Try to extract from title like "Episode 1", "EP01", etc.
+        episode_match = re.search(r'(?:episode|ep|第)[\s]*(\d+)', title, re.IGNORECASE)
+        if episode_match:
+            return int(episode_match.group(1))
+        logging.warning(f"Episode number missing for '{title}', using index {index}")
+        return index
+    return int(str(episode_number).strip())
+
+def _optional_int(value):
+    value = str(value).strip() if value is not None else ''
+    return int(value) if value else None
+
+def normalize(episodes_data):
+    """Map incoming episode dicts to Episode column values
+
+    Returns (rows, failed). Later rows win when a number appears twice.
+    Server 1 stays in 'm3u8' until _store_playlist() runs for rows that are written.
+    """
+    rows = {}
+    failed = []
+    for index, episode_data in enumerate(episodes_data, 1):
+        try:
+            episode_number = _episode_number(episode_data, index)
+            title = (episode_data.get('title') or '').strip()
+            m3u8 = (episode_data.get('m3u8_content') or episode_data.get('server_m3u8_url') or '').strip()
+            row = {
+                'episode_number': episode_number,
+                'title': title[:200] or None,
+                'description': episode_data.get('description') or None,
+                'duration': _optional_int(episode_data.get('duration')),
+                'thumbnail_url': (episode_data.get('thumbnail_url') or None),
+                # IQiyi URL sebagai embed fallback
+                'server_embed_url': (episode_data.get('server_embed_url') or episode_data.get('url') or None),
+                'm3u8': m3u8,
+            }
+            rows[episode_number] = row
+        except Exception as e:
+            failed.append({
+                'episode_number': episode_data.get('episode_number', 'Unknown'),
+                'title': episode_data.get('title', 'Unknown'),
+                'error': str(e)
+            })
+    return list(rows.values()), failed
+
+def _store_playlist(row):
+    """Replace a row's raw Server 1 value with server_m3u8_url/playlist_id"""
+    m3u8 = row.pop('m3u8')
+    # Playlist body goes to the deduplicated PlaylistBlob table
+    if PlaylistBlob.is_playlist(m3u8):
+        row['playlist_id'] = PlaylistBlob.store(m3u8).id
+        row['server_m3u8_url'] = None
+    else:
+        row['playlist_id'] = None
+        row['server_m3u8_url'] = m3u8 or None
+
+def parse_manifest(filename, data):
+    """Episode dicts from an uploaded .json or .csv manifest (bytes)"""
+    text = data.decode('utf-8-sig')
+    if (filename or '').lower().endswith('.csv'):
+        episodes = [
+            {key.strip().lower(): value for key, value in record.items() if key}
+            for record in csv.DictReader(io.StringIO(text))
+        ]
+    else:
+        try:
+            parsed = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ManifestError(f'Invalid JSON manifest: {e}')
+        episodes = parsed.get('episodes') if isinstance(parsed, dict) else parsed
+        if not isinstance(episodes, list) or not all(isinstance(item, dict) for item in episodes):
+            raise ManifestError('JSON manifest must be a list of episodes or {"episodes": [...]}')
+
+    if not episodes:
+        raise ManifestError('Manifest contains no episodes')
+    if len(episodes) > MAX_MANIFEST_ROWS:
+        raise ManifestError(f'Manifest has {len(episodes)} episodes; the limit is {MAX_MANIFEST_ROWS}')
+    return episodes
+
+def _chunks(rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        yield rows[start:start + CHUNK_SIZE]
+
+def _update_values(incoming):
+    """SET clause merging incoming values (incoming(field) -> SQL expression) into a stored episode"""
+    table = Episode.__table__
+    values = {field: db.func.coalesce(incoming(field), table.c[field]) for field in IMPORT_FIELDS}
+    # title is NOT NULL, so a blank one arrives as ''
+    values['title'] = db.func.coalesce(db.func.nullif(incoming('title'), ''), table.c.title)
+    no_m3u8 = db.and_(*(incoming(field).is_(None) for field in M3U8_FIELDS))
+    for field in M3U8_FIELDS:
+        values[field] = db.case((no_m3u8, table.c[field]), else_=incoming(field))
+    return values
+
+def _upsert(rows, overwrite):
+    table = Episode.__table__
+    for chunk in _chunks(rows):
+        statement = dialect_insert(table).values(chunk)
+        if overwrite:
+            # Blank manifest cells keep the stored value
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.content_id, table.c.episode_number],
+                set_=_update_values(lambda field: statement.excluded[field])
+            )
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=[table.c.content_id, table.c.episode_number])
+        db.session.execute(statement)
+
+def _write_portable(new_rows, existing_rows, overwrite):
+    """Batched INSERT/UPDATE fallback when ON CONFLICT is unavailable"""
+    table = Episode.__table__
+    for chunk in _chunks(new_rows):
+        db.session.execute(insert(table), chunk)
+    if overwrite and existing_rows:
+        statement = update(table).where(
+            table.c.content_id == bindparam('b_content_id'),
+            table.c.episode_number == bindparam('b_episode_number')
+        ).values(_update_values(lambda field: bindparam(f'b_{field}', type_=table.c[field].type)))
+        for chunk in _chunks(existing_rows):
+            db.session.execute(statement, [{f'b_{key}': value for key, value in row.items()} for row in chunk])
+
+def import_episodes(content_id, episodes_data, overwrite=False):
+    """Add (and with overwrite=True, update) episodes of a series in bulk
+
+    Returns a summary dict with added/updated/skipped episodes
+    ({episode_number, title}) and the rows that could not be read.
+    The caller commits.
+    """
+    rows, failed = normalize(episodes_data)
+
+    existing = set(db.session.scalars(
+        select(Episode.episode_number).where(Episode.content_id == content_id)
+    ))
+    new_rows = [row for row in rows if row['episode_number'] not in existing]
+    existing_rows = [row for row in rows if row['episode_number'] in existing]
+
+    now = datetime.utcnow()
+    for row in new_rows:
+        row['title'] = row['title'] or f"Episode {row['episode_number']}"
+    for row in existing_rows:
+        row['title'] = row['title'] or ''
+    for row in new_rows + (existing_rows if overwrite else []):
+        row['content_id'] = content_id
+        row['created_at'] = now
+        _store_playlist(row)
+
+    if upsert_supported():
+        # ON CONFLICT also covers episodes added concurrently since the lookup
+        _upsert(new_rows + existing_rows if overwrite else new_rows, overwrite)
+    else:
+        _write_portable(new_rows, existing_rows, overwrite)
+
+    def listed(rows):
+        return [{'episode_number': row['episode_number'], 'title': row['title']} for row in rows]
+
+    return {
+        'added': listed(new_rows),
+        'updated': listed(existing_rows) if overwrite else [],
+        'skipped': [] if overwrite else listed(existing_rows),
+        'failed': failed,
+    }
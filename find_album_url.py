@@ -3,7 +3,7 @@
 Script untuk mencari URL album yang benar dari episode URL
 """
 
-import requests
+import http_client
 import json
 from bs4 import BeautifulSoup
 import urllib3
@@ -21,7 +21,7 @@ def find_album_url(episode_url):
     }
     
     try:
-        response = requests.get(episode_url, headers=headers, verify=False, timeout=15)
+        response = http_client.get(episode_url, headers=headers, verify=False, timeout=15)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.text, 'html.parser')
@@ -99,7 +99,7 @@ def find_album_url(episode_url):
 def test_album_url(url, headers):
     """Test apakah URL album menghasilkan episode list"""
     try:
-        response = requests.get(url, headers=headers, verify=False, timeout=10)
+        response = http_client.get(url, headers=headers, verify=False, timeout=10)
         if response.status_code != 200:
             return False
         
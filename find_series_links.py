@@ -3,7 +3,7 @@
 Script untuk mencari link series/album di halaman episode
 """
 
-import requests
+import http_client
 from bs4 import BeautifulSoup
 import urllib3
 import re
@@ -20,7 +20,7 @@ def find_series_links(episode_url):
     }
     
     try:
-        response = requests.get(episode_url, headers=headers, verify=False, timeout=15)
+        response = http_client.get(episode_url, headers=headers, verify=False, timeout=15)
         response.raise_for_status()
         
         soup = BeautifulSoup(response.text, 'html.parser')
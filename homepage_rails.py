@@ -0,0 +1,143 @@
+"""
+Precomputed homepage rails for AniFlix
+All rails (featured, latest, popular, featured per content type) are built in one
+query and stored as a compact JSON snapshot in SystemSettings, so every worker
+serves the homepage from its in-memory settings cache. The snapshot is rebuilt
+when content changes and, as a safety net, when it is older than the TTL.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import func, or_, select
+from app import db
+from models import Content, SystemSettings
+
+RAILS_SETTING_KEY = 'homepage_rails'
+
+# Seconds before a snapshot is rebuilt even without a content change
+RAILS_TTL = float(os.environ.get('HOMEPAGE_RAILS_TTL', 900))
+
+RAIL_SIZE = 8
+
+CONTENT_TYPES = {'anime': 'featured_anime', 'donghua': 'featured_donghua', 'movie': 'featured_movies'}
+
+# Top-rated rails per type, also used by the player sidebar
+TOP_RATED_TYPES = {'anime': 'top_rated_anime', 'movie': 'top_rated_movies'}
+
+# Only the fields the homepage cards render
+CARD_FIELDS = ('id', 'title', 'thumbnail_url', 'trailer_url', 'rating', 'year', 'genre', 'content_type')
+
+_rebuild_lock = threading.Lock()
+_parsed = (None, None)
+
+def build_rails():
+    """Compute every homepage rail with a single windowed query"""
+    newest_first = (Content.created_at.desc(), Content.id.desc())
+    best_rated = (Content.rating.desc().nulls_last(), Content.id.desc())
+    ranked = select(
+        *[getattr(Content, field) for field in CARD_FIELDS],
+        Content.is_featured,
+        func.row_number().over(order_by=newest_first).label('latest_rank'),
+        func.row_number().over(order_by=best_rated).label('popular_rank'),
+        func.row_number().over(partition_by=Content.content_type, order_by=newest_first).label('type_rank'),
+        func.row_number().over(partition_by=Content.content_type, order_by=best_rated).label('type_rating_rank'),
+    ).subquery()
+
+    rows = db.session.execute(
+        select(ranked).where(or_(
+            ranked.c.is_featured.is_(True),
+            ranked.c.latest_rank <= RAIL_SIZE,
+            ranked.c.popular_rank <= RAIL_SIZE,
+            ranked.c.type_rank <= RAIL_SIZE,
+            ranked.c.type_rating_rank <= RAIL_SIZE
+        )).order_by(ranked.c.latest_rank)
+    ).all()
+
+    def card(row):
+        return {field: getattr(row, field) for field in CARD_FIELDS}
+
+    featured = [row for row in rows if row.is_featured]
+    rails = {
+        'featured_content': [card(row) for row in featured],
+        'latest_content': [card(row) for row in rows if row.latest_rank <= RAIL_SIZE],
+        'popular_content': [card(row) for row in sorted(
+            (row for row in rows if row.popular_rank <= RAIL_SIZE), key=lambda row: row.popular_rank
+        )],
+    }
+    for content_type, rail in CONTENT_TYPES.items():
+        # Featured titles of the type, or the latest ones if none are featured
+        picks = [row for row in featured if row.content_type == content_type][:RAIL_SIZE]
+        if not picks:
+            picks = [row for row in rows if row.content_type == content_type and row.type_rank <= RAIL_SIZE]
+        rails[rail] = [card(row) for row in picks]
+    for content_type, rail in TOP_RATED_TYPES.items():
+        rails[rail] = [card(row) for row in sorted(
+            (row for row in rows if row.content_type == content_type and row.type_rating_rank <= RAIL_SIZE),
+            key=lambda row: row.type_rating_rank
+        )]
+
+    rails['built_at'] = time.time()
+    return rails
+
+def rebuild():
+    """Recompute the snapshot and publish it to every worker"""
+    rails = build_rails()
+    SystemSettings.set_setting(
+        RAILS_SETTING_KEY,
+        json.dumps(rails, separators=(',', ':')),
+        setting_type='internal',
+        description='Precomputed homepage rails (rebuilt on content changes)'
+    )
+    logging.info(f"Rebuilt homepage rails ({len(rails['latest_content'])} latest, {len(rails['featured_content'])} featured)")
+    return rails
+
+def invalidate():
+    """Rebuild after a content change; never fails the calling admin action"""
+    try:
+        rebuild()
+    except Exception as e:
+        logging.error(f"Error rebuilding homepage rails: {e}")
+        db.session.rollback()
+
+def _load_snapshot():
+    """Parse the published snapshot, reusing the last parse while it is unchanged"""
+    global _parsed
+    raw = SystemSettings.get_setting(RAILS_SETTING_KEY)
+    if not raw:
+        return None
+    if _parsed[0] is not raw:
+        _parsed = (raw, json.loads(raw))
+    return _parsed[1]
+
+def _complete(rails):
+    """False for snapshots written before a rail was added"""
+    return all(rail in rails for rail in TOP_RATED_TYPES.values())
+
+def get_rails():
+    """Return the homepage rails, served from memory in the common case"""
+    rails = _load_snapshot()
+    if rails is not None and time.time() - rails.get('built_at', 0) < RAILS_TTL and _complete(rails):
+        return rails
+
+    # Stale or missing: one request rebuilds while the others keep serving the old copy
+    if rails is not None and not _rebuild_lock.acquire(blocking=False):
+        return rails
+    if rails is None:
+        _rebuild_lock.acquire()
+    try:
+        fresh = _load_snapshot()
+        if fresh is not None and time.time() - fresh.get('built_at', 0) < RAILS_TTL and _complete(fresh):
+            return fresh
+        return rebuild()
+    except Exception as e:
+        if rails is None:
+            raise
+        logging.warning(f"Homepage rails rebuild failed, serving stale snapshot: {e}")
+        db.session.rollback()
+        return rails
+    finally:
+        _rebuild_lock.release()
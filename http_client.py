@@ -0,0 +1,125 @@
+"""
+Shared outbound HTTP client for AniFlix scrapers and integrations
+All outbound requests go through one pooled, keep-alive transport per process,
+so repeated calls to the same host reuse their TCP/TLS connection instead of
+paying DNS + TCP + TLS every time.
+
+    http_client.get(url, ...) / post(...) / request(method, url, ...)
+        Module-level session (shared cookies, thread-safe for these calls)
+    http_client.new_session()
+        A Session with its own cookies/headers on the same connection pools,
+        for scrapers that keep per-page state (EnhancedIQiyiAPI)
+
+Requests without a timeout get DEFAULT_TIMEOUT. Connection failures (the
+request never reached the server) are retried with backoff; status-based
+retries of API calls are left to rate_limit.request, which also honours
+Retry-After. Per-host request counts, errors, latency and connections opened
+are kept in memory; see stats().
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Hosts with a kept-alive pool, and idle connections kept per host. Sized for
+# JOB_WORKERS + ANIME_ENRICH_WORKERS + request threads in one Gunicorn worker.
+POOL_HOSTS = int(os.environ.get('HTTP_POOL_HOSTS', 32))
+POOL_SIZE = int(os.environ.get('HTTP_POOL_SIZE', 12))
+
+# (connect, read) seconds for requests that don't pass their own timeout
+DEFAULT_TIMEOUT = (5, 20)
+
+# Only failures before the request was sent are safe to retry for every method
+CONNECT_RETRY = Retry(total=2, connect=2, read=0, status=0, other=0, backoff_factor=0.3)
+
+USER_AGENT = 'AniFlix/1.0 (contact@aniflix.com)'
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter with default timeouts and per-host metrics, shared by all sessions
+
+    close() is a no-op: the pools live as long as the process, so a caller
+    closing its own session cannot drop everybody else's connections.
+    """
+
+    def __init__(self):
+        super().__init__(pool_connections=POOL_HOSTS, pool_maxsize=POOL_SIZE, max_retries=CONNECT_RETRY)
+        self._lock = threading.Lock()
+        self._metrics = defaultdict(lambda: {'requests': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'statuses': defaultdict(int)})
+
+    def send(self, request, timeout=None, **kwargs):
+        if timeout is None:
+            timeout = DEFAULT_TIMEOUT
+        host = urlparse(request.url).hostname or ''
+        started = time.monotonic()
+        status = None
+        try:
+            response = super().send(request, timeout=timeout, **kwargs)
+            status = response.status_code
+            return response
+        finally:
+            elapsed = time.monotonic() - started
+            with self._lock:
+                metrics = self._metrics[host]
+                metrics['requests'] += 1
+                metrics['seconds'] += elapsed
+                metrics['max_seconds'] = max(metrics['max_seconds'], elapsed)
+                if status is None:
+                    metrics['errors'] += 1
+                else:
+                    metrics['statuses'][f'{status // 100}xx'] += 1
+
+    def close(self):
+        pass
+
+    def stats(self):
+        """Per-host metrics, with connections opened by the live pools (reuse = requests - connections)"""
+        connections = defaultdict(int)
+        for key in list(self.poolmanager.pools.keys()):
+            pool = self.poolmanager.pools.get(key)
+            if pool is not None:
+                connections[pool.host] += pool.num_connections
+        with self._lock:
+            return {
+                host: {
+                    'requests': metrics['requests'],
+                    'errors': metrics['errors'],
+                    'avg_ms': round(metrics['seconds'] * 1000 / metrics['requests'], 1) if metrics['requests'] else 0,
+                    'max_ms': round(metrics['max_seconds'] * 1000, 1),
+                    'statuses': dict(metrics['statuses']),
+                    'connections_opened': connections.get(host, 0),
+                }
+                for host, metrics in sorted(self._metrics.items())
+            }
+
+_adapter = PooledAdapter()
+
+def new_session(headers=None, verify=True):
+    """A Session with its own cookies and headers on the shared connection pools"""
+    session = requests.Session()
+    session.mount('https://', _adapter)
+    session.mount('http://', _adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    if headers:
+        session.headers.update(headers)
+    session.verify = verify
+    return session
+
+_session = new_session()
+
+def request(method, url, **kwargs):
+    return _session.request(method, url, **kwargs)
+
+def get(url, **kwargs):
+    return _session.request('GET', url, **kwargs)
+
+def post(url, **kwargs):
+    return _session.request('POST', url, **kwargs)
+
+def stats():
+    return _adapter.stats()
@@ -11,6 +11,8 @@ import sys
 import os
 from datetime import datetime
 
+import http_client
+
 # Disable SSL warnings
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -75,8 +77,8 @@ class EnhancedIQiyiAPI:
         self.headers = {
             'user-agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/107.0.0.0 Safari/537.36'
         }
-        self.session = requests.Session()
-        self.session.verify = False
+        # Own cookies per page, pooled keep-alive connections shared with every other scraper
+        self.session = http_client.new_session(verify=False)
         self._player_data = None
 
     _BID_TAGS = {
@@ -0,0 +1,258 @@
+"""
+Background job queue for AniFlix admin tasks
+Scraping and import endpoints enqueue a BackgroundJob row and return its id
+straight away; a small pool of worker threads in each Gunicorn worker claims
+queued jobs, runs their handler and stores the result, which the admin UI polls
+from /admin/api/jobs/<id>.
+
+Jobs that fail with a transient network error (timeouts, refused connections,
+TLS errors, 5xx responses) are retried with a growing delay. At most
+JOB_HOST_CONCURRENCY jobs talk to the same remote host at once across the
+whole deployment, so a batch of imports cannot hammer iq.com.
+"""
+
+import json
+import logging
+import os
+import threading
+import zlib
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+
+from sqlalchemy import delete, func, select, text, update
+from app import db
+from models import BackgroundJob
+from background_tasks import PeriodicTask, singleton_lock
+
+# Worker threads per process
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+
+# Running jobs allowed per remote host (deployment-wide)
+JOB_HOST_CONCURRENCY = int(os.environ.get('JOB_HOST_CONCURRENCY', 1))
+
+# Seconds between queue polls of an idle worker thread
+POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', 2))
+
+# Seconds to wait before retry N (the last delay repeats)
+RETRY_DELAYS = (10, 60, 300)
+
+# Running jobs without a progress update for this long belong to a dead worker
+STALE_AFTER = timedelta(minutes=15)
+
+# Finished jobs are kept this long for the status endpoint
+JOB_RETENTION = timedelta(days=7)
+
+# Error text that marks a failure as worth retrying
+TRANSIENT_TERMS = (
+    'timeout', 'timed out', 'time out', 'connection', 'refused', 'unreachable',
+    'ssl', 'certificate', 'handshake', 'temporarily', 'getaddrinfo', 'name resolution',
+    '502', '503', '504',
+)
+
+# Serializes claims on PostgreSQL so the per-host count cannot be raced
+CLAIM_LOCK_KEY = zlib.crc32(b'job-queue-claim')
+
+class TransientJobError(Exception):
+    """Raised by a handler for a failure that may succeed on retry
+
+    `result` is stored as the job result if no attempts are left.
+    """
+
+    def __init__(self, message, result=None):
+        super().__init__(message)
+        self.result = result
+
+def is_transient(error):
+    """True if an exception or error message looks like a temporary network failure"""
+    message = str(error or '').lower()
+    return any(term in message for term in TRANSIENT_TERMS)
+
+def host_of(url):
+    return (urlparse(url).hostname or '').lower() or None
+
+_handlers = {}
+
+def job_handler(kind, max_attempts=3):
+    """Register `func(payload, report)` as the handler for jobs of `kind`
+
+    The handler returns a JSON-serializable result dict; a result with
+    success False marks the job as failed. report(progress, message) stores
+    progress (0-100) for the status endpoint.
+    """
+    def decorator(func):
+        _handlers[kind] = (func, max_attempts)
+        return func
+    return decorator
+
+def enqueue(kind, payload, host=None, created_by=None):
+    """Queue a job and return it (committed, so its id can be handed out)"""
+    if kind not in _handlers:
+        raise ValueError(f'Unknown job kind: {kind}')
+    job = BackgroundJob(
+        kind=kind,
+        payload=json.dumps(payload),
+        host=host,
+        max_attempts=_handlers[kind][1],
+        created_by=created_by,
+        run_after=datetime.utcnow()
+    )
+    db.session.add(job)
+    db.session.commit()
+    start_workers()
+    logging.info(f"Queued job {job.id} ({kind}, host={host})")
+    return job
+
+_claim_lock = threading.Lock()
+
+def _claim():
+    """Mark the next due job whose host is under its cap as running; returns it or None"""
+    now = datetime.utcnow()
+    with _claim_lock:
+        try:
+            if db.engine.dialect.name == 'postgresql':
+                db.session.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': CLAIM_LOCK_KEY})
+
+            busy_hosts = select(BackgroundJob.host).where(
+                BackgroundJob.status == 'running',
+                BackgroundJob.host.isnot(None)
+            ).group_by(BackgroundJob.host).having(func.count() >= JOB_HOST_CONCURRENCY)
+
+            job = BackgroundJob.query.filter(
+                BackgroundJob.status == 'queued',
+                BackgroundJob.run_after <= now,
+                db.or_(BackgroundJob.host.is_(None), BackgroundJob.host.notin_(busy_hosts))
+            ).order_by(BackgroundJob.run_after, BackgroundJob.id).with_for_update(skip_locked=True).first()
+            if job is None:
+                db.session.commit()
+                return None
+
+            job.status = 'running'
+            job.attempts += 1
+            job.started_at = job.updated_at = now
+            db.session.commit()
+            return job
+        except Exception:
+            db.session.rollback()
+            raise
+
+def _reporter(job_id):
+    def report(progress, message=None):
+        try:
+            db.session.execute(
+                update(BackgroundJob).where(BackgroundJob.id == job_id, BackgroundJob.status == 'running')
+                .values(progress=max(0, min(100, int(progress))), message=(message or '')[:200] or None,
+                        updated_at=datetime.utcnow())
+            )
+            db.session.commit()
+        except Exception as e:
+            logging.warning(f"Could not store progress of job {job_id}: {e}")
+            db.session.rollback()
+    return report
+
+def _finish(job_id, status, result=None, error=None):
+    now = datetime.utcnow()
+    values = {
+        'status': status,
+        'result': json.dumps(result) if result is not None else None,
+        'error': error,
+        'updated_at': now,
+        'finished_at': now,
+    }
+    if status == 'succeeded':
+        values['progress'] = 100
+    db.session.execute(update(BackgroundJob).where(BackgroundJob.id == job_id).values(**values))
+    db.session.commit()
+
+def _retry_or_fail(job, error, result=None):
+    if job.attempts < job.max_attempts:
+        delay = RETRY_DELAYS[min(job.attempts, len(RETRY_DELAYS)) - 1]
+        db.session.execute(
+            update(BackgroundJob).where(BackgroundJob.id == job.id).values(
+                status='queued', error=str(error), message=f'Retrying in {delay}s',
+                run_after=datetime.utcnow() + timedelta(seconds=delay), updated_at=datetime.utcnow()
+            )
+        )
+        db.session.commit()
+        logging.warning(f"Job {job.id} ({job.kind}) attempt {job.attempts} failed, retrying in {delay}s: {error}")
+    else:
+        _finish(job.id, 'failed', result, str(error))
+        logging.error(f"Job {job.id} ({job.kind}) failed after {job.attempts} attempts: {error}")
+
+def run_job(job):
+    """Run a claimed job in the calling thread and record the outcome"""
+    handler = _handlers.get(job.kind)
+    if handler is None:
+        _finish(job.id, 'failed', error=f'Unknown job kind: {job.kind}')
+        return
+
+    job_id, kind = job.id, job.kind
+    payload = json.loads(job.payload)
+    # No transaction stays open while the handler waits on the network
+    db.session.commit()
+    try:
+        result = handler[0](payload, _reporter(job_id))
+    except TransientJobError as e:
+        db.session.rollback()
+        _retry_or_fail(job, e, e.result)
+        return
+    except Exception as e:
+        db.session.rollback()
+        if is_transient(e):
+            _retry_or_fail(job, e)
+        else:
+            logging.error(f"Job {job_id} ({kind}) crashed: {e}")
+            _finish(job_id, 'failed', error=str(e))
+        return
+
+    result = result or {}
+    if result.get('success', True):
+        _finish(job_id, 'succeeded', result)
+    else:
+        _finish(job_id, 'failed', result, result.get('error'))
+
+def run_pending():
+    """Run due jobs until the queue is empty (or every due job's host is busy)"""
+    ran = 0
+    while True:
+        job = _claim()
+        if job is None:
+            return ran
+        run_job(job)
+        ran += 1
+
+def maintain_jobs():
+    """Requeue jobs orphaned by a dead worker and delete old finished jobs"""
+    with singleton_lock('job-queue-maintenance') as acquired:
+        if not acquired:
+            return None
+        now = datetime.utcnow()
+        stale = BackgroundJob.status == 'running', BackgroundJob.updated_at < now - STALE_AFTER
+        # Orphans with attempts left run again; the rest are failed
+        requeued = db.session.execute(
+            update(BackgroundJob).where(*stale, BackgroundJob.attempts < BackgroundJob.max_attempts)
+            .values(status='queued', message='Requeued after worker loss', run_after=now, updated_at=now),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        abandoned = db.session.execute(
+            update(BackgroundJob).where(*stale)
+            .values(status='failed', error='Worker stopped while running the job', finished_at=now, updated_at=now),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        purged = db.session.execute(
+            delete(BackgroundJob).where(BackgroundJob.finished_at < now - JOB_RETENTION),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        db.session.commit()
+        if requeued or abandoned or purged:
+            logging.info(f"Job queue maintenance: {requeued} requeued, {abandoned} abandoned, {purged} purged")
+        return requeued, abandoned, purged
+
+workers = [PeriodicTask(f'job-worker-{number}', POLL_INTERVAL, run_pending) for number in range(JOB_WORKERS)]
+
+maintenance_task = PeriodicTask('job-queue-maintenance', 300, maintain_jobs)
+
+def start_workers():
+    """Start this process's worker pool (lazily, on first enqueue or status poll)"""
+    for worker in workers:
+        worker.start()
+    maintenance_task.start()
@@ -1,3 +1,10 @@
+import os
+import json
+import time
+import logging
+import threading
+import hashlib
+import zlib
 from datetime import datetime, timedelta
 from app import db
 from flask_login import UserMixin
@@ -11,9 +18,13 @@ class User(UserMixin, db.Model):
     subscription_type = db.Column(db.String(20), default='free')  # free, vip_monthly, vip_3month, vip_yearly
     subscription_expires = db.Column(db.DateTime)
 
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     last_login = db.Column(db.DateTime)
     
+    __table_args__ = (
+        db.Index('ix_user_created_at_id', 'created_at', 'id'),
+    )
+    
     # Relationships
     watch_history = db.relationship('WatchHistory', backref='user', lazy=True, cascade='all, delete-orphan')
     
@@ -42,6 +53,56 @@ class User(UserMixin, db.Model):
         """Alias for is_admin_user for template compatibility"""
         return self.is_admin_user()
 
+# Many-to-many link between content and normalized genres
+content_genre = db.Table(
+    'content_genre',
+    db.Column('content_id', db.Integer, db.ForeignKey('content.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('genre.id', ondelete='CASCADE'), primary_key=True),
+    # The primary key covers content -> genres; this one drives genre -> content filtering
+    db.Index('ix_content_genre_genre_content', 'genre_id', 'content_id'),
+)
+
+class Genre(db.Model):
+    """Normalized genre, linked to content through content_genre"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)  # Display name, e.g. "Slice of Life"
+    slug = db.Column(db.String(50), unique=True, nullable=False)  # Lowercase lookup key, e.g. "slice of life"
+    
+    def __repr__(self):
+        return f'<Genre {self.name}>'
+    
+    @staticmethod
+    def slugify(name):
+        """Normalize a genre name into its lookup key"""
+        return ' '.join((name or '').lower().split())
+    
+    @staticmethod
+    def parse(value):
+        """Split a comma-separated genre string (or list) into unique display names"""
+        if not value:
+            return []
+        parts = value.split(',') if isinstance(value, str) else value
+        names = {}
+        for part in parts:
+            name = ' '.join(str(part).split())[:50]
+            if name and Genre.slugify(name) not in names:
+                names[Genre.slugify(name)] = name
+        return list(names.values())
+    
+    @staticmethod
+    def get_or_create_many(names):
+        """Return Genre rows for the given names, creating missing ones in the session"""
+        wanted = {Genre.slugify(name): name for name in names if Genre.slugify(name)}
+        if not wanted:
+            return []
+        existing = {genre.slug: genre for genre in Genre.query.filter(Genre.slug.in_(list(wanted))).all()}
+        for slug, name in wanted.items():
+            if slug not in existing:
+                genre = Genre(name=name, slug=slug)
+                db.session.add(genre)
+                existing[slug] = genre
+        return [existing[slug] for slug in wanted]
+
 class Content(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -57,11 +118,69 @@ class Content(db.Model):
     studio = db.Column(db.String(200))  # Animation studio
     status = db.Column(db.String(20), default='unknown')  # complete, ongoing, unknown
     is_featured = db.Column(db.Boolean, default=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    anilist_id = db.Column(db.Integer)  # AniList media ID, used by catalog_sync.py
+    anilist_synced_at = db.Column(db.DateTime)  # Last catalog sync of rating/status/episodes
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # (created_at, id) keeps newest-first listings and keyset pagination on one index range
+        db.Index('ix_content_type_created_at_id', 'content_type', 'created_at', 'id'),
+        db.Index('ix_content_created_at_id', 'created_at', 'id'),
+        db.Index('ix_content_rating', 'rating'),
+        db.Index('ix_content_featured_type', 'is_featured', 'content_type'),
+        db.Index('ix_content_anilist_id', 'anilist_id'),
+    )
     
     # Relationships
     episodes = db.relationship('Episode', backref='content', lazy=True, cascade='all, delete-orphan')
     watch_history = db.relationship('WatchHistory', backref='content', lazy=True, cascade='all, delete-orphan')
+    genres = db.relationship('Genre', secondary=content_genre, lazy=True,
+                             backref=db.backref('contents', lazy='dynamic'))
+    
+    def set_genres(self, value):
+        """Set genres from a comma-separated string or list, keeping the display string in sync"""
+        names = Genre.parse(value)
+        self.genre = ', '.join(names)[:100]
+        self.genres = Genre.get_or_create_many(names)
+
+class PlaylistBlob(db.Model):
+    """M3U8 playlist body stored once per distinct content, zlib-compressed"""
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)  # Hash of the uncompressed body
+    data = db.deferred(db.Column(db.LargeBinary, nullable=False))  # zlib-compressed UTF-8 body
+    size = db.Column(db.Integer, nullable=False)  # Uncompressed size in bytes
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    @property
+    def text(self):
+        return zlib.decompress(self.data).decode('utf-8')
+    
+    @staticmethod
+    def is_playlist(value):
+        """True for a full playlist body, as opposed to a playlist URL"""
+        return bool(value) and (value.lstrip().startswith('#EXTM3U') or '\n' in value.strip())
+    
+    @staticmethod
+    def store(body):
+        """Return the PlaylistBlob for a playlist body, inserting it if it is new"""
+        raw = body.encode('utf-8')
+        digest = hashlib.sha256(raw).hexdigest()
+        
+        existing = PlaylistBlob.query.filter_by(sha256=digest).first()
+        if existing:
+            return existing
+        
+        row = {'sha256': digest, 'data': zlib.compress(raw, 9), 'size': len(raw), 'created_at': datetime.utcnow()}
+        statement = dialect_insert(PlaylistBlob.__table__)
+        if statement is not None:
+            # A concurrent import may store the same playlist first
+            db.session.execute(statement.values(row).on_conflict_do_nothing(index_elements=['sha256']))
+            return PlaylistBlob.query.filter_by(sha256=digest).one()
+        
+        blob = PlaylistBlob(**row)
+        db.session.add(blob)
+        db.session.flush()
+        return blob
 
 class Episode(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -74,14 +193,67 @@ class Episode(db.Model):
     thumbnail_url = db.Column(db.String(500))  # Episode thumbnail
     
     # Multiple streaming servers
-    server_m3u8_url = db.Column(db.Text)  # M3U8 streaming content (can be very long)
+    server_m3u8_url = db.deferred(db.Column(db.Text))  # M3U8 stream URL (playlist bodies live in PlaylistBlob)
+    playlist_id = db.Column(db.Integer, db.ForeignKey('playlist_blob.id'))  # Stored M3U8 playlist body
     server_embed_url = db.Column(db.String(500))  # Embed iframe URL
     iqiyi_play_url = db.Column(db.String(500))  # iQiyi play URL (https://www.iq.com/play/...)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    # One episode per number within a series; also serves the (content_id, episode_number) lookups
+    __table_args__ = (
+        db.Index('uq_episode_content_number', 'content_id', 'episode_number', unique=True),
+    )
+    
     # Relationships
     watch_history = db.relationship('WatchHistory', backref='episode', lazy=True, cascade='all, delete-orphan')
+    playlist = db.relationship('PlaylistBlob', lazy=True)
+    
+    @property
+    def has_m3u8(self):
+        """Whether Server 1 (M3U8) is available, without loading the deferred URL column"""
+        return self.playlist_id is not None or bool(self.has_m3u8_url)
+    
+    @property
+    def m3u8_source(self):
+        """URL the player loads for Server 1: the playlist endpoint or the stored URL"""
+        if self.playlist_id is not None:
+            from flask import url_for
+            return url_for('content.episode_playlist', episode_id=self.id)
+        return self.server_m3u8_url or None
+    
+    def set_m3u8(self, value):
+        """Set Server 1 from a playlist URL or a full playlist body"""
+        value = (value or '').strip()
+        if PlaylistBlob.is_playlist(value):
+            self.playlist_id = PlaylistBlob.store(value).id
+            self.server_m3u8_url = None
+        elif self.playlist_id is not None and self.id and value.endswith(f'/episode/{self.id}/playlist.m3u8'):
+            # The admin form echoes the playlist endpoint back; keep the stored body
+            return
+        else:
+            self.playlist_id = None
+            self.server_m3u8_url = value or None
+
+# Computed in SQL so listings can check for a URL without loading the deferred column
+Episode.has_m3u8_url = db.column_property(
+    db.func.coalesce(db.func.length(Episode.__table__.c.server_m3u8_url), 0) > 0
+)
+
+def dialect_insert(target):
+    """Return an INSERT with ON CONFLICT support for the active database, or None
+
+    PostgreSQL and SQLite both implement INSERT ... ON CONFLICT; SQLAlchemy
+    exposes it through their dialect-specific insert() constructs.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        return None
+    return insert(target)
 
 class WatchHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -92,6 +264,294 @@ class WatchHistory(db.Model):
     completed = db.Column(db.Boolean, default=False)
     status = db.Column(db.String(20), default='on-going')  # on-going, completed
     last_watched = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # One history row per user/episode; also serves the (user_id, episode_id) lookups
+        db.Index('uq_watch_history_user_episode', 'user_id', 'episode_id', unique=True),
+        db.Index('ix_watch_history_user_completed_last_watched', 'user_id', 'completed', 'last_watched'),
+        db.Index('ix_watch_history_user_last_watched', 'user_id', 'last_watched'),
+        db.Index('ix_watch_history_user_content', 'user_id', 'content_id', 'last_watched'),
+        db.Index('ix_watch_history_episode', 'episode_id'),
+        db.Index('ix_watch_history_content', 'content_id'),
+        # Daily analytics rollup scans recent activity
+        db.Index('ix_watch_history_last_watched', 'last_watched'),
+    )
+    
+    # Columns written by progress updates (everything except the key columns)
+    PROGRESS_FIELDS = ('watch_time', 'completed', 'status', 'last_watched')
+    
+    _upsert_ready = None
+    
+    @staticmethod
+    def upsert_supported():
+        """True when the database can run ON CONFLICT against the (user_id, episode_id) key
+
+        Databases that predate the unique index (see dedupe_watch_history.py)
+        fall back to SELECT-then-write until the migration has run.
+        """
+        if WatchHistory._upsert_ready is None:
+            try:
+                indexes = db.inspect(db.engine).get_indexes(WatchHistory.__tablename__)
+                WatchHistory._upsert_ready = dialect_insert(WatchHistory.__table__) is not None and any(
+                    index['name'] == 'uq_watch_history_user_episode' and index.get('unique')
+                    for index in indexes
+                )
+            except Exception as e:
+                logging.error(f"Could not inspect watch_history indexes: {e}")
+                return False
+            if not WatchHistory._upsert_ready:
+                logging.warning("watch_history has no unique (user_id, episode_id) index; "
+                                "run dedupe_watch_history.py to enable atomic upserts")
+        return WatchHistory._upsert_ready
+    
+    @staticmethod
+    def upsert(user_id, episode_id, content_id, **values):
+        """Insert or update the history row for a user/episode in one statement
+
+        Only the given progress values are written on conflict; with no values
+        an existing row is returned unchanged. Returns the WatchHistory row.
+        """
+        row = {'user_id': user_id, 'episode_id': episode_id, 'content_id': content_id, **values}
+        
+        if not WatchHistory.upsert_supported():
+            return WatchHistory._write_portable(row)
+        
+        statement = dialect_insert(WatchHistory).values(row)
+        # DO NOTHING returns no row on conflict, so rewrite a key column instead
+        set_ = {field: statement.excluded[field] for field in values} or {'content_id': WatchHistory.content_id}
+        statement = statement.on_conflict_do_update(
+            index_elements=['user_id', 'episode_id'],
+            set_=set_
+        ).returning(WatchHistory)
+        return db.session.scalars(
+            statement, execution_options={'populate_existing': True}
+        ).one()
+    
+    @staticmethod
+    def upsert_many(rows):
+        """Write progress rows with one multi-row INSERT ... ON CONFLICT
+
+        Each row carries user_id, episode_id, content_id and PROGRESS_FIELDS.
+        A row only replaces stored progress that is not newer than itself, so
+        out-of-order writers cannot move progress backwards.
+        """
+        if not rows:
+            return
+        if not WatchHistory.upsert_supported():
+            for row in rows:
+                WatchHistory._write_portable(row)
+            return
+        
+        table = WatchHistory.__table__
+        statement = dialect_insert(table).values(rows)
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.episode_id],
+            set_={field: excluded[field] for field in WatchHistory.PROGRESS_FIELDS},
+            where=db.or_(table.c.last_watched.is_(None), table.c.last_watched <= excluded.last_watched)
+        )
+        db.session.execute(statement)
+    
+    @staticmethod
+    def _write_portable(row):
+        """SELECT-then-write fallback when ON CONFLICT is unavailable"""
+        history = WatchHistory.query.filter_by(user_id=row['user_id'], episode_id=row['episode_id']).first()
+        if not history:
+            history = WatchHistory(user_id=row['user_id'], episode_id=row['episode_id'], content_id=row['content_id'])
+            db.session.add(history)
+        for field in WatchHistory.PROGRESS_FIELDS:
+            if field in row:
+                setattr(history, field, row[field])
+        db.session.flush()
+        return history
+
+class UserStats(db.Model):
+    """Per-user viewing totals for the dashboard
+
+    Updated in the same transaction as WatchHistory writes: progress writes
+    apply deltas, rarer changes (status edits, removals) recompute the user.
+    rebuild_user_stats.py recomputes every user from scratch.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    episodes_watched = db.Column(db.Integer, nullable=False, default=0)
+    episodes_completed = db.Column(db.Integer, nullable=False, default=0)
+    total_watch_time = db.Column(db.BigInteger, nullable=False, default=0)  # Seconds
+    last_activity = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    COUNTERS = ('episodes_watched', 'episodes_completed', 'total_watch_time')
+
+    # Users per aggregate/upsert statement
+    BATCH_SIZE = 500
+
+    @property
+    def watch_hours(self):
+        return round((self.total_watch_time or 0) / 3600, 1)
+
+    @staticmethod
+    def for_user(user_id):
+        """Return the user's rollup row, computing it on first use"""
+        stats = db.session.get(UserStats, user_id)
+        if stats is None:
+            UserStats.recompute([user_id])
+            db.session.commit()
+            stats = db.session.get(UserStats, user_id)
+        return stats
+
+    @staticmethod
+    def progress_snapshot(keys):
+        """Stored progress of (user_id, episode_id) keys, locked until the transaction ends
+
+        Taken before a progress write so record_progress() can derive deltas;
+        the row locks keep concurrent flushes of the same rows in order.
+        """
+        keys = list(keys)
+        if not keys:
+            return {}
+        rows = db.session.query(
+            WatchHistory.user_id,
+            WatchHistory.episode_id,
+            WatchHistory.watch_time,
+            WatchHistory.completed,
+            WatchHistory.last_watched
+        ).filter(db.tuple_(WatchHistory.user_id, WatchHistory.episode_id).in_(keys)).with_for_update().all()
+        return {(row.user_id, row.episode_id): row for row in rows}
+
+    @staticmethod
+    def record_progress(entries, previous):
+        """Apply progress writes to the rollups of their users
+
+        `entries` are the rows just written (as for WatchHistory.upsert_many)
+        and `previous` the progress_snapshot() taken before writing. Entries
+        older than the stored row were skipped by the upsert and change nothing.
+        """
+        deltas = {}
+        for entry in entries:
+            old = previous.get((entry['user_id'], entry['episode_id']))
+            written_at = entry.get('last_watched')
+            if old is not None and old.last_watched and written_at and old.last_watched > written_at:
+                continue
+
+            delta = deltas.setdefault(entry['user_id'], {
+                'user_id': entry['user_id'],
+                'episodes_watched': 0,
+                'episodes_completed': 0,
+                'total_watch_time': 0,
+                'last_activity': None,
+            })
+            completed = bool(entry.get('completed', old.completed if old else False))
+            watch_time = entry.get('watch_time', old.watch_time if old else 0) or 0
+            if old is None:
+                delta['episodes_watched'] += 1
+                delta['episodes_completed'] += int(completed)
+                delta['total_watch_time'] += watch_time
+                written_at = written_at or datetime.utcnow()
+            else:
+                delta['episodes_completed'] += int(completed) - int(bool(old.completed))
+                delta['total_watch_time'] += watch_time - (old.watch_time or 0)
+            if written_at and (delta['last_activity'] is None or written_at > delta['last_activity']):
+                delta['last_activity'] = written_at
+
+        UserStats._apply_deltas(list(deltas.values()))
+
+    @staticmethod
+    def _apply_deltas(deltas):
+        """Add counter deltas to existing rollups; users without one are recomputed"""
+        if not deltas:
+            return
+        user_ids = [delta['user_id'] for delta in deltas]
+        existing = {
+            user_id for (user_id,) in
+            db.session.query(UserStats.user_id).filter(UserStats.user_id.in_(user_ids))
+        }
+        missing = set(user_ids) - existing
+        if missing:
+            # Recomputing reads this transaction's writes, so no delta is needed
+            UserStats.recompute(missing)
+
+        changed = [
+            {f'b_{key}': value for key, value in delta.items()}
+            for delta in deltas
+            if delta['user_id'] in existing and (delta['last_activity'] or any(delta[field] for field in UserStats.COUNTERS))
+        ]
+        if not changed:
+            return
+
+        table = UserStats.__table__
+        activity = db.bindparam('b_last_activity', type_=db.DateTime)
+        statement = table.update().where(table.c.user_id == db.bindparam('b_user_id')).values(
+            **{field: table.c[field] + db.bindparam(f'b_{field}') for field in UserStats.COUNTERS},
+            last_activity=db.case(
+                (db.or_(table.c.last_activity.is_(None), table.c.last_activity < activity), activity),
+                else_=table.c.last_activity
+            ),
+            updated_at=datetime.utcnow()
+        )
+        db.session.execute(statement, changed)
+
+    @staticmethod
+    def recompute(user_ids):
+        """Recompute the rollups of the given users from their WatchHistory"""
+        user_ids = sorted(set(user_ids))
+        for start in range(0, len(user_ids), UserStats.BATCH_SIZE):
+            batch = user_ids[start:start + UserStats.BATCH_SIZE]
+            now = datetime.utcnow()
+            totals = {
+                user_id: {
+                    'user_id': user_id,
+                    'episodes_watched': 0,
+                    'episodes_completed': 0,
+                    'total_watch_time': 0,
+                    'last_activity': None,
+                    'updated_at': now,
+                }
+                for user_id in batch
+            }
+            rows = db.session.query(
+                WatchHistory.user_id,
+                func.count(WatchHistory.id),
+                func.sum(db.case((WatchHistory.completed.is_(True), 1), else_=0)),
+                func.coalesce(func.sum(WatchHistory.watch_time), 0),
+                func.max(WatchHistory.last_watched)
+            ).filter(WatchHistory.user_id.in_(batch)).group_by(WatchHistory.user_id)
+            for user_id, watched, completed, watch_time, last_activity in rows:
+                totals[user_id].update(
+                    episodes_watched=watched,
+                    episodes_completed=completed or 0,
+                    total_watch_time=watch_time,
+                    last_activity=last_activity
+                )
+            UserStats._store(list(totals.values()))
+
+    @staticmethod
+    def _store(rows):
+        """Insert or overwrite rollup rows"""
+        insert = dialect_insert(UserStats.__table__)
+        if insert is None:
+            for row in rows:
+                db.session.merge(UserStats(**row))
+            db.session.flush()
+            return
+
+        statement = insert.values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=[UserStats.user_id],
+            set_={field: statement.excluded[field] for field in rows[0] if field != 'user_id'}
+        )
+        db.session.execute(statement)
+
+class ContentSimilarity(db.Model):
+    """Precomputed top-K neighbours of a title (built by recommendations.py)"""
+    content_id = db.Column(db.Integer, db.ForeignKey('content.id', ondelete='CASCADE'), primary_key=True)
+    similar_content_id = db.Column(db.Integer, db.ForeignKey('content.id', ondelete='CASCADE'), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+    source = db.Column(db.String(10), nullable=False, default='cowatch')  # cowatch, genre
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Serves "neighbours of X, best first" with one index range scan
+        db.Index('ix_content_similarity_lookup', 'content_id', 'score'),
+    )
 
 class Subscription(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -116,10 +576,94 @@ class VipDownload(db.Model):
     user_agent = db.Column(db.String(500))
     download_timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Daily analytics rollup scans recent downloads
+        db.Index('ix_vip_download_timestamp', 'download_timestamp'),
+    )
+    
     # Relationships
     user = db.relationship('User', backref='vip_downloads')
     episode = db.relationship('Episode', backref='vip_downloads')
 
+class ContentDailyStats(db.Model):
+    """Per-title viewing totals per day (built by analytics_rollup.py)
+
+    A watch_history row counts on the day of its last_watched; days are
+    frozen once analytics_rollup has moved its watermark past them.
+    """
+    day = db.Column(db.Date, primary_key=True)
+    content_id = db.Column(db.Integer, db.ForeignKey('content.id', ondelete='CASCADE'), primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0)  # (user, episode) pairs watched that day
+    unique_viewers = db.Column(db.Integer, nullable=False, default=0)
+    completions = db.Column(db.Integer, nullable=False, default=0)
+    watch_seconds = db.Column(db.BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        # Per-title series over a date range
+        db.Index('ix_content_daily_stats_content_day', 'content_id', 'day'),
+    )
+
+class DownloadDailyStats(db.Model):
+    """VIP downloads per download type per day (built by analytics_rollup.py)"""
+    day = db.Column(db.Date, primary_key=True)
+    download_type = db.Column(db.String(20), primary_key=True)  # video, subtitle, audio
+    downloads = db.Column(db.Integer, nullable=False, default=0)
+    unique_users = db.Column(db.Integer, nullable=False, default=0)
+
+class RollupWatermark(db.Model):
+    """How far a rollup has consumed its source table
+
+    Source rows at or after processed_until belong to days that are still
+    open and are recomputed on every run.
+    """
+    name = db.Column(db.String(50), primary_key=True)
+    processed_until = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class BackgroundJob(db.Model):
+    """Admin task (scraping, imports) run by the worker pool in job_queue.py"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    payload = db.Column(db.Text, nullable=False)  # JSON arguments for the handler
+    result = db.Column(db.Text)  # JSON response of the handler
+    error = db.Column(db.Text)
+    progress = db.Column(db.Integer, nullable=False, default=0)  # 0-100
+    message = db.Column(db.String(200))
+    host = db.Column(db.String(255))  # Remote host the job talks to (concurrency cap)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'))
+    run_after = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        # Claim query: next queued job that is due
+        db.Index('ix_background_job_status_run_after', 'status', 'run_after'),
+        # Running jobs per host
+        db.Index('ix_background_job_status_host', 'status', 'host'),
+        db.Index('ix_background_job_finished_at', 'finished_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'message': self.message,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'error': self.error,
+            'result': json.loads(self.result) if self.result else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
 class Notification(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # None for global notifications
@@ -133,6 +677,12 @@ class Notification(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     read_at = db.Column(db.DateTime)
     
+    __table_args__ = (
+        db.Index('ix_notification_global_user_created', 'is_global', 'user_id', 'created_at'),
+        db.Index('ix_notification_user_created', 'user_id', 'created_at'),
+        db.Index('ix_notification_created_at', 'created_at'),
+    )
+    
     user = db.relationship('User', backref='notifications')
     read_by = db.relationship('NotificationRead', backref='notification', cascade='all, delete-orphan')
     
@@ -158,7 +708,11 @@ class NotificationRead(db.Model):
     read_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Composite unique constraint to prevent duplicate reads
-    __table_args__ = (db.UniqueConstraint('user_id', 'notification_id'),)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'notification_id'),
+        db.Index('ix_notification_read_notification', 'notification_id'),
+        db.Index('ix_notification_read_read_at', 'read_at'),
+    )
     
     user = db.relationship('User', backref='notification_reads')
     
@@ -166,6 +720,171 @@ class NotificationRead(db.Model):
         self.user_id = user_id
         self.notification_id = notification_id
 
+class NotificationReadState(db.Model):
+    """Per-user read watermark for global notifications
+
+    Global notifications with id <= global_read_up_to are read. Reads above
+    the watermark (out of order) are kept as sparse NotificationRead rows,
+    which are folded into the watermark as soon as the gap below them closes.
+    """
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    global_read_up_to = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @staticmethod
+    def is_global_notice():
+        """Condition selecting broadcast notifications"""
+        return db.and_(Notification.is_global.is_(True), Notification.user_id.is_(None))
+
+    @staticmethod
+    def watermark(user_id):
+        """Scalar expression for the user's watermark (0 without a state row)"""
+        return func.coalesce(
+            db.select(NotificationReadState.global_read_up_to)
+            .where(NotificationReadState.user_id == user_id)
+            .scalar_subquery(),
+            0
+        )
+
+    @staticmethod
+    def unread_globals(user_id):
+        """Condition selecting the global notifications the user has not read"""
+        read_out_of_order = db.select(NotificationRead.id).where(
+            NotificationRead.user_id == user_id,
+            NotificationRead.notification_id == Notification.id
+        ).exists()
+        return db.and_(
+            NotificationReadState.is_global_notice(),
+            Notification.id > NotificationReadState.watermark(user_id),
+            ~read_out_of_order
+        )
+
+    @staticmethod
+    def mark_all_read(user_id):
+        """Move the watermark to the newest global notification and drop the exceptions"""
+        newest = db.select(func.max(Notification.id)).where(NotificationReadState.is_global_notice()).scalar_subquery()
+        NotificationReadState._advance(user_id, func.coalesce(newest, 0))
+
+    @staticmethod
+    def mark_read(user_id, notification_id):
+        """Mark one global notification read for a user"""
+        current = db.session.query(NotificationReadState.global_read_up_to).filter_by(user_id=user_id).scalar() or 0
+        if notification_id <= current:
+            return
+        already_read = NotificationRead.query.filter_by(user_id=user_id, notification_id=notification_id).first()
+        if not already_read:
+            db.session.add(NotificationRead(user_id=user_id, notification_id=notification_id))
+            db.session.flush()
+
+        # Fold the exception rows into the watermark if no unread notice remains below them
+        first_unread = db.session.query(func.min(Notification.id)).filter(
+            NotificationReadState.unread_globals(user_id)
+        ).scalar()
+        if first_unread is None:
+            NotificationReadState.mark_all_read(user_id)
+        elif first_unread - 1 > current:
+            NotificationReadState._advance(user_id, db.literal(first_unread - 1))
+
+    @staticmethod
+    def _advance(user_id, value):
+        """Raise the watermark to the SQL expression `value` (never lowers it) and drop exceptions below it"""
+        insert = dialect_insert(NotificationReadState.__table__)
+        if insert is None:
+            state = db.session.get(NotificationReadState, user_id) or NotificationReadState(user_id=user_id, global_read_up_to=0)
+            target = db.session.execute(db.select(value)).scalar()
+            state.global_read_up_to = max(state.global_read_up_to or 0, target or 0)
+            db.session.add(state)
+            db.session.flush()
+        else:
+            table = NotificationReadState.__table__
+            statement = insert.values(user_id=user_id, global_read_up_to=value, updated_at=datetime.utcnow())
+            excluded = statement.excluded
+            statement = statement.on_conflict_do_update(
+                index_elements=[table.c.user_id],
+                set_={
+                    'global_read_up_to': db.case(
+                        (excluded.global_read_up_to > table.c.global_read_up_to, excluded.global_read_up_to),
+                        else_=table.c.global_read_up_to
+                    ),
+                    'updated_at': excluded.updated_at,
+                }
+            )
+            db.session.execute(statement)
+
+        db.session.execute(
+            db.delete(NotificationRead).where(
+                NotificationRead.user_id == user_id,
+                NotificationRead.notification_id <= NotificationReadState.watermark(user_id)
+            ),
+            execution_options={'synchronize_session': False}
+        )
+
+
+SETTINGS_VERSION_KEY = 'settings_version'
+
+
+class SettingsCache:
+    """Per-worker snapshot of every SystemSettings row.
+
+    All keys are loaded with a single query and served from memory until the
+    TTL expires. After that only the version stamp row is re-read; the full
+    snapshot is reloaded when the stamp differs from the one we hold.
+    ``SystemSettings.set_setting`` bumps the stamp so other workers pick the
+    change up on their next revalidation.
+    """
+
+    def __init__(self, ttl=30):
+        self.ttl = ttl
+        self._values = None
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get_all(self):
+        """Return the cached settings dict, refreshing it when stale"""
+        values = self._values
+        if values is not None and time.monotonic() - self._checked_at < self.ttl:
+            return values
+
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._values is not None and time.monotonic() - self._checked_at < self.ttl:
+                return self._values
+            try:
+                if self._values is not None and self._read_version() == self._version:
+                    self._checked_at = time.monotonic()
+                    return self._values
+                self._load()
+            except Exception as e:
+                if self._values is None:
+                    raise
+                # Keep serving the last known settings if the database hiccups
+                logging.warning(f"Settings cache refresh failed, serving stale values: {e}")
+                self._checked_at = time.monotonic()
+            return self._values
+
+    def invalidate(self):
+        """Drop the snapshot so the next read reloads it from the database"""
+        with self._lock:
+            self._values = None
+            self._version = None
+            self._checked_at = 0.0
+
+    def _read_version(self):
+        return db.session.query(SystemSettings.setting_value).filter_by(
+            setting_key=SETTINGS_VERSION_KEY
+        ).scalar()
+
+    def _load(self):
+        rows = db.session.query(SystemSettings.setting_key, SystemSettings.setting_value).all()
+        values = {key: value for key, value in rows}
+        self._version = values.pop(SETTINGS_VERSION_KEY, None)
+        self._values = values
+        self._checked_at = time.monotonic()
+
+
+settings_cache = SettingsCache(ttl=float(os.environ.get('SETTINGS_CACHE_TTL', 30)))
+
 
 class SystemSettings(db.Model):
     """System-wide settings for the application"""
@@ -182,9 +901,29 @@ class SystemSettings(db.Model):
     
     @staticmethod
     def get_setting(key, default=None):
-        """Get a system setting value"""
-        setting = SystemSettings.query.filter_by(setting_key=key).first()
-        return setting.setting_value if setting else default
+        """Get a system setting value (served from the per-worker settings cache)"""
+        values = settings_cache.get_all()
+        return values[key] if key in values else default
+    
+    @staticmethod
+    def invalidate_cache():
+        """Force the next get_setting call in this worker to hit the database"""
+        settings_cache.invalidate()
+    
+    @staticmethod
+    def _bump_version():
+        """Increment the settings version stamp inside the current transaction"""
+        updated = SystemSettings.query.filter_by(setting_key=SETTINGS_VERSION_KEY).update(
+            {SystemSettings.setting_value: db.cast(db.cast(SystemSettings.setting_value, db.Integer) + 1, db.Text)},
+            synchronize_session=False
+        )
+        if not updated:
+            version = SystemSettings()
+            version.setting_key = SETTINGS_VERSION_KEY
+            version.setting_value = '1'
+            version.setting_type = 'internal'
+            version.description = 'Bumped on every settings change to invalidate worker caches'
+            db.session.add(version)
     
     @staticmethod
     def set_setting(key, value, setting_type='text', description=None):
@@ -203,5 +942,7 @@ class SystemSettings(db.Model):
             setting.setting_type = setting_type
             setting.description = description
             db.session.add(setting)
+        SystemSettings._bump_version()
         db.session.commit()
+        settings_cache.invalidate()
         return setting
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Migration script to move inline M3U8 playlist bodies out of
+Episode.server_m3u8_url into the content-addressed PlaylistBlob table
+"""
+
+from app import app, db
+from models import Episode, PlaylistBlob
+from sqlalchemy import text
+import logging
+
+BATCH_SIZE = 100
+
+def move_playlists_to_blobs():
+    """Add Episode.playlist_id and move playlist bodies into PlaylistBlob"""
+
+    with app.app_context():
+        try:
+            # playlist_blob is a new table; create_all adds it on existing databases
+            db.create_all()
+
+            columns = [col['name'] for col in db.inspect(db.engine).get_columns('episode')]
+            if 'playlist_id' not in columns:
+                print("📝 Adding playlist_id column to Episode table...")
+                db.session.execute(text("""
+                    ALTER TABLE episode
+                    ADD COLUMN playlist_id INTEGER REFERENCES playlist_blob (id)
+                """))
+                db.session.commit()
+                print("✅ Added playlist_id column")
+            else:
+                print("✅ playlist_id column already exists in Episode table")
+
+            # Walk episodes by id in batches; only the id and the raw column are read
+            moved = 0
+            last_id = 0
+            while True:
+                rows = db.session.execute(text("""
+                    SELECT id, server_m3u8_url FROM episode
+                    WHERE id > :last_id AND server_m3u8_url IS NOT NULL AND server_m3u8_url <> ''
+                    ORDER BY id LIMIT :limit
+                """), {'last_id': last_id, 'limit': BATCH_SIZE}).all()
+                if not rows:
+                    break
+                last_id = rows[-1].id
+
+                for episode_id, body in rows:
+                    if not PlaylistBlob.is_playlist(body):
+                        continue
+                    blob = PlaylistBlob.store(body.strip())
+                    Episode.query.filter_by(id=episode_id).update({
+                        Episode.playlist_id: blob.id,
+                        Episode.server_m3u8_url: None
+                    }, synchronize_session=False)
+                    moved += 1
+
+                db.session.commit()
+                print(f"   Processed episodes up to id {last_id} ({moved} playlists moved)")
+
+            blobs = PlaylistBlob.query.count()
+            print(f"✅ Moved {moved} playlists into {blobs} deduplicated blobs")
+
+            # Reclaim the space left behind by the old TEXT values
+            if db.engine.dialect.name == 'postgresql' and moved:
+                with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                    connection.execute(text('VACUUM ANALYZE episode'))
+                print("✅ Vacuumed episode table")
+
+            return True
+
+        except Exception as e:
+            print(f"❌ Error moving playlists: {e}")
+            db.session.rollback()
+            return False
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print("🔧 Starting playlist migration...")
+
+    success = move_playlists_to_blobs()
+
+    if success:
+        print("🎉 Migration completed successfully!")
+    else:
+        print("💥 Migration failed!")
+        exit(1)
@@ -0,0 +1,231 @@
+"""
+Push channel for notifications (Server-Sent Events with a long-poll fallback)
+Each worker keeps an in-process hub of recent notification events. Notifications
+created in this worker are published immediately by create_notification; those
+created by other workers are picked up by one shared watcher query per worker
+while at least one client is connected. Waiting clients block on the hub only,
+so an idle connection costs no database queries.
+
+Works with threaded (gthread) and gevent Gunicorn workers: the hub only uses
+threading primitives, which gevent monkey-patches into cooperative ones. The
+app runs with `-k gthread` and a worker timeout above STREAM_MAX_AGE (see
+.replit). Under a sync worker every open stream would pin the only worker, so
+push_supported() turns streaming off and clients short-poll instead.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+from app import db
+from models import Notification, NotificationReadState
+from background_tasks import PeriodicTask
+
+# Seconds between keep-alive comments on an idle stream
+HEARTBEAT_INTERVAL = 15
+
+# Seconds before a stream is closed; EventSource reconnects with Last-Event-ID
+STREAM_MAX_AGE = int(os.environ.get('NOTIFICATION_STREAM_MAX_AGE', 300))
+
+# Seconds a long-poll request waits for an event
+LONG_POLL_TIMEOUT = 25
+
+# Seconds between polls of clients that cannot be pushed to (sync workers)
+SHORT_POLL_INTERVAL = 30
+
+# Seconds between watcher queries for notifications created by other workers
+WATCH_INTERVAL = float(os.environ.get('NOTIFICATION_WATCH_INTERVAL', 3))
+
+# Notifications committed this late (out of id order) are still picked up
+WATCH_LOOKBACK = timedelta(seconds=30)
+
+# Events kept in memory for clients that are briefly behind
+HUB_HISTORY = 256
+
+# Notifications replayed from the database when a client resumes
+RESUME_LIMIT = 50
+
+class NotificationHub:
+    """In-process broadcast of notification events
+
+    Events get a hub-local sequence number; subscribers wait for a sequence
+    newer than the last one they saw. Notification ids are only used to skip
+    duplicates (the watcher sees this worker's own notifications again).
+    """
+
+    def __init__(self, history=HUB_HISTORY):
+        self._events = deque(maxlen=history)
+        self._seen_ids = deque(maxlen=history * 4)
+        self._condition = threading.Condition()
+        self._sequence = 0
+        self._subscribers = 0
+
+    @property
+    def sequence(self):
+        return self._sequence
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    def publish(self, notifications):
+        """Broadcast Notification rows to waiting clients"""
+        events = [{'user_id': notification.user_id, 'data': notification.to_dict()} for notification in notifications]
+        with self._condition:
+            published = 0
+            for event in events:
+                if event['data']['id'] in self._seen_ids:
+                    continue
+                self._seen_ids.append(event['data']['id'])
+                self._sequence += 1
+                self._events.append((self._sequence, event))
+                published += 1
+            if published:
+                self._condition.notify_all()
+            return published
+
+    def wait(self, sequence, timeout):
+        """Return (sequence, events) after `sequence`, waiting up to `timeout` seconds
+
+        events is None when the client fell behind the in-memory history and
+        has to reload its list.
+        """
+        with self._condition:
+            if self._sequence == sequence:
+                self._condition.wait(timeout)
+            if self._events and self._events[0][0] > sequence + 1:
+                return self._sequence, None
+            return self._sequence, [event for number, event in self._events if number > sequence]
+
+    def subscribe(self):
+        """Register a waiting client; returns the current sequence"""
+        with self._condition:
+            self._subscribers += 1
+        watcher.start()
+        return self._sequence
+
+    def unsubscribe(self):
+        with self._condition:
+            self._subscribers -= 1
+
+    def poll_database(self):
+        """Publish recent notifications from other workers (only while clients are connected)"""
+        if not self._subscribers:
+            return 0
+        since = datetime.utcnow() - WATCH_LOOKBACK
+        recent = Notification.query.filter(Notification.created_at >= since).order_by(Notification.id).all()
+        return self.publish(recent)
+
+hub = NotificationHub()
+
+def push_supported(environ):
+    """True if this worker can hold streams open without blocking other requests"""
+    if environ.get('wsgi.multithread'):
+        return True
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched('threading')
+
+watcher = PeriodicTask('notification-events', WATCH_INTERVAL, hub.poll_database)
+
+def visible_to(event, user_id):
+    """True if a hub event belongs in this user's feed"""
+    return event['user_id'] == user_id or (event['user_id'] is None and event['data']['is_global'])
+
+def missed_since(user_id, last_id):
+    """Notifications for a user with an id above `last_id` (one query, on resume only)"""
+    return [
+        notification.to_dict()
+        for notification in Notification.query.filter(
+            Notification.id > last_id,
+            db.or_(Notification.user_id == user_id, NotificationReadState.unread_globals(user_id))
+        ).order_by(Notification.id).limit(RESUME_LIMIT)
+    ]
+
+def publish_notification(notification):
+    """Push a just-committed notification to this worker's clients"""
+    try:
+        hub.publish([notification])
+    except Exception as e:
+        logging.error(f"Error publishing notification {notification.id}: {e}")
+
+def _sse(event, data, event_id=None):
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+def stream_events(user_id, last_id=None):
+    """Generator of SSE frames for one client
+
+    Runs after the request context is gone, so it must not touch the
+    database session; missed notifications are loaded before it starts.
+    """
+    backlog = missed_since(user_id, last_id) if last_id is not None else []
+    db.session.remove()
+    # Events published before the first read are still delivered from the hub history
+    sequence = hub.sequence
+
+    def generate():
+        nonlocal sequence
+        newest = last_id or 0
+        # The watcher re-publishes recent rows, which may include the backlog
+        delivered = set()
+        hub.subscribe()
+        try:
+            yield 'retry: 5000\n\n'
+            for event in backlog:
+                newest = max(newest, event['id'])
+                delivered.add(event['id'])
+                yield _sse('notification', event, newest)
+
+            deadline = time.monotonic() + STREAM_MAX_AGE
+            while time.monotonic() < deadline:
+                sequence, events = hub.wait(sequence, HEARTBEAT_INTERVAL)
+                if events is None:
+                    yield _sse('resync', {})
+                    continue
+                sent = False
+                for event in events:
+                    if visible_to(event, user_id) and event['data']['id'] not in delivered:
+                        delivered.add(event['data']['id'])
+                        newest = max(newest, event['data']['id'])
+                        yield _sse('notification', event['data'], newest)
+                        sent = True
+                if not sent:
+                    yield ': keep-alive\n\n'
+        finally:
+            hub.unsubscribe()
+
+    return generate()
+
+def long_poll(user_id, last_id=None, timeout=LONG_POLL_TIMEOUT):
+    """Wait for the next notifications of a user; returns (events, resync)"""
+    if last_id is not None:
+        backlog = missed_since(user_id, last_id)
+        if backlog:
+            return backlog, False
+    db.session.remove()
+
+    sequence = hub.subscribe()
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return [], False
+            sequence, events = hub.wait(sequence, remaining)
+            if events is None:
+                return [], True
+            events = [event['data'] for event in events if visible_to(event, user_id)]
+            if events:
+                return events, False
+    finally:
+        hub.unsubscribe()
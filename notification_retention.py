@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Notification retention job for AniFlix
+Deletes expired notifications, their read records, orphaned read records and
+very old read records with set-based DELETE statements in bounded chunks, so
+each transaction stays short and never loads rows into Python.
+
+Runs hourly in one worker (under an advisory lock), from the admin system
+settings page, or from the command line:
+    python notification_retention.py
+"""
+
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+from app import app, db
+from models import Notification, NotificationRead
+from background_tasks import PeriodicTask, singleton_lock
+
+# Notifications older than this many days are deleted
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 5))
+
+# Read records older than this many days are deleted even if the notification remains
+READ_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_READ_RETENTION_DAYS', 30))
+
+# Rows per DELETE statement (and transaction)
+CHUNK_SIZE = 1000
+
+# Seconds between scheduled runs; 0 disables them (use the CLI from cron instead)
+RETENTION_INTERVAL = float(os.environ.get('NOTIFICATION_RETENTION_INTERVAL', 3600))
+
+def _delete_chunked(model, condition):
+    """DELETE rows of `model` matching `condition`, CHUNK_SIZE rows per transaction"""
+    deleted = 0
+    while True:
+        chunk = select(model.id).where(condition).order_by(model.id).limit(CHUNK_SIZE).scalar_subquery()
+        result = db.session.execute(
+            delete(model).where(model.id.in_(chunk)),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.commit()
+        deleted += result.rowcount
+        if result.rowcount < CHUNK_SIZE:
+            return deleted
+
+def _delete_expired_notifications(cutoff):
+    """Delete notifications created before `cutoff` together with their read records"""
+    deleted = reads = 0
+    while True:
+        ids = db.session.scalars(
+            select(Notification.id).where(Notification.created_at < cutoff)
+            .order_by(Notification.id).limit(CHUNK_SIZE)
+        ).all()
+        if not ids:
+            return deleted, reads
+        # Read records first (foreign key), in the same transaction as their notifications
+        reads += db.session.execute(
+            delete(NotificationRead).where(NotificationRead.notification_id.in_(ids)),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        deleted += db.session.execute(
+            delete(Notification).where(Notification.id.in_(ids)),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        db.session.commit()
+        if len(ids) < CHUNK_SIZE:
+            return deleted, reads
+
+def purge_notifications(retention_days=None, read_retention_days=None):
+    """Apply the retention policy; returns a dict of deleted row counts
+
+    Returns None when another worker is already running the job.
+    """
+    retention_days = NOTIFICATION_RETENTION_DAYS if retention_days is None else retention_days
+    read_retention_days = READ_RETENTION_DAYS if read_retention_days is None else read_retention_days
+
+    with singleton_lock('notification-retention') as acquired:
+        if not acquired:
+            return None
+
+        now = datetime.utcnow()
+        notifications, reads = _delete_expired_notifications(now - timedelta(days=retention_days))
+        orphaned = _delete_chunked(NotificationRead, ~select(Notification.id).where(
+            Notification.id == NotificationRead.notification_id
+        ).exists())
+        expired_reads = _delete_chunked(NotificationRead, NotificationRead.read_at < now - timedelta(days=read_retention_days))
+
+        counts = {
+            'notifications': notifications,
+            'read_records': reads,
+            'orphaned_reads': orphaned,
+            'expired_reads': expired_reads,
+        }
+        if any(counts.values()):
+            logging.info(f"Notification retention: {counts}")
+        return counts
+
+retention_task = PeriodicTask('notification-retention', RETENTION_INTERVAL, purge_notifications)
+
+def start_retention_schedule():
+    """Schedule the job in this worker (started lazily; one worker wins each run)"""
+    if RETENTION_INTERVAL > 0:
+        retention_task.start()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print("🔧 Starting notification retention...")
+
+    with app.app_context():
+        try:
+            counts = purge_notifications()
+        except Exception as e:
+            print(f"❌ Error applying notification retention: {e}")
+            db.session.rollback()
+            sys.exit(1)
+
+    if counts is None:
+        print("⚠️ Another worker is already running the retention job")
+    else:
+        for name, count in counts.items():
+            print(f"✅ Deleted {count} {name.replace('_', ' ')}")
+        print("🎉 Retention completed")
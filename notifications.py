@@ -1,100 +1,37 @@
-from flask import Blueprint, request, jsonify, render_template
+from flask import Blueprint, request, jsonify, render_template, Response
 from flask_login import login_required, current_user
-from flask_socketio import SocketIO, emit, join_room, leave_room, disconnect
 from app import db
-from models import Notification, User, NotificationRead
-from datetime import datetime, timedelta
+from models import Notification, User, NotificationReadState
+from notification_retention import start_retention_schedule
+import notification_events
+from datetime import datetime
 import logging
 
 notifications_bp = Blueprint('notifications', __name__)
 
-# SocketIO instance will be initialized in app.py
-socketio = None
-
-def init_socketio(app, socketio_instance):
-    """Initialize SocketIO with the app"""
-    global socketio
-    socketio = socketio_instance
-
-def cleanup_old_notifications():
-    """Delete notifications older than 5 days and their read records"""
+def _last_event_id():
+    """Resume cursor from the Last-Event-ID header (EventSource) or ?after= (first connect, long-poll)"""
+    value = request.headers.get('Last-Event-ID') or request.args.get('after')
     try:
-        five_days_ago = datetime.utcnow() - timedelta(days=5)
-        old_notifications = Notification.query.filter(
-            Notification.created_at < five_days_ago
-        ).all()
-        
-        if old_notifications:
-            notification_ids = [notif.id for notif in old_notifications]
-            
-            # Delete associated NotificationRead records first
-            old_read_records = NotificationRead.query.filter(
-                NotificationRead.notification_id.in_(notification_ids)
-            ).all()
-            
-            for read_record in old_read_records:
-                db.session.delete(read_record)
-            
-            # Then delete the notifications
-            for notification in old_notifications:
-                db.session.delete(notification)
-            
-            db.session.commit()
-            logging.info(f"Cleaned up {len(old_notifications)} old notifications and {len(old_read_records)} read records")
-        
-        # Also clean up orphaned read records (for notifications that no longer exist)
-        orphaned_reads = NotificationRead.query.filter(
-            ~NotificationRead.notification_id.in_(
-                db.session.query(Notification.id).scalar_subquery()
-            )
-        ).all()
-        
-        if orphaned_reads:
-            for read_record in orphaned_reads:
-                db.session.delete(read_record)
-            db.session.commit()
-            logging.info(f"Cleaned up {len(orphaned_reads)} orphaned read records")
-        
-        # Clean up very old read records (older than 30 days) to prevent database bloat
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        very_old_reads = NotificationRead.query.filter(
-            NotificationRead.read_at < thirty_days_ago
-        ).all()
-        
-        if very_old_reads:
-            for read_record in very_old_reads:
-                db.session.delete(read_record)
-            db.session.commit()
-            logging.info(f"Cleaned up {len(very_old_reads)} very old read records")
-            
-    except Exception as e:
-        logging.error(f"Failed to cleanup old notifications: {e}")
-        db.session.rollback()
+        return int(value) if value else None
+    except ValueError:
+        return None
 
 @notifications_bp.route('/notifications')
 @login_required
 def get_notifications():
-    """Get user notifications via API"""
+    """Get user notifications via API (read-only; expiry runs in notification_retention)"""
     try:
-        # Clean up old notifications first
-        cleanup_old_notifications()
+        start_retention_schedule()
         
         # Get user-specific notifications
         user_notifications = Notification.query.filter_by(
             user_id=current_user.id
         ).order_by(Notification.created_at.desc()).limit(20).all()
         
-        # Get read notification IDs for current user
-        read_notification_ids = db.session.query(NotificationRead.notification_id).filter_by(
-            user_id=current_user.id
-        ).scalar_subquery()
-        
-        # Get global notifications that user hasn't read yet
-        global_notifications = Notification.query.filter_by(
-            is_global=True,
-            user_id=None
-        ).filter(
-            ~Notification.id.in_(read_notification_ids)
+        # Get global notifications that user hasn't read yet (above the read watermark)
+        global_notifications = Notification.query.filter(
+            NotificationReadState.unread_globals(current_user.id)
         ).order_by(Notification.created_at.desc()).limit(10).all()
         
         # Combine and sort notifications
@@ -110,17 +47,10 @@ def get_notifications():
             
             # Check if this notification has been read by the current user
             if notif.is_global:
-                # For global notifications, check the NotificationRead table
-                read_record = NotificationRead.query.filter_by(
-                    user_id=current_user.id,
-                    notification_id=notif.id
-                ).first()
-                notif_dict['is_read'] = read_record is not None
-                if read_record:
-                    notif_dict['read_at'] = read_record.read_at.isoformat()
-                else:
-                    notif_dict['read_at'] = None
-                    unread_count += 1
+                # Only unread global notifications are listed
+                notif_dict['is_read'] = False
+                notif_dict['read_at'] = None
+                unread_count += 1
             else:
                 # For user-specific notifications, use the original is_read field
                 if not notif.is_read:
@@ -131,12 +61,48 @@ def get_notifications():
         return jsonify({
             'success': True,
             'notifications': notifications_data,
-            'unread_count': unread_count
+            'unread_count': unread_count,
+            'push': notification_events.push_supported(request.environ)
         })
     except Exception as e:
         logging.error(f"Error fetching notifications: {e}")
         return jsonify({'success': False, 'message': 'Failed to fetch notifications'})
 
+@notifications_bp.route('/notifications/stream')
+@login_required
+def notification_stream():
+    """Server-Sent Events stream of new notifications"""
+    if not notification_events.push_supported(request.environ):
+        # A sync worker would be pinned for the whole stream; the client short-polls instead
+        return jsonify({'success': False, 'message': 'Streaming not available'}), 503
+    
+    events = notification_events.stream_events(current_user.id, _last_event_id())
+    response = Response(events, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@notifications_bp.route('/notifications/poll')
+@login_required
+def poll_notifications():
+    """Long-poll fallback for clients without a working EventSource (short poll on sync workers)"""
+    try:
+        push = notification_events.push_supported(request.environ)
+        events, resync = notification_events.long_poll(
+            current_user.id, _last_event_id(),
+            timeout=notification_events.LONG_POLL_TIMEOUT if push else 0
+        )
+        return jsonify({
+            'success': True,
+            'notifications': events,
+            'resync': resync,
+            'push': push,
+            'interval': 0 if push else notification_events.SHORT_POLL_INTERVAL
+        })
+    except Exception as e:
+        logging.error(f"Error long-polling notifications: {e}")
+        return jsonify({'success': False, 'message': 'Failed to poll notifications'}), 500
+
 @notifications_bp.route('/notifications/mark_read/<int:notification_id>', methods=['POST'])
 @login_required
 def mark_notification_read(notification_id):
@@ -151,18 +117,8 @@ def mark_notification_read(notification_id):
             return jsonify({'success': False, 'message': 'Access denied'})
         
         if notification.is_global:
-            # For global notifications, create a read record
-            existing_read = NotificationRead.query.filter_by(
-                user_id=current_user.id,
-                notification_id=notification_id
-            ).first()
-            
-            if not existing_read:
-                read_record = NotificationRead(
-                    user_id=current_user.id,
-                    notification_id=notification_id
-                )
-                db.session.add(read_record)
+            # For global notifications, advance the read watermark (or record an out-of-order read)
+            NotificationReadState.mark_read(current_user.id, notification_id)
         else:
             # For user-specific notifications, update the original record
             notification.is_read = True
@@ -182,38 +138,17 @@ def mark_all_notifications_read():
     try:
         current_time = datetime.utcnow()
         
-        # Mark user-specific notifications as read
-        user_notifications = Notification.query.filter_by(
+        # Mark user-specific notifications as read with a single UPDATE
+        marked = Notification.query.filter_by(
             user_id=current_user.id,
             is_read=False
-        ).all()
-        
-        for notif in user_notifications:
-            notif.is_read = True
-            notif.read_at = current_time
-        
-        # Get all global notifications that user hasn't read yet
-        read_notification_ids = db.session.query(NotificationRead.notification_id).filter_by(
-            user_id=current_user.id
-        ).scalar_subquery()
+        ).update({'is_read': True, 'read_at': current_time}, synchronize_session=False)
         
-        global_notifications = Notification.query.filter_by(
-            is_global=True,
-            user_id=None
-        ).filter(
-            ~Notification.id.in_(read_notification_ids)
-        ).all()
-        
-        # Mark global notifications as read for this user
-        for notif in global_notifications:
-            read_record = NotificationRead(
-                user_id=current_user.id,
-                notification_id=notif.id
-            )
-            db.session.add(read_record)
+        # Global notifications: move the read watermark to the newest one
+        NotificationReadState.mark_all_read(current_user.id)
         
         db.session.commit()
-        logging.info(f"Marked {len(user_notifications)} user notifications and {len(global_notifications)} global notifications as read for user {current_user.id}")
+        logging.info(f"Marked {marked} user notifications and all global notifications as read for user {current_user.id}")
         return jsonify({'success': True})
     except Exception as e:
         logging.error(f"Error marking all notifications as read: {e}")
@@ -235,17 +170,7 @@ def delete_notification(notification_id):
         
         if notification.is_global:
             # For global notifications, just mark as read so they don't show up again
-            existing_read = NotificationRead.query.filter_by(
-                user_id=current_user.id,
-                notification_id=notification_id
-            ).first()
-            
-            if not existing_read:
-                read_record = NotificationRead(
-                    user_id=current_user.id,
-                    notification_id=notification_id
-                )
-                db.session.add(read_record)
+            NotificationReadState.mark_read(current_user.id, notification_id)
         else:
             # For user-specific notifications, delete completely
             db.session.delete(notification)
@@ -263,29 +188,11 @@ def delete_notification(notification_id):
 def delete_all_notifications():
     """Delete all notifications for user"""
     try:
-        # Delete user-specific notifications
-        user_notifications = Notification.query.filter_by(user_id=current_user.id).all()
-        for notif in user_notifications:
-            db.session.delete(notif)
+        # Delete user-specific notifications with a single DELETE
+        Notification.query.filter_by(user_id=current_user.id).delete(synchronize_session=False)
         
         # For global notifications, mark them as read so they don't show up again
-        read_notification_ids = db.session.query(NotificationRead.notification_id).filter_by(
-            user_id=current_user.id
-        ).scalar_subquery()
-        
-        global_notifications = Notification.query.filter_by(
-            is_global=True,
-            user_id=None
-        ).filter(
-            ~Notification.id.in_(read_notification_ids)
-        ).all()
-        
-        for notif in global_notifications:
-            read_record = NotificationRead(
-                user_id=current_user.id,
-                notification_id=notif.id
-            )
-            db.session.add(read_record)
+        NotificationReadState.mark_all_read(current_user.id)
         
         db.session.commit()
         logging.info(f"All notifications deleted for user {current_user.id}")
@@ -318,6 +225,9 @@ def create_notification(user_id=None, title="", message="", notification_type="i
         
         logging.info(f"Notification created successfully with ID: {notification.id}")
         
+        # Push to connected clients of this worker; other workers pick it up from the database
+        notification_events.publish_notification(notification)
+        
         return notification
     except Exception as e:
         logging.error(f"Error creating notification: {e}")
@@ -375,43 +285,3 @@ def notify_admin_message(user_id, title, message):
         notification_type="info",
         icon="user-shield"
     )
-
-# SocketIO Event Handlers
-def setup_socketio_events(socketio_instance):
-    """Setup SocketIO event handlers"""
-    global socketio
-    socketio = socketio_instance
-    
-    @socketio.on('connect')
-    def handle_connect():
-        if current_user.is_authenticated:
-            join_room(f'user_{current_user.id}')
-            logging.info(f'User {current_user.username} connected to notifications')
-    
-    @socketio.on('disconnect')
-    def handle_disconnect():
-        if current_user.is_authenticated:
-            leave_room(f'user_{current_user.id}')
-            logging.info(f'User {current_user.username} disconnected from notifications')
-    
-    @socketio.on('join_notifications')
-    def handle_join_notifications():
-        if current_user.is_authenticated:
-            join_room(f'user_{current_user.id}')
-            emit('notification_status', {'status': 'connected'})
-    
-    @socketio.on('mark_notification_read')
-    def handle_mark_read(data):
-        if current_user.is_authenticated:
-            notification_id = data.get('notification_id')
-            if notification_id:
-                try:
-                    notification = Notification.query.get(notification_id)
-                    if notification and (notification.user_id == current_user.id or notification.is_global):
-                        notification.is_read = True
-                        notification.read_at = datetime.utcnow()
-                        db.session.commit()
-                        emit('notification_marked_read', {'notification_id': notification_id})
-                except Exception as e:
-                    logging.error(f"Error marking notification as read via SocketIO: {e}")
-                    db.session.rollback()
\ No newline at end of file
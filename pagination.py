@@ -0,0 +1,124 @@
+"""
+Keyset (cursor) pagination for AniFlix listings
+Pages newest-first on (created_at, id) with opaque cursors, so a deep page costs
+the same index range scan as the first one. Totals are optional and come from
+planner statistics on PostgreSQL instead of a COUNT(*) per page.
+"""
+
+import base64
+import json
+import logging
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import tuple_
+from app import db
+
+class KeysetPage:
+    """One page of a keyset-paginated listing
+
+    Mirrors the parts of Flask-SQLAlchemy's Pagination that templates use
+    (items, per_page, has_next, has_prev, total) and adds the cursors.
+    """
+
+    is_keyset = True
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None, total=None, total_is_estimate=False):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        self.total_is_estimate = total_is_estimate
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+def encode_cursor(direction, item):
+    """Encode a page boundary as an opaque URL-safe token"""
+    payload = json.dumps([direction, item.created_at.isoformat(), item.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """Return (direction, created_at, id) from a cursor, or None if it is missing or invalid"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if direction not in ('next', 'prev'):
+            return None
+        return direction, datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, TypeError, json.JSONDecodeError):
+        return None
+
+def estimate_count(query):
+    """Approximate row count of a query
+
+    PostgreSQL uses the planner's estimate (table statistics, no scan); other
+    databases are small local copies where an exact COUNT(*) is cheap.
+    Returns (count, is_estimate).
+    """
+    count_query = query.order_by(None)
+    if db.engine.dialect.name != 'postgresql':
+        return count_query.count(), False
+    try:
+        compiled = count_query.statement.compile(dialect=db.engine.dialect)
+        plan = db.session.connection().exec_driver_sql(
+            f'EXPLAIN (FORMAT JSON) {compiled}', compiled.params
+        ).scalar()
+        plan = plan if isinstance(plan, list) else json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), True
+    except Exception as e:
+        logging.warning(f"Row estimate failed: {e}")
+        db.session.rollback()
+        return None, True
+
+def keyset_paginate(query, model, cursor=None, per_page=12, with_total=False):
+    """Return a KeysetPage of `query` ordered by (created_at, id) descending"""
+    key = tuple_(model.created_at, model.id)
+    position = decode_cursor(cursor)
+    base_query = query
+
+    if position and position[0] == 'prev':
+        # Walk backwards from the first item of the current page, then flip
+        rows = query.filter(key > (position[1], position[2])).order_by(
+            model.created_at.asc(), model.id.asc()
+        ).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next = True
+    else:
+        if position:
+            query = query.filter(key < (position[1], position[2]))
+        rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1).all()
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_prev = position is not None
+
+    total, is_estimate = estimate_count(base_query) if with_total else (None, False)
+
+    return KeysetPage(
+        items,
+        per_page,
+        next_cursor=encode_cursor('next', items[-1]) if items and has_next else None,
+        prev_cursor=encode_cursor('prev', items[0]) if items and has_prev else None,
+        total=total,
+        total_is_estimate=is_estimate
+    )
+
+def keyset_requested():
+    """True when the listing should use cursors instead of page numbers"""
+    return 'cursor' in request.args or current_app.config.get('PAGINATION_MODE') == 'keyset'
+
+def paginate_listing(query, model, per_page):
+    """Page a newest-first listing by cursor (keyset mode) or by page number"""
+    if keyset_requested():
+        return keyset_paginate(query, model, request.args.get('cursor'), per_page, with_total=True)
+    page = request.args.get('page', 1, type=int)
+    return query.order_by(model.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
@@ -0,0 +1,159 @@
+"""
+Write-behind buffer for watch-progress heartbeats
+The player reports progress every few seconds; instead of a SELECT/UPDATE/COMMIT
+per heartbeat, the latest position per (user, episode) is kept in memory and
+written in batched multi-row upserts by a background flusher.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+from models import Episode, UserStats, WatchHistory
+from background_tasks import PeriodicTask
+
+# Seconds between flushes; also the most progress a crashed worker can lose
+FLUSH_INTERVAL = float(os.environ.get('PROGRESS_FLUSH_INTERVAL', 5))
+
+# Rows per multi-row upsert statement
+FLUSH_BATCH_SIZE = 500
+
+# Episode metadata needed to validate heartbeats (content_id, episode_number)
+EPISODE_CACHE_SIZE = 4096
+EPISODE_CACHE_TTL = 300
+
+class ProgressBuffer:
+    """Latest unsaved progress per (user_id, episode_id) for this worker"""
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._episodes = OrderedDict()
+        self._episodes_lock = threading.Lock()
+
+    def episode_info(self, episode_id):
+        """Return (content_id, episode_number) for an episode, or None if it does not exist"""
+        now = time.monotonic()
+        with self._episodes_lock:
+            cached = self._episodes.get(episode_id)
+            if cached and cached[0] > now:
+                self._episodes.move_to_end(episode_id)
+                return cached[1]
+
+        row = db.session.query(Episode.content_id, Episode.episode_number).filter(
+            Episode.id == episode_id
+        ).first()
+        info = (row.content_id, row.episode_number) if row else None
+
+        if info:
+            with self._episodes_lock:
+                self._episodes[episode_id] = (now + EPISODE_CACHE_TTL, info)
+                self._episodes.move_to_end(episode_id)
+                while len(self._episodes) > EPISODE_CACHE_SIZE:
+                    self._episodes.popitem(last=False)
+        return info
+
+    def record(self, user_id, episode_id, content_id, watch_time, completed):
+        """Buffer a heartbeat; only the newest value per user/episode is kept"""
+        user_id, episode_id = int(user_id), int(episode_id)
+        entry = {
+            'user_id': user_id,
+            'episode_id': episode_id,
+            'content_id': content_id,
+            'watch_time': int(watch_time),
+            'completed': bool(completed),
+            'status': 'completed' if completed else 'on-going',
+            'last_watched': datetime.utcnow(),
+        }
+        with self._lock:
+            self._pending[(user_id, episode_id)] = entry
+        flusher.start()
+
+    def get(self, user_id, episode_id):
+        """Return the buffered entry for a user/episode, if any"""
+        with self._lock:
+            entry = self._pending.get((user_id, episode_id))
+            return dict(entry) if entry else None
+
+    def overlay(self, history):
+        """Apply buffered progress to loaded WatchHistory rows without marking them dirty"""
+        rows = history if isinstance(history, (list, tuple)) else [history]
+        for row in rows:
+            if row is None:
+                continue
+            entry = self.get(row.user_id, row.episode_id)
+            if entry:
+                for field in WatchHistory.PROGRESS_FIELDS:
+                    set_committed_value(row, field, entry[field])
+        return history
+
+    def discard(self, user_id, episode_id):
+        """Drop buffered progress, e.g. before the history row is removed"""
+        with self._lock:
+            self._pending.pop((user_id, episode_id), None)
+
+    def flush(self, user_id=None):
+        """Write buffered progress to the database (all users, or one user)
+
+        Returns the number of rows written. Rows that fail are put back unless a
+        newer heartbeat for the same key arrived in the meantime.
+        """
+        with self._lock:
+            if user_id is None:
+                entries, self._pending = list(self._pending.values()), {}
+            else:
+                keys = [key for key in self._pending if key[0] == user_id]
+                entries = [self._pending.pop(key) for key in keys]
+
+        if not entries:
+            return 0
+
+        written = 0
+        for start in range(0, len(entries), FLUSH_BATCH_SIZE):
+            batch = entries[start:start + FLUSH_BATCH_SIZE]
+            try:
+                self._write(batch)
+                db.session.commit()
+                written += len(batch)
+            except Exception as e:
+                db.session.rollback()
+                logging.warning(f"Batched progress flush failed, retrying row by row: {e}")
+                written += self._write_rows(batch)
+
+        logging.debug(f"Flushed {written} buffered watch-progress rows")
+        return written
+
+    def _write_rows(self, entries):
+        """Fallback for a failed batch: isolate rows that cannot be written"""
+        written = 0
+        for entry in entries:
+            try:
+                self._write([entry])
+                db.session.commit()
+                written += 1
+            except Exception as e:
+                db.session.rollback()
+                if isinstance(e, IntegrityError):
+                    # e.g. the episode was deleted; retrying would never succeed
+                    logging.error(f"Dropping progress for user {entry['user_id']} episode {entry['episode_id']}: {e}")
+                    continue
+                logging.error(f"Error flushing progress for user {entry['user_id']} episode {entry['episode_id']}: {e}")
+                with self._lock:
+                    self._pending.setdefault((entry['user_id'], entry['episode_id']), entry)
+        return written
+
+    def _write(self, entries):
+        """Upsert a batch of entries and roll the changes into the users' stats"""
+        previous = UserStats.progress_snapshot((entry['user_id'], entry['episode_id']) for entry in entries)
+        WatchHistory.upsert_many(entries)
+        UserStats.record_progress(entries, previous)
+
+progress_buffer = ProgressBuffer()
+
+flusher = PeriodicTask('watch-progress-flush', FLUSH_INTERVAL, progress_buffer.flush, run_on_exit=True)
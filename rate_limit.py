@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+Outbound rate limiting for external metadata APIs (AniList, Jikan)
+Every upstream has one or more token buckets (requests per window) kept in a
+local SQLite file, so all Gunicorn workers on a host draw from the same
+allowance instead of each assuming it has the whole limit. A 429 with
+Retry-After blocks the upstream for every worker until it expires.
+
+Retries of 429/5xx responses and network errors use jittered exponential
+backoff and draw from a per-upstream retry budget, so a struggling upstream
+is not hammered by retry storms during bulk imports.
+
+Usage:
+    python rate_limit.py --stats
+"""
+
+import argparse
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import requests
+
+import http_client
+
+RATE_LIMIT_PATH = os.environ.get(
+    'RATE_LIMIT_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'rate_limit.sqlite3')
+)
+
+# Upstream -> (requests, window seconds) limits, all of which must allow a request
+LIMITS = {
+    'anilist': ((90, 60),),
+    'jikan': ((3, 1), (60, 60)),
+}
+
+# Retries per upstream per window (shared by all workers), on top of the request limits
+RETRY_BUDGET = (10, 60)
+
+# Retries of a single request, and the backoff bounds (seconds)
+MAX_RETRIES = 3
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 30.0
+
+# Longest a caller waits for a token (or a Retry-After block) before giving up
+MAX_WAIT = 60.0
+
+# Callers on a web request thread fail fast instead of holding the worker;
+# the long waits above are for catalog_sync, analyze_studios and jobs
+INTERACTIVE_WAIT = 3.0
+INTERACTIVE_RETRIES = 1
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_bucket (
+    name TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rate_block (
+    upstream TEXT PRIMARY KEY,
+    blocked_until REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rate_metrics (
+    upstream TEXT PRIMARY KEY,
+    requests INTEGER NOT NULL DEFAULT 0,
+    throttled INTEGER NOT NULL DEFAULT 0,
+    wait_seconds REAL NOT NULL DEFAULT 0,
+    retries INTEGER NOT NULL DEFAULT 0,
+    retries_denied INTEGER NOT NULL DEFAULT 0,
+    rejected INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+class RateLimited(Exception):
+    """No token became available within the caller's max_wait"""
+
+def retry_after(response):
+    """Seconds from a Retry-After header (delta-seconds form), or None"""
+    value = response.headers.get('Retry-After') if response is not None else None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+def backoff(attempt):
+    """Full-jitter exponential backoff for retry `attempt` (1-based)"""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+
+class RateLimiter:
+    """Token buckets shared through a SQLite file (per process when it cannot be opened)"""
+
+    def __init__(self, path=RATE_LIMIT_PATH, limits=LIMITS):
+        self.path = path
+        self.limits = limits
+        self._ready = False
+        self._lock = threading.Lock()
+        self._memory = None
+
+    def _connect(self):
+        if self._memory is not None:
+            return self._memory
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            if not self._ready:
+                connection.execute('PRAGMA journal_mode=WAL')
+                connection.executescript(SCHEMA)
+                self._ready = True
+            return connection
+        except (OSError, sqlite3.Error) as e:
+            logging.error(f"Rate limiter cannot open {self.path}, limiting per process: {e}")
+            self._memory = sqlite3.connect(':memory:', isolation_level=None, check_same_thread=False)
+            self._memory.executescript(SCHEMA)
+            return self._memory
+
+    def _transaction(self, work):
+        """Run work(connection) inside one write transaction"""
+        with self._lock:
+            connection = self._connect()
+            try:
+                connection.execute('BEGIN IMMEDIATE')
+                try:
+                    result = work(connection)
+                    connection.execute('COMMIT')
+                    return result
+                except BaseException:
+                    connection.execute('ROLLBACK')
+                    raise
+            finally:
+                if connection is not self._memory:
+                    connection.close()
+
+    def _take(self, connection, buckets, now):
+        """Take one token from every bucket, or return the seconds until that is possible"""
+        state = []
+        wait = 0.0
+        for name, capacity, rate in buckets:
+            row = connection.execute('SELECT tokens, updated FROM rate_bucket WHERE name = ?', (name,)).fetchone()
+            tokens = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+            state.append((name, tokens))
+            if tokens < 1:
+                wait = max(wait, (1 - tokens) / rate)
+        if wait:
+            return wait
+        connection.executemany(
+            'INSERT OR REPLACE INTO rate_bucket (name, tokens, updated) VALUES (?, ?, ?)',
+            [(name, tokens - 1, now) for name, tokens in state]
+        )
+        return 0.0
+
+    def _buckets(self, upstream):
+        return [
+            (f'{upstream}:{count}/{window}', count, count / window)
+            for count, window in self.limits.get(upstream, ())
+        ]
+
+    def _count(self, upstream, **increments):
+        columns = ', '.join(increments)
+        updates = ', '.join(f'{column} = {column} + excluded.{column}' for column in increments)
+        placeholders = ', '.join('?' for _ in increments)
+        try:
+            self._transaction(lambda connection: connection.execute(
+                f'INSERT INTO rate_metrics (upstream, {columns}) VALUES (?, {placeholders}) '
+                f'ON CONFLICT (upstream) DO UPDATE SET {updates}',
+                (upstream, *increments.values())
+            ))
+        except sqlite3.Error as e:
+            logging.debug(f"Rate limiter metrics update failed for {upstream}: {e}")
+
+    def acquire(self, upstream, max_wait=MAX_WAIT):
+        """Block until `upstream` may be called; returns the seconds waited
+
+        Raises RateLimited when that would take longer than max_wait.
+        """
+        buckets = self._buckets(upstream)
+        started = time.monotonic()
+
+        def attempt(connection):
+            now = time.time()
+            row = connection.execute('SELECT blocked_until FROM rate_block WHERE upstream = ?', (upstream,)).fetchone()
+            if row and row[0] > now:
+                return row[0] - now
+            return self._take(connection, buckets, now)
+
+        while True:
+            try:
+                wait = self._transaction(attempt)
+            except sqlite3.Error as e:
+                # Never fail a lookup because the limiter store is unavailable
+                logging.warning(f"Rate limiter unavailable for {upstream}: {e}")
+                wait = 0.0
+            waited = time.monotonic() - started
+            if not wait:
+                if waited > 0.001:
+                    self._count(upstream, requests=1, throttled=1, wait_seconds=waited)
+                else:
+                    self._count(upstream, requests=1)
+                return waited
+            if waited + wait > max_wait:
+                self._count(upstream, rejected=1, wait_seconds=waited)
+                raise RateLimited(f"{upstream}: no request slot within {max_wait:.0f}s")
+            time.sleep(wait + random.uniform(0, 0.05))
+
+    def block(self, upstream, seconds):
+        """Stop every worker from calling `upstream` for the next `seconds`"""
+        until = time.time() + seconds
+        self._transaction(lambda connection: connection.execute(
+            'INSERT INTO rate_block (upstream, blocked_until) VALUES (?, ?) '
+            'ON CONFLICT (upstream) DO UPDATE SET blocked_until = MAX(blocked_until, excluded.blocked_until)',
+            (upstream, until)
+        ))
+        logging.warning(f"{upstream} asked us to back off for {seconds:.0f}s")
+
+    def allow_retry(self, upstream):
+        """Take a token from the upstream's retry budget; False when it is spent"""
+        count, window = RETRY_BUDGET
+        name = f'{upstream}:retry'
+        try:
+            allowed = self._transaction(
+                lambda connection: self._take(connection, [(name, count, count / window)], time.time()) == 0
+            )
+        except sqlite3.Error:
+            allowed = True
+        self._count(upstream, **({'retries': 1} if allowed else {'retries_denied': 1}))
+        return allowed
+
+    def request(self, upstream, method, url, max_wait=MAX_WAIT, max_retries=MAX_RETRIES, **kwargs):
+        """Send an HTTP request through the upstream's limits, retrying 429/5xx and network errors
+
+        Returns the last response (callers still check its status); raises
+        the last network error or RateLimited when no attempt could be made.
+        """
+        attempt = 0
+        while True:
+            self.acquire(upstream, max_wait)
+            error = None
+            response = None
+            try:
+                response = http_client.request(method, url, **kwargs)
+            except requests.exceptions.RequestException as e:
+                error = e
+
+            if error is None and response.status_code not in RETRY_STATUSES:
+                return response
+
+            delay = retry_after(response)
+            if response is not None and response.status_code == 429 and delay is not None:
+                self.block(upstream, delay)
+
+            attempt += 1
+            if attempt > max_retries or not self.allow_retry(upstream):
+                if error is not None:
+                    raise error
+                return response
+
+            wait = backoff(attempt) if delay is None else delay + random.uniform(0, 1)
+            if wait > max_wait:
+                if error is not None:
+                    raise error
+                return response
+            logging.info(f"Retrying {upstream} request ({attempt}/{max_retries}) in {wait:.1f}s: "
+                         f"{error or f'HTTP {response.status_code}'}")
+            time.sleep(wait)
+
+    def stats(self):
+        with self._lock:
+            connection = self._connect()
+            try:
+                return connection.execute(
+                    'SELECT upstream, requests, throttled, wait_seconds, retries, retries_denied, rejected '
+                    'FROM rate_metrics ORDER BY upstream'
+                ).fetchall()
+            finally:
+                if connection is not self._memory:
+                    connection.close()
+
+rate_limiter = RateLimiter()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Show outbound API rate limiting metrics')
+    parser.add_argument('--stats', action='store_true', help='show requests, throttled waits and retries per upstream')
+    parser.parse_args()
+
+    print(f"🔧 Rate limiter at {rate_limiter.path}")
+    for upstream, count, throttled, wait_seconds, retries, denied, rejected in rate_limiter.stats():
+        print(f"   {upstream}: {count} requests, {throttled} throttled ({wait_seconds:.1f}s waited), "
+              f"{retries} retries, {denied} retries over budget, {rejected} rejected")
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Rebuild the UserStats dashboard rollups from WatchHistory
+
+Recomputes every user from scratch in batches. Run it once after deploying the
+rollup table, after bulk edits to watch_history (e.g. dedupe_watch_history.py),
+or from cron with --since-hours to reconcile recently active users.
+
+Usage:
+    python rebuild_user_stats.py                  # all users
+    python rebuild_user_stats.py --since-hours 24 # users active in the last day
+"""
+
+import argparse
+import logging
+from datetime import datetime, timedelta
+
+from app import app, db
+from models import User, UserStats, WatchHistory
+
+BATCH_SIZE = 1000
+
+def rebuild_user_stats(since_hours=None):
+    """Recompute the rollups of all users (or recently active ones) in batches"""
+
+    with app.app_context():
+        try:
+            # Make sure the rollup table exists on databases created before it was added
+            db.create_all()
+
+            if since_hours is None:
+                query = db.session.query(User.id)
+                key = User.id
+            else:
+                since = datetime.utcnow() - timedelta(hours=since_hours)
+                query = db.session.query(WatchHistory.user_id).filter(WatchHistory.last_watched >= since).distinct()
+                key = WatchHistory.user_id
+
+            rebuilt = 0
+            last_id = 0
+            while True:
+                # Keyset over user ids so every batch is an index range scan
+                batch = [user_id for (user_id,) in query.filter(key > last_id).order_by(key).limit(BATCH_SIZE)]
+                if not batch:
+                    break
+                UserStats.recompute(batch)
+                db.session.commit()
+                rebuilt += len(batch)
+                last_id = batch[-1]
+                print(f"   Rebuilt {rebuilt} users")
+
+            print(f"✅ Rebuilt stats for {rebuilt} users")
+            return True
+
+        except Exception as e:
+            print(f"❌ Error rebuilding user stats: {e}")
+            db.session.rollback()
+            return False
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Rebuild per-user viewing stats')
+    parser.add_argument('--since-hours', type=float, help='only users with activity in this many hours')
+    args = parser.parse_args()
+
+    print("🔧 Starting user stats rebuild...")
+
+    success = rebuild_user_stats(args.since_hours)
+
+    if success:
+        print("🎉 Rebuild completed successfully!")
+    else:
+        print("💥 Rebuild failed!")
+        exit(1)
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Item-to-item recommendations for AniFlix
+Builds a sparse user x content co-watch matrix from WatchHistory, scores title
+pairs by cosine similarity and stores the top-K neighbours per title in
+ContentSimilarity. Titles with too little viewing data are filled up with
+genre neighbours. The player page reads neighbours with one indexed lookup.
+
+NumPy/SciPy are used for the vectorized path when installed; otherwise an
+equivalent pure-Python co-occurrence count is used.
+
+Usage:
+    python recommendations.py          # incremental refresh
+    python recommendations.py --full   # rebuild every title
+"""
+
+import heapq
+import logging
+import math
+import os
+import sys
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sqlalchemy import and_, func, select
+from app import app, db
+from models import Content, ContentSimilarity, WatchHistory, content_genre
+from background_tasks import PeriodicTask, singleton_lock
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # optional: pure-Python fallback below
+    np = None
+    sparse = None
+
+# Neighbours stored per title (more than the sidebar shows, so type filters still fill it)
+TOP_K = int(os.environ.get('RECOMMENDATIONS_TOP_K', 20))
+
+# Titles with fewer co-watch neighbours than this get genre neighbours as well
+MIN_NEIGHBOURS = 6
+
+# Pairs watched together by fewer users are noise
+MIN_COWATCH_USERS = 2
+
+# Seconds between background refreshes; 0 disables them (use the CLI from cron instead)
+REFRESH_INTERVAL = float(os.environ.get('RECOMMENDATIONS_REFRESH_INTERVAL', 3600))
+
+WRITE_BATCH_SIZE = 500
+TARGET_CHUNK_SIZE = 1000
+
+def load_interactions():
+    """Distinct (user_id, content_id) pairs: who watched anything of which title"""
+    return db.session.query(WatchHistory.user_id, WatchHistory.content_id).distinct().all()
+
+def cowatch_neighbours(pairs, targets):
+    """Return {content_id: [(neighbour_id, score), ...]} for the target titles"""
+    if sparse is not None:
+        return _cowatch_vectorized(pairs, targets)
+    return _cowatch_python(pairs, targets)
+
+def _cowatch_vectorized(pairs, targets):
+    if not pairs:
+        return {}
+    user_index, item_ids, rows, cols = {}, [], [], []
+    item_index = {}
+    for user_id, content_id in pairs:
+        rows.append(user_index.setdefault(user_id, len(user_index)))
+        if content_id not in item_index:
+            item_index[content_id] = len(item_ids)
+            item_ids.append(content_id)
+        cols.append(item_index[content_id])
+
+    # Binary user x item matrix; X^T X gives co-watch counts, its diagonal the item popularity
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (rows, cols)),
+        shape=(len(user_index), len(item_ids))
+    )
+    by_item = matrix.tocsc()
+    norms = np.sqrt(np.asarray(matrix.sum(axis=0)).ravel())
+
+    target_index = np.array([item_index[t] for t in targets if t in item_index], dtype=np.int64)
+    result = {}
+    for start in range(0, len(target_index), TARGET_CHUNK_SIZE):
+        chunk = target_index[start:start + TARGET_CHUNK_SIZE]
+        counts = (by_item[:, chunk].T @ matrix).tocsr()
+        for row, item in enumerate(chunk):
+            begin, end = counts.indptr[row], counts.indptr[row + 1]
+            neighbours, together = counts.indices[begin:end], counts.data[begin:end]
+            keep = (neighbours != item) & (together >= MIN_COWATCH_USERS)
+            neighbours, together = neighbours[keep], together[keep]
+            if not len(neighbours):
+                continue
+            scores = together / (norms[item] * norms[neighbours])
+            best = np.argsort(-scores, kind='stable')[:TOP_K]
+            result[item_ids[item]] = [(item_ids[neighbours[i]], float(scores[i])) for i in best]
+    return result
+
+def _cowatch_python(pairs, targets):
+    titles_by_user = defaultdict(set)
+    for user_id, content_id in pairs:
+        titles_by_user[user_id].add(content_id)
+    viewers = Counter(content_id for _, content_id in pairs)
+
+    together = defaultdict(Counter)
+    for titles in titles_by_user.values():
+        for title in titles & targets:
+            counter = together[title]
+            for other in titles:
+                if other != title:
+                    counter[other] += 1
+
+    result = {}
+    for title, counter in together.items():
+        scored = [
+            (other, count / math.sqrt(viewers[title] * viewers[other]))
+            for other, count in counter.items() if count >= MIN_COWATCH_USERS
+        ]
+        if scored:
+            result[title] = heapq.nlargest(TOP_K, scored, key=lambda pair: pair[1])
+    return result
+
+def genre_neighbours(content_ids):
+    """Titles sharing the most genres with each given title, best rated first
+
+    Relevance is shared genres + rating / 100, so more shared genres always
+    win and rating breaks ties.
+    """
+    source, other = content_genre.alias('source'), content_genre.alias('other')
+    result = {}
+    ids = list(content_ids)
+    for start in range(0, len(ids), WRITE_BATCH_SIZE):
+        batch = ids[start:start + WRITE_BATCH_SIZE]
+        shared = select(
+            source.c.content_id.label('content_id'),
+            other.c.content_id.label('similar_content_id'),
+            func.count().label('shared')
+        ).join(other, and_(
+            other.c.genre_id == source.c.genre_id,
+            other.c.content_id != source.c.content_id
+        )).where(source.c.content_id.in_(batch)).group_by(
+            source.c.content_id, other.c.content_id
+        ).subquery()
+
+        score = shared.c.shared + func.coalesce(Content.rating, 0) / 100.0
+        ranked = select(
+            shared.c.content_id,
+            shared.c.similar_content_id,
+            score.label('score'),
+            func.row_number().over(partition_by=shared.c.content_id, order_by=score.desc()).label('rank')
+        ).join(Content, Content.id == shared.c.similar_content_id).subquery()
+
+        for content_id, similar_id, value, _ in db.session.execute(select(ranked).where(ranked.c.rank <= TOP_K)):
+            result.setdefault(content_id, []).append((similar_id, float(value)))
+    return result
+
+def _changed_titles(since):
+    """Titles whose neighbours may have moved since the last refresh
+
+    Every title watched by a user with new activity (their new co-watch pairs
+    touch those titles), plus newly added titles.
+    """
+    active_users = db.session.query(WatchHistory.user_id).filter(WatchHistory.last_watched > since)
+    watched = db.session.query(WatchHistory.content_id).filter(WatchHistory.user_id.in_(active_users)).distinct()
+    added = db.session.query(Content.id).filter(Content.created_at > since)
+    return {content_id for (content_id,) in watched.union(added)}
+
+def refresh(full=False):
+    """Recompute neighbours for changed titles (or all titles); returns rows written
+
+    Returns None when another worker is already running the refresh.
+    """
+    with singleton_lock('recommendations-refresh') as acquired:
+        if not acquired:
+            return None
+
+        started = datetime.utcnow()
+        since = None if full else db.session.query(func.max(ContentSimilarity.updated_at)).scalar()
+        if since is None:
+            targets = {content_id for (content_id,) in db.session.query(Content.id)}
+        else:
+            targets = _changed_titles(since)
+        if not targets:
+            return 0
+
+        neighbours = {
+            title: [(similar_id, value, 'cowatch') for similar_id, value in picked]
+            for title, picked in cowatch_neighbours(load_interactions(), targets).items()
+        }
+        cold = [title for title in targets if len(neighbours.get(title, [])) < MIN_NEIGHBOURS]
+        for title, fallback in genre_neighbours(cold).items():
+            picked = neighbours.setdefault(title, [])
+            known = {similar_id for similar_id, _, _ in picked}
+            # Rescale genre relevance below the weakest co-watch neighbour of this title
+            floor = min((value for _, value, _ in picked), default=1.0)
+            ceiling = max(value for _, value in fallback) + 1
+            picked.extend(
+                (similar_id, floor * value / ceiling, 'genre')
+                for similar_id, value in fallback if similar_id not in known
+            )
+            del picked[TOP_K:]
+
+        written = 0
+        ordered = sorted(targets)
+        for start in range(0, len(ordered), WRITE_BATCH_SIZE):
+            batch = ordered[start:start + WRITE_BATCH_SIZE]
+            ContentSimilarity.query.filter(ContentSimilarity.content_id.in_(batch)).delete(synchronize_session=False)
+            rows = [
+                {
+                    'content_id': title,
+                    'similar_content_id': similar_id,
+                    'score': value,
+                    'source': source,
+                    'updated_at': started,
+                }
+                for title in batch for similar_id, value, source in neighbours.get(title, [])
+            ]
+            if rows:
+                db.session.execute(ContentSimilarity.__table__.insert(), rows)
+            db.session.commit()
+            written += len(rows)
+
+        logging.info(f"Refreshed recommendations for {len(targets)} titles ({written} neighbour rows)")
+        return written
+
+def similar_content(content_id, limit=6, content_type=None):
+    """Nearest neighbours of a title, best first (one indexed lookup)"""
+    start_background_refresh()
+    query = Content.query.join(
+        ContentSimilarity, ContentSimilarity.similar_content_id == Content.id
+    ).filter(ContentSimilarity.content_id == content_id)
+    if content_type:
+        query = query.filter(Content.content_type == content_type)
+    return query.order_by(ContentSimilarity.score.desc()).limit(limit).all()
+
+refresher = PeriodicTask('recommendations-refresh', REFRESH_INTERVAL, refresh)
+
+def start_background_refresh():
+    """Schedule incremental refreshes in this worker (one worker wins each run)
+
+    Started lazily by the first lookup, so scripts importing this module do not
+    spawn the thread.
+    """
+    if REFRESH_INTERVAL > 0:
+        refresher.start()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    full = '--full' in sys.argv
+    print(f"🔧 Starting {'full' if full else 'incremental'} recommendations refresh "
+          f"({'NumPy/SciPy' if sparse is not None else 'pure Python'})...")
+
+    with app.app_context():
+        try:
+            written = refresh(full=full)
+        except Exception as e:
+            print(f"❌ Error refreshing recommendations: {e}")
+            db.session.rollback()
+            sys.exit(1)
+
+    if written is None:
+        print("⚠️ Another worker is already refreshing recommendations")
+    else:
+        print(f"🎉 Wrote {written} neighbour rows")
@@ -0,0 +1,247 @@
+"""
+Content search service for AniFlix
+Full-text search over title, genre and description with weighted relevance
+(title > genre > description). PostgreSQL uses a generated tsvector column with
+a GIN index; SQLite (local runs) uses an FTS5 table kept in sync by triggers.
+"""
+
+import logging
+import re
+import threading
+
+from sqlalchemy import case, func, literal_column, select, table, column, text
+from app import db
+from models import Content, Episode, WatchHistory
+
+# Text search config shared by the index and the queries; 'simple' avoids
+# English stemming, which would mangle romanized titles and Indonesian text
+TS_CONFIG = 'simple'
+
+# bm25 column weights for the SQLite index (title, genre, description)
+FTS5_WEIGHTS = (10.0, 5.0, 1.0)
+
+MAX_TERMS = 8
+
+_POSTGRES_DDL = [
+    f"""
+    ALTER TABLE content ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{TS_CONFIG}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{TS_CONFIG}', coalesce(genre, '')), 'B') ||
+        setweight(to_tsvector('{TS_CONFIG}', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_content_search_vector ON content USING GIN (search_vector)",
+]
+
+_SQLITE_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS content_fts USING fts5(
+        title, genre, description,
+        content='content', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS content_fts_ai AFTER INSERT ON content BEGIN
+        INSERT INTO content_fts(rowid, title, genre, description)
+        VALUES (new.id, new.title, new.genre, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS content_fts_ad AFTER DELETE ON content BEGIN
+        INSERT INTO content_fts(content_fts, rowid, title, genre, description)
+        VALUES ('delete', old.id, old.title, old.genre, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS content_fts_au AFTER UPDATE OF title, genre, description ON content BEGIN
+        INSERT INTO content_fts(content_fts, rowid, title, genre, description)
+        VALUES ('delete', old.id, old.title, old.genre, old.description);
+        INSERT INTO content_fts(rowid, title, genre, description)
+        VALUES (new.id, new.title, new.genre, new.description);
+    END
+    """,
+]
+
+content_fts = table('content_fts', column('rowid'))
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def ensure_search_index():
+    """Create the full-text index for the current database if it is missing
+
+    Returns the active backend: 'postgresql', 'sqlite' or 'like' (fallback when
+    the index could not be created).
+    """
+    global _backend
+    with _backend_lock:
+        dialect = db.engine.dialect.name
+        try:
+            if dialect == 'postgresql':
+                columns = {col['name'] for col in db.inspect(db.engine).get_columns('content')}
+                indexes = {index['name'] for index in db.inspect(db.engine).get_indexes('content')}
+                if 'search_vector' not in columns or 'ix_content_search_vector' not in indexes:
+                    logging.info("Creating PostgreSQL full-text search column and GIN index")
+                    with db.engine.begin() as connection:
+                        for statement in _POSTGRES_DDL:
+                            connection.execute(text(statement))
+                _backend = 'postgresql'
+            elif dialect == 'sqlite':
+                with db.engine.begin() as connection:
+                    exists = connection.execute(text(
+                        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'content_fts'"
+                    )).first()
+                    for statement in _SQLITE_DDL:
+                        connection.execute(text(statement))
+                    if not exists:
+                        logging.info("Building SQLite FTS5 index for content search")
+                        connection.execute(text("INSERT INTO content_fts(content_fts) VALUES ('rebuild')"))
+                _backend = 'sqlite'
+            else:
+                _backend = 'like'
+        except Exception as e:
+            logging.error(f"Full-text search index unavailable, falling back to LIKE search: {e}")
+            _backend = 'like'
+        return _backend
+
+def get_backend():
+    """Return the active search backend, initializing it on first use"""
+    return _backend or ensure_search_index()
+
+def _terms(query):
+    """Split user input into safe lowercase search terms"""
+    return re.findall(r'\w+', (query or '').lower(), re.UNICODE)[:MAX_TERMS]
+
+def apply_search(query, search_query):
+    """Filter a Content query by full-text match and order it by relevance
+
+    Every term must match; the last term is treated as a prefix so results
+    follow the user while typing. Ties fall back to rating and recency.
+    """
+    terms = _terms(search_query)
+    if not terms:
+        return query.filter(db.false())
+
+    backend = get_backend()
+
+    if backend == 'postgresql':
+        search_vector = literal_column('content.search_vector')
+        ts_query = func.to_tsquery(TS_CONFIG, ' & '.join(terms[:-1] + [f'{terms[-1]}:*']))
+        return query.filter(search_vector.op('@@')(ts_query)).order_by(
+            func.ts_rank(search_vector, ts_query).desc(),
+            Content.rating.desc(),
+            Content.created_at.desc()
+        )
+
+    if backend == 'sqlite':
+        match = ' '.join([f'"{term}"' for term in terms[:-1]] + [f'"{terms[-1]}"*'])
+        return query.join(content_fts, content_fts.c.rowid == Content.id).filter(
+            text('content_fts MATCH :fts_match').bindparams(fts_match=match)
+        ).order_by(
+            func.bm25(literal_column('content_fts'), *FTS5_WEIGHTS),
+            Content.rating.desc(),
+            Content.created_at.desc()
+        )
+
+    # Fallback without an index: substring match on all three fields
+    for term in terms:
+        pattern = f'%{term}%'
+        query = query.filter(db.or_(
+            func.lower(Content.title).like(pattern),
+            func.lower(Content.genre).like(pattern),
+            func.lower(Content.description).like(pattern)
+        ))
+    return query.order_by(Content.rating.desc(), Content.created_at.desc())
+
+def search_content(search_query, limit=8, content_type=None):
+    """Return the most relevant Content rows for a search string"""
+    query = Content.query
+    if content_type:
+        query = query.filter(Content.content_type == content_type)
+    return apply_search(query, search_query).limit(limit).all()
+
+# Dashboard library search: sort key -> ORDER BY builder (progress is passed in)
+LIBRARY_SORTS = {
+    'recent': lambda latest, progress: latest.c.last_watched.desc().nulls_last(),
+    'rating': lambda latest, progress: func.coalesce(Content.rating, 0).desc(),
+    'title': lambda latest, progress: Content.title.asc(),
+    'year': lambda latest, progress: func.coalesce(Content.year, 0).desc(),
+    'progress': lambda latest, progress: progress.desc(),
+}
+
+def latest_watch_join(user_id):
+    """Return (latest, onclause) to outer-join each content to the user's newest WatchHistory row
+
+    PostgreSQL reads the user's history once with DISTINCT ON and hash-joins it.
+    SQLite cannot index a derived table, so there each content probes
+    ix_watch_history_user_content for its newest row (a LATERAL-style lookup).
+    """
+    newest_first = (WatchHistory.last_watched.desc(), WatchHistory.id.desc())
+
+    if db.engine.dialect.name == 'postgresql':
+        latest = select(
+            WatchHistory.content_id,
+            WatchHistory.episode_id,
+            WatchHistory.watch_time,
+            WatchHistory.completed,
+            WatchHistory.last_watched,
+        ).where(WatchHistory.user_id == user_id).distinct(
+            WatchHistory.content_id
+        ).order_by(WatchHistory.content_id, *newest_first).subquery('latest_watch')
+        return latest, latest.c.content_id == Content.id
+
+    latest = WatchHistory.__table__.alias('latest_watch')
+    newest_id = select(WatchHistory.id).where(
+        WatchHistory.user_id == user_id,
+        WatchHistory.content_id == Content.id
+    ).order_by(*newest_first).limit(1).correlate(Content).scalar_subquery()
+    return latest, latest.c.id == newest_id
+
+def search_library(user_id, search_query='', genre=None, status=None, sort='recent', limit=20):
+    """Dashboard search: catalog rows with the user's progress, in one statement
+
+    Status filter, sort and limit all run in the database; search relevance
+    breaks ties between rows with the same sort key.
+    """
+    latest, onclause = latest_watch_join(user_id)
+    progress = case(
+        (latest.c.content_id.is_(None), 0),
+        (Episode.duration > 0, func.coalesce(latest.c.watch_time, 0) * 100.0 / (Episode.duration * 60)),
+        (latest.c.completed.is_(True), 100),
+        else_=50
+    )
+
+    query = db.session.query(
+        Content.id,
+        Content.title,
+        Content.genre,
+        Content.year,
+        Content.thumbnail_url,
+        progress.label('progress'),
+        func.coalesce(Episode.episode_number, 1).label('current_episode'),
+        latest.c.last_watched,
+        func.coalesce(latest.c.completed, False).label('completed'),
+    ).select_from(Content).outerjoin(latest, onclause).outerjoin(
+        Episode, Episode.id == latest.c.episode_id
+    )
+
+    if status == 'ongoing':
+        query = query.filter(latest.c.content_id.isnot(None), latest.c.completed.isnot(True))
+    elif status == 'completed':
+        query = query.filter(latest.c.completed.is_(True))
+    elif status == 'not-started':
+        query = query.filter(latest.c.content_id.is_(None))
+
+    if sort in LIBRARY_SORTS:
+        query = query.order_by(LIBRARY_SORTS[sort](latest, progress))
+
+    if genre:
+        from content import filter_by_genre
+        query = filter_by_genre(query, genre)
+
+    if search_query:
+        query = apply_search(query, search_query)
+
+    return [row._asdict() for row in query.order_by(Content.id).limit(limit)]
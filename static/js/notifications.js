@@ -1,4 +1,4 @@
-// Manual-only notification system - No automatic polling
+// Notification system - initial load, then pushed updates (Server-Sent Events, long-poll fallback)
 class NotificationManager {
     constructor() {
         this.notifications = [];
@@ -6,6 +6,9 @@ class NotificationManager {
         this.notificationContainer = null;
         this.notificationBell = null;
         this.notificationBadge = null;
+        this.eventSource = null;
+        // Set by the server: false on workers that cannot hold a stream open
+        this.push = false;
         
         this.init();
     }
@@ -18,11 +21,75 @@ class NotificationManager {
             this.setupUI();
         }
         
-        // Load notifications only once on page load
-        this.loadNotifications();
+        // Load notifications once, then receive new ones over the push channel
+        this.loadNotifications().then(() => this.connectStream());
         console.log('Notification system ready');
     }
     
+    latestNotificationId() {
+        return this.notifications.reduce((latest, notification) => Math.max(latest, notification.id), 0);
+    }
+    
+    connectStream() {
+        if (!this.push || !window.EventSource) {
+            this.longPoll();
+            return;
+        }
+        
+        // The browser reconnects by itself and resumes with Last-Event-ID
+        const source = new EventSource(`/api/notifications/stream?after=${this.latestNotificationId()}`);
+        source.addEventListener('notification', (event) => {
+            this.receiveNotification(JSON.parse(event.data));
+        });
+        source.addEventListener('resync', () => this.loadNotifications());
+        source.onerror = () => {
+            // Closed for good (e.g. blocked by a proxy): fall back to long-polling
+            if (source.readyState === EventSource.CLOSED) {
+                this.eventSource = null;
+                this.longPoll();
+            }
+        };
+        this.eventSource = source;
+    }
+    
+    async longPoll() {
+        while (true) {
+            try {
+                const response = await fetch(`/api/notifications/poll?after=${this.latestNotificationId()}`);
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                const data = await response.json();
+                if (!data.success) {
+                    throw new Error(data.message || 'Poll failed');
+                }
+                if (data.resync) {
+                    await this.loadNotifications();
+                }
+                (data.notifications || []).forEach(notification => this.receiveNotification(notification));
+                if (data.interval) {
+                    // The server answered right away (short poll); wait before asking again
+                    await new Promise(resolve => setTimeout(resolve, data.interval * 1000));
+                }
+            } catch (error) {
+                console.error('Notification long-poll failed:', error);
+                await new Promise(resolve => setTimeout(resolve, 10000));
+            }
+        }
+    }
+    
+    receiveNotification(notification) {
+        if (this.notifications.some(existing => existing.id === notification.id)) {
+            return;
+        }
+        this.notifications = [notification, ...this.notifications].slice(0, 20);
+        if (!notification.is_read) {
+            this.unreadCount += 1;
+        }
+        this.updateUI();
+        this.showNotificationToast(notification);
+    }
+    
     setupUI() {
         // Get existing notification bell from template
         this.notificationBell = document.getElementById('notification-bell');
@@ -142,6 +209,7 @@ class NotificationManager {
             if (data.success) {
                 this.notifications = data.notifications || [];
                 this.unreadCount = data.unread_count || 0;
+                this.push = Boolean(data.push);
                 this.updateUI();
                 console.log(`Loaded ${this.notifications.length} notifications, ${this.unreadCount} unread`);
             }
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+Studio resolution index for AniFlix
+Maps anime titles to their main animation studio, for titles whose metadata
+source has no studio. Titles are normalized (case, punctuation, season and
+part suffixes) into one hash map; a title that has no exact key falls back to
+key-token containment, then to trigram similarity.
+
+The index is built from:
+    studio_index.json             AniList titles with studios(isMain: true),
+                                  written by `python analyze_studios.py`
+    studio_analysis_results.json  popular titles per studio from the same tool
+    MANUAL_STUDIOS                hand-picked aliases (short names, romaji)
+
+It is loaded once per process and reloaded when either file changes on disk,
+so regenerating it with analyze_studios.py needs no restart.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STUDIO_INDEX_PATH = os.environ.get('STUDIO_INDEX_PATH', os.path.join(BASE_DIR, 'studio_index.json'))
+STUDIO_ANALYSIS_PATH = os.path.join(BASE_DIR, 'studio_analysis_results.json')
+
+# Seconds between checks of the source files for changes
+RELOAD_CHECK = 30
+
+# Minimum trigram similarity (Jaccard) for a fuzzy match
+TRIGRAM_THRESHOLD = 0.55
+
+# Aliases that AniList titles alone don't cover (lowest priority)
+MANUAL_STUDIOS = {
+    # A-1 Pictures (21 popular anime) - Tier S
+    'sword art online': 'A-1 Pictures',
+    'your lie in april': 'A-1 Pictures',
+    'erased': 'A-1 Pictures',
+    'kaguya-sama': 'A-1 Pictures',
+    'seven deadly sins': 'A-1 Pictures',
+    'fairy tail': 'A-1 Pictures',
+    
+    # bones (20 popular anime) - Tier S
+    'my hero academia': 'bones',
+    'boku no hero academia': 'bones',
+    'fullmetal alchemist': 'bones',
+    'mob psycho 100': 'bones',
+    'noragami': 'bones',
+    'soul eater': 'bones',
+    
+    # MAPPA (16 popular anime) - Tier S
+    'jujutsu kaisen': 'MAPPA',
+    'attack on titan final season': 'MAPPA',
+    'chainsaw man': 'MAPPA',
+    'kakegurui': 'MAPPA',
+    'yuri on ice': 'MAPPA',
+    'vinland saga': 'MAPPA',
+    
+    # MADHOUSE (16 popular anime) - Tier S
+    'death note': 'MADHOUSE',
+    'hunter x hunter': 'MADHOUSE',
+    'one punch man': 'MADHOUSE',
+    'no game no life': 'MADHOUSE',
+    'parasyte': 'MADHOUSE',
+    'overlord': 'MADHOUSE',
+    
+    # J.C.STAFF (14 popular anime) - Tier S
+    'toradora': 'J.C.STAFF',
+    'one punch man season 2': 'J.C.STAFF',
+    'food wars': 'J.C.STAFF',
+    'danmachi': 'J.C.STAFF',
+    'saiki k': 'J.C.STAFF',
+    
+    # Production I.G (12 popular anime) - Tier S
+    'haikyuu': 'Production I.G',
+    'psycho-pass': 'Production I.G',
+    'kuroko no basket': 'Production I.G',
+    'ghost in the shell': 'Production I.G',
+    
+    # WIT STUDIO (11 popular anime) - Tier S
+    'attack on titan': 'WIT STUDIO',
+    'shingeki no kyojin': 'WIT STUDIO',
+    'spy x family': 'WIT STUDIO',
+    'kabaneri': 'WIT STUDIO',
+    
+    # CloverWorks (11 popular anime) - Tier S
+    'the promised neverland': 'CloverWorks',
+    'rascal does not dream': 'CloverWorks',
+    'horimiya': 'CloverWorks',
+    
+    # Kyoto Animation (10 popular anime) - Tier S
+    'violet evergarden': 'Kyoto Animation',
+    'a silent voice': 'Kyoto Animation',
+    'hyouka': 'Kyoto Animation',
+    'k-on': 'Kyoto Animation',
+    'clannad': 'Kyoto Animation',
+    
+    # ufotable (9 popular anime) - Tier S
+    'demon slayer': 'ufotable',
+    'kimetsu no yaiba': 'ufotable',
+    'fate zero': 'ufotable',
+    'fate stay night': 'ufotable',
+    
+    # Studio Pierrot (9 popular anime) - Tier S
+    'naruto': 'Studio Pierrot',
+    'naruto shippuden': 'Studio Pierrot',
+    'tokyo ghoul': 'Studio Pierrot',
+    'bleach': 'Studio Pierrot',
+    'black clover': 'Studio Pierrot',
+    
+    # WHITE FOX (8 popular anime) - Tier S
+    'rezero': 'WHITE FOX',
+    're:zero': 'WHITE FOX',
+    'steins gate': 'WHITE FOX',
+    'goblin slayer': 'WHITE FOX',
+    
+    # TIER A Studios (5-7 popular anime)
+    'jojos bizarre adventure': 'David Production',
+    'fire force': 'David Production',
+    'assassination classroom': 'Lerche',
+    'classroom of the elite': 'Lerche',
+    'dr stone': 'TMS Entertainment',
+    
+    # TIER B Studios (3-4 popular anime)
+    'code geass': 'Sunrise',
+    'cowboy bebop': 'Sunrise',
+    'spirited away': 'Studio Ghibli',
+    'howls moving castle': 'Studio Ghibli',
+    'princess mononoke': 'Studio Ghibli',
+    'totoro': 'Studio Ghibli',
+    'your name': 'CoMix Wave',
+    'weathering with you': 'CoMix Wave',
+    'oregairu': "Brain's Base",
+    'evangelion': 'Gainax',
+    'neon genesis evangelion': 'Gainax',
+    'mushoku tensei': 'Studio Bind',
+    'oshi no ko': 'Doga Kobo',
+    'darling in the franxx': 'TRIGGER',
+    'kill la kill': 'TRIGGER',
+    
+    # Additional major anime
+    'one piece': 'Toei Animation',
+    'dragon ball': 'Toei Animation',
+    'dragon ball z': 'Toei Animation',
+    'dragon ball super': 'Toei Animation',
+    'sailor moon': 'Toei Animation',
+    'pokemon': 'OLM',
+    'komi': 'OLM',
+}
+
+# Trailing words that don't change which studio made a show
+_SUFFIX = re.compile(
+    r'\s+(?:(?:season|part|cour)\s*\d+|\d+(?:st|nd|rd|th)\s+season|final\s+season'
+    r'|the\s+movie|movie|ova|ona|special|tv|\d{4}|ii+|\d{1,2})$'
+)
+
+def normalize_title(title):
+    """Lowercase ASCII-ish key: punctuation dropped, whitespace collapsed"""
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', (title or '').lower()).split())
+
+def title_stems(key):
+    """A normalized title, then the same title with one more season/part/movie suffix removed"""
+    while key:
+        yield key
+        stripped = _SUFFIX.sub('', key).strip()
+        if stripped == key:
+            return
+        key = stripped
+
+def base_title(key):
+    """A normalized title without any season/part/movie suffixes"""
+    stems = list(title_stems(key))
+    return stems[-1] if stems else ''
+
+def _trigrams(key):
+    padded = f'  {key} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class StudioIndex:
+    """Normalized title -> studio map with token and trigram fallbacks"""
+
+    def __init__(self, index_path=STUDIO_INDEX_PATH, analysis_path=STUDIO_ANALYSIS_PATH):
+        self.index_path = index_path
+        self.analysis_path = analysis_path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._checked = 0
+        # (titles, token -> keys, trigram -> keys, key -> trigram count), swapped as one on reload
+        self._snapshot = ({}, {}, {}, {})
+
+    def _file_signature(self):
+        signature = []
+        for path in (self.index_path, self.analysis_path):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _read_json(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.error(f"Studio index: cannot read {path}: {e}")
+            return {}
+
+    def _load(self):
+        titles = {}
+
+        def add(title, studio):
+            key = normalize_title(title)
+            if key and studio:
+                titles[key] = studio
+                # Seasons and sequels resolve through their base title unless listed themselves
+                titles.setdefault(base_title(key), studio)
+
+        for title, studio in MANUAL_STUDIOS.items():
+            add(title, studio)
+        for studio, details in (self._read_json(self.analysis_path).get('studio_mapping') or {}).items():
+            for title in details.get('popular_titles') or []:
+                add(title, studio)
+        # AniList data last: it wins over the older sources
+        for title, studio in (self._read_json(self.index_path).get('titles') or {}).items():
+            add(title, studio)
+        titles.pop('', None)
+
+        by_token = defaultdict(set)
+        by_trigram = defaultdict(set)
+        trigram_counts = {}
+        for key in titles:
+            for token in key.split():
+                by_token[token].add(key)
+            trigrams = _trigrams(key)
+            trigram_counts[key] = len(trigrams)
+            for trigram in trigrams:
+                by_trigram[trigram].add(key)
+
+        self._snapshot = (titles, dict(by_token), dict(by_trigram), trigram_counts)
+        logging.info(f"Studio index loaded: {len(titles)} title keys")
+
+    def _ensure_loaded(self):
+        now = time.monotonic()
+        if self._signature is not None and now - self._checked < RELOAD_CHECK:
+            return
+        with self._lock:
+            self._checked = now
+            signature = self._file_signature()
+            if signature != self._signature:
+                self._load()
+                self._signature = signature
+
+    @property
+    def titles(self):
+        return self._snapshot[0]
+
+    def _token_match(self, snapshot, key):
+        """Longest indexed title whose words all appear in the query"""
+        by_token = snapshot[1]
+        tokens = set(key.split())
+        candidates = set()
+        for token in tokens:
+            candidates |= by_token.get(token, set())
+        best = None
+        for candidate in candidates:
+            words = candidate.split()
+            # Single short words ('erased', 'komi') are too ambiguous inside longer titles
+            if (len(words) > 1 or len(candidate) >= 6) and tokens.issuperset(words):
+                if best is None or len(candidate) > len(best):
+                    best = candidate
+        return best
+
+    def _trigram_match(self, snapshot, key):
+        _, _, by_trigram, trigram_counts = snapshot
+        query = _trigrams(key)
+        shared = defaultdict(int)
+        for trigram in query:
+            for candidate in by_trigram.get(trigram, ()):
+                shared[candidate] += 1
+        best, best_score = None, TRIGRAM_THRESHOLD
+        for candidate, count in shared.items():
+            score = count / (len(query) + trigram_counts[candidate] - count)
+            if score >= best_score:
+                best, best_score = candidate, score
+        return best
+
+    def lookup(self, title):
+        """Studio for a title, or '' when nothing matches closely enough"""
+        self._ensure_loaded()
+        snapshot = self._snapshot
+        titles = snapshot[0]
+        key = normalize_title(title)
+        if not key:
+            return ''
+        for candidate in title_stems(key):
+            if candidate in titles:
+                return titles[candidate]
+        match = self._token_match(snapshot, key) or self._trigram_match(snapshot, key)
+        return titles[match] if match else ''
+
+def save_index(title_studios, path=STUDIO_INDEX_PATH):
+    """Write AniList title -> studio data for the index (picked up by running workers)"""
+    data = {
+        'generated_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'source': 'AniList studios(isMain: true)',
+        'titles': dict(sorted(title_studios.items())),
+    }
+    # Write then rename, so a worker reloading mid-write never reads half a file
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1, ensure_ascii=False)
+    os.replace(temporary, path)
+    return len(data['titles'])
+
+studio_index = StudioIndex()